@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+
+from __future__ import annotations
+
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable
+
+from PIL import ImageFont
+
+from aoe2civgen.block_render import text_width, wrap_text, wrap_words
+from aoe2civgen.generate_images import load_all_fonts_from_config, load_config_file
+
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+DATA_DIR = REPO_ROOT / "data"
+WIDTHS_PX = (180, 260, 340, 420, 520)
+ROUNDS = 5
+
+
+def _reference_wrap_text(text: str, font: ImageFont.FreeTypeFont, max_width_px: int) -> list[str]:
+    """`block_render.wrap_text` before the measurement cache: one full-line `getlength` per word."""
+    lines: list[str] = []
+    current: list[str] = []
+    for word in text.split():
+        candidate = " ".join([*current, word]) if current else word
+        if float(font.getlength(candidate)) <= max_width_px:
+            current.append(word)
+            continue
+        if current:
+            lines.append(" ".join(current))
+        current = [word]
+    if current:
+        lines.append(" ".join(current))
+    return lines
+
+
+def _reference_wrap_legacy(para: str, font: ImageFont.FreeTypeFont, max_width_px: int) -> list[str]:
+    """Line breaking of `draw_wrapped_text_and_get_actual_width` before the measurement cache."""
+    lines: list[str] = []
+    current_line_text = ""
+    for word in para.split(" "):
+        test_line_text = current_line_text + (" " if current_line_text else "") + word
+        if font.getlength(test_line_text) <= max_width_px:
+            current_line_text = test_line_text
+        else:
+            if current_line_text:
+                lines.append(current_line_text)
+            current_line_text = word
+    if current_line_text:
+        lines.append(current_line_text)
+    return lines
+
+
+def _collect_texts(item: Any, out: list[str]) -> None:
+    if isinstance(item, str):
+        out.extend(line for line in item.split("\n") if line.strip())
+    elif isinstance(item, dict):
+        for key, value in item.items():
+            if key not in ("icon", "id", "classification"):
+                _collect_texts(value, out)
+    elif isinstance(item, list):
+        for value in item:
+            _collect_texts(value, out)
+
+
+def load_civ_texts() -> list[str]:
+    if not DATA_DIR.exists():
+        raise SystemExit(f"Missing {DATA_DIR}. Run `uv run aoe2civgen extract` first.")
+    texts: list[str] = []
+    for civ_path in sorted(DATA_DIR.rglob("*.json")):
+        if civ_path.name == "all_civilizations.json" or civ_path.name.startswith("."):
+            continue
+        _collect_texts(json.loads(civ_path.read_text(encoding="utf-8")), texts)
+    return texts
+
+
+def _time(fn: Callable[[], None]) -> float:
+    best = float("inf")
+    for _ in range(ROUNDS):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main() -> None:
+    texts = load_civ_texts()
+    fonts = load_all_fonts_from_config(load_config_file(None))
+    cases = [(text, font, width) for font in fonts for width in WIDTHS_PX for text in texts]
+    print(f"{len(texts)} text lines x {len(fonts)} fonts x {len(WIDTHS_PX)} widths = {len(cases)} wraps")
+
+    mismatches = 0
+    for text, font, width in cases:
+        if wrap_text(text, font, width) != _reference_wrap_text(text, font, width):
+            mismatches += 1
+        if wrap_words(text.split(" "), font, width) != _reference_wrap_legacy(text, font, width):
+            mismatches += 1
+    print(f"mismatches vs reference: {mismatches}")
+
+    def run_reference() -> None:
+        for text, font, width in cases:
+            _reference_wrap_text(text, font, width)
+
+    def run_cold() -> None:
+        text_width.cache_clear()
+        for text, font, width in cases:
+            wrap_text(text, font, width)
+
+    def run_warm() -> None:
+        for text, font, width in cases:
+            wrap_text(text, font, width)
+
+    reference_s = _time(run_reference)
+    cold_s = _time(run_cold)
+    warm_s = _time(run_warm)
+    print(f"reference (getlength per word): {reference_s * 1000:.1f} ms")
+    print(f"wrap_text, empty cache:         {cold_s * 1000:.1f} ms ({reference_s / cold_s:.1f}x)")
+    print(f"wrap_text, warm cache:          {warm_s * 1000:.1f} ms ({reference_s / warm_s:.1f}x)")
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+
+from __future__ import annotations
+
+import sys
+
+from aoe2civgen.generate_images import (
+    load_all_civ_names,
+    load_all_fonts_from_config,
+    load_civ_data,
+    load_config_file,
+    resolve_data_dir,
+)
+from aoe2civgen.site_layout import measure_civ_card
+
+
+def main() -> None:
+    """Print site-renderer card heights per civ (measure pass only, nothing is rasterized)."""
+    locale = sys.argv[1] if len(sys.argv) > 1 else "ru"
+    config = load_config_file(None)
+    config["locale"] = locale
+    fonts = load_all_fonts_from_config(config)
+    data_dir = resolve_data_dir(config, locale=locale)
+
+    heights: list[tuple[str, int]] = []
+    for civ_name in load_all_civ_names(data_dir):
+        civ_data = load_civ_data(civ_name, data_dir=data_dir)
+        if civ_data.get("error"):
+            continue
+        heights.append((civ_name, measure_civ_card(civ_data, config, fonts).height))
+
+    for civ_name, height in sorted(heights, key=lambda item: item[1], reverse=True):
+        print(f"{height:5d}  {civ_name}")
+    if heights:
+        print(f"max {max(h for _, h in heights)} px, min {min(h for _, h in heights)} px over {len(heights)} civs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+
+from __future__ import annotations
+
+import json
+import sys
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from aoe2civgen.aoe2_helptext import html_to_text_fast, html_to_text_soup
+
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+LOCALES_DIR = REPO_ROOT / "aoe2techtree" / "data" / "locales"
+MAX_REPORTED = 20
+
+
+@dataclass
+class LocaleAudit:
+    locale: str
+    total: int = 0
+    fast: int = 0
+    fast_seconds: float = 0.0
+    soup_seconds: float = 0.0
+    mismatches: list[tuple[str, str, str]] = field(default_factory=list)
+
+
+def audit_locale(strings_path: Path) -> LocaleAudit:
+    """Convert every string with both converters; the fast path must match BeautifulSoup wherever it applies."""
+    strings = json.loads(strings_path.read_text(encoding="utf-8"))
+    result = LocaleAudit(locale=strings_path.parent.name)
+    for key, value in strings.items():
+        if not isinstance(value, str) or not value:
+            continue
+        result.total += 1
+        t0 = time.perf_counter()
+        fast = html_to_text_fast(value)
+        t1 = time.perf_counter()
+        soup = html_to_text_soup(value)
+        t2 = time.perf_counter()
+        result.soup_seconds += t2 - t1
+        if fast is None:
+            continue
+        result.fast += 1
+        result.fast_seconds += t1 - t0
+        if fast != soup:
+            result.mismatches.append((key, fast, soup))
+    return result
+
+
+def main() -> None:
+    if not LOCALES_DIR.exists():
+        raise SystemExit(f"Missing {LOCALES_DIR}. Run `git submodule update --init --recursive` first.")
+
+    failed = False
+    for strings_path in sorted(LOCALES_DIR.glob("*/strings.json")):
+        r = audit_locale(strings_path)
+        share = (r.fast / r.total * 100) if r.total else 0.0
+        print(
+            f"{r.locale}: {r.total} strings, fast path {r.fast} ({share:.1f}%), "
+            f"fast {r.fast_seconds * 1000:.1f} ms vs BeautifulSoup {r.soup_seconds * 1000:.1f} ms, "
+            f"mismatches {len(r.mismatches)}"
+        )
+        for key, fast, soup in r.mismatches[:MAX_REPORTED]:
+            print(f"  {key}: fast={fast!r} soup={soup!r}")
+        failed = failed or bool(r.mismatches)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
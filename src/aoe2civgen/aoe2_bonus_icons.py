@@ -3,7 +3,9 @@ from __future__ import annotations
 """Heuristic mapping from RU bonus text to representative icon paths."""
 
 import re
-from typing import Final
+from bisect import bisect_right
+from dataclasses import dataclass, field
+from typing import Final, Iterable, Iterator
 
 
 # NOTE: This map is intentionally heuristic. It tries to pick a representative icon
@@ -183,79 +185,221 @@ KEYWORD_TO_ICON_PATH_MAP: Final[dict[str, str]] = {
 }
 
 
-def classify_bonus(rus_text: str) -> str:
-    txt = rus_text.lower()
-    economic_keywords = [
-        "скорость сбора",
-        "работают",
-        "экономика",
-        "ресурсы",
-        "золото",
-        "дерево",
-        "еда",
-        "камень",
-        "крестьяне",
-        "торговля",
-        "рынок",
-        "дешевле",
-        "стоимость",
-        "бесплатно",
-    ]
-    military_keywords = [
-        "атака",
-        "урон",
-        "скорость атаки",
-        "броня",
-        "защита",
-        "здоровье",
-        "hp",
-        "жизни",
-        "скорость передвижения",
-        "дальность",
-        "юниты",
-        "войска",
-        "армия",
-        "пехота",
-        "лучники",
-        "конница",
-        "кавалерия",
-        "осадные",
-        "корабли",
-        "флот",
-    ]
-    unit_specific_keywords = [
-        "копейщики",
-        "мечники",
-        "арбалетчики",
-        "рыцари",
-        "верблюды",
-        "слоны",
-        "требушеты",
-        "скауты",
-    ]
-    tech_specific_keywords = ["технологии", "улучшения", "исследования", "кузница", "университет", "монастырь", "эпоха"]
-
-    if any(kw in txt for kw in unit_specific_keywords):
-        return "unit_specific"
-    if any(kw in txt for kw in military_keywords):
-        return "military"
-    if any(kw in txt for kw in economic_keywords):
-        return "economic"
-    if any(kw in txt for kw in tech_specific_keywords):
-        return "tech_specific"
-    return "other"
-
-
 def _normalize_for_search(text: str) -> str:
     text = text.lower().replace("\u00a0", " ")
     text = re.sub(r"\s+", " ", text).strip()
     return text
 
 
+class KeywordMatcher:
+    """
+    Compiled multi-keyword substring matcher.
+
+    Keywords are folded into a trie-shaped regex; greedy optional branches make each position yield its longest
+    keyword, and a lookahead lets `finditer` report hits at every position (overlapping ones included).
+    Shorter keywords starting at the same position are exactly the prefixes of that longest hit, so they are
+    precomputed per keyword instead of being searched for.
+    """
+
+    def __init__(self, keywords: Iterable[str]) -> None:
+        self.keywords: tuple[str, ...] = tuple(dict.fromkeys(kw for kw in keywords if kw))
+        keyword_set = set(self.keywords)
+        self._prefix_hits: dict[str, tuple[str, ...]] = {
+            kw: tuple(kw[:i] for i in range(len(kw) + 1) if kw[:i] in keyword_set) for kw in self.keywords
+        }
+        self._pattern: re.Pattern[str] | None = None
+        if self.keywords:
+            # A leading first-character class lets the regex engine skip positions that cannot start a keyword.
+            first_chars = "".join(sorted({kw[0] for kw in self.keywords}))
+            trie = self._trie_pattern(self.keywords)
+            self._pattern = re.compile(f"(?=[{re.escape(first_chars)}])(?=({trie}))")
+
+    @staticmethod
+    def _trie_pattern(keywords: Iterable[str]) -> str:
+        trie: dict[str, dict] = {}
+        for kw in keywords:
+            node = trie
+            for ch in kw:
+                node = node.setdefault(ch, {})
+            node[""] = {}
+
+        def build(node: dict[str, dict]) -> str:
+            branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+            if not branches:
+                return ""
+            body = branches[0] if len(branches) == 1 else f"(?:{'|'.join(branches)})"
+            return f"(?:{body})?" if "" in node else body
+
+        return build(trie)
+
+    def iter_hits(self, text: str) -> Iterator[tuple[int, str]]:
+        """Yield `(position, keyword)` for every occurrence of every keyword in `text`."""
+        if self._pattern is None:
+            return
+        for m in self._pattern.finditer(text):
+            for kw in self._prefix_hits[m.group(1)]:
+                yield m.start(), kw
+
+    def iter_batch_hits(self, texts: list[str], *, separator: str = "\n") -> Iterator[tuple[int, str]]:
+        """
+        Yield `(text_index, keyword)` for every hit in every text, scanning all texts in a single pass.
+        `separator` must not occur inside any keyword, so hits never span two texts.
+        """
+        starts: list[int] = []
+        offset = 0
+        for text in texts:
+            starts.append(offset)
+            offset += len(text) + len(separator)
+        for pos, kw in self.iter_hits(separator.join(texts)):
+            yield bisect_right(starts, pos) - 1, kw
+
+
+def _compile_icon_matcher() -> tuple[KeywordMatcher, dict[str, tuple[int, str]]]:
+    # Priority = position in the "longest keyword first" order (ties keep map order), same as the former linear scan.
+    by_priority = sorted(KEYWORD_TO_ICON_PATH_MAP.keys(), key=len, reverse=True)
+    ranked: dict[str, tuple[int, str]] = {}
+    for rank, keyword in enumerate(by_priority):
+        ranked.setdefault(_normalize_for_search(keyword), (rank, KEYWORD_TO_ICON_PATH_MAP[keyword]))
+    return KeywordMatcher(ranked), ranked
+
+
+_ICON_MATCHER, _ICON_KEYWORD_RANKS = _compile_icon_matcher()
+
+
 def find_icon_for_bonus(bonus_text: str) -> str | None:
-    bonus_text_lower = _normalize_for_search(bonus_text)
-    sorted_keywords = sorted(KEYWORD_TO_ICON_PATH_MAP.keys(), key=len, reverse=True)
-    for keyword in sorted_keywords:
-        if _normalize_for_search(keyword) in bonus_text_lower:
-            return KEYWORD_TO_ICON_PATH_MAP[keyword]
-    return None
+    best: tuple[int, str] | None = None
+    for _, keyword in _ICON_MATCHER.iter_hits(_normalize_for_search(bonus_text)):
+        candidate = _ICON_KEYWORD_RANKS[keyword]
+        if best is None or candidate < best:
+            best = candidate
+    return best[1] if best else None
+
+
+def find_icons_for_bonuses(bonus_texts: Iterable[str]) -> list[str | None]:
+    """
+    Batch form of `find_icon_for_bonus` (e.g. every bonus/team bonus of every civ at once).
+    Normalized texts never contain newlines, so all of them are scanned in a single pass.
+    """
+    normalized = [_normalize_for_search(t) for t in bonus_texts]
+    best: list[tuple[int, str] | None] = [None] * len(normalized)
+    for idx, keyword in _ICON_MATCHER.iter_batch_hits(normalized):
+        candidate = _ICON_KEYWORD_RANKS[keyword]
+        current = best[idx]
+        if current is None or candidate < current:
+            best[idx] = candidate
+    return [b[1] if b else None for b in best]
+
+
+# Bonus classes in priority order: the first class with any keyword hit wins.
+BONUS_CLASS_KEYWORDS: Final[tuple[tuple[str, tuple[str, ...]], ...]] = (
+    (
+        "unit_specific",
+        (
+            "копейщики",
+            "мечники",
+            "арбалетчики",
+            "рыцари",
+            "верблюды",
+            "слоны",
+            "требушеты",
+            "скауты",
+        ),
+    ),
+    (
+        "military",
+        (
+            "атака",
+            "урон",
+            "скорость атаки",
+            "броня",
+            "защита",
+            "здоровье",
+            "hp",
+            "жизни",
+            "скорость передвижения",
+            "дальность",
+            "юниты",
+            "войска",
+            "армия",
+            "пехота",
+            "лучники",
+            "конница",
+            "кавалерия",
+            "осадные",
+            "корабли",
+            "флот",
+        ),
+    ),
+    (
+        "economic",
+        (
+            "скорость сбора",
+            "работают",
+            "экономика",
+            "ресурсы",
+            "золото",
+            "дерево",
+            "еда",
+            "камень",
+            "крестьяне",
+            "торговля",
+            "рынок",
+            "дешевле",
+            "стоимость",
+            "бесплатно",
+        ),
+    ),
+    ("tech_specific", ("технологии", "улучшения", "исследования", "кузница", "университет", "монастырь", "эпоха")),
+)
+_BONUS_CLASS_FALLBACK = "other"
+
+
+@dataclass(frozen=True)
+class BonusClassification:
+    label: str
+    # Class -> matched keywords (first-occurrence order in the text), for every class with at least one hit.
+    matches: dict[str, tuple[str, ...]] = field(default_factory=dict)
+
+    @property
+    def keywords(self) -> tuple[str, ...]:
+        return self.matches.get(self.label, ())
+
+
+def _compile_class_matcher() -> tuple[KeywordMatcher, dict[str, tuple[str, ...]]]:
+    classes_by_keyword: dict[str, list[str]] = {}
+    for label, keywords in BONUS_CLASS_KEYWORDS:
+        for keyword in keywords:
+            classes_by_keyword.setdefault(keyword, []).append(label)
+    return KeywordMatcher(classes_by_keyword), {k: tuple(v) for k, v in classes_by_keyword.items()}
+
+
+_CLASS_MATCHER, _CLASSES_BY_KEYWORD = _compile_class_matcher()
+
+
+def _classification_from_hits(hits: Iterable[tuple[int, str]]) -> BonusClassification:
+    found: dict[str, dict[str, None]] = {}
+    for _, keyword in sorted(hits):
+        for label in _CLASSES_BY_KEYWORD[keyword]:
+            found.setdefault(label, {})[keyword] = None
+    label = next((lbl for lbl, _ in BONUS_CLASS_KEYWORDS if lbl in found), _BONUS_CLASS_FALLBACK)
+    matches = {lbl: tuple(found[lbl]) for lbl, _ in BONUS_CLASS_KEYWORDS if lbl in found}
+    return BonusClassification(label=label, matches=matches)
+
+
+def classify_bonus_detailed(rus_text: str) -> BonusClassification:
+    """Classify a bonus text in one pass over it; also reports which keywords of each class matched."""
+    return _classification_from_hits(_CLASS_MATCHER.iter_hits(rus_text.lower()))
+
+
+def classify_bonus(rus_text: str) -> str:
+    return classify_bonus_detailed(rus_text).label
+
+
+def classify_bonuses(texts: Iterable[str]) -> list[BonusClassification]:
+    """Batch form of `classify_bonus_detailed` (patch notes, mod civ descriptions, ...): one scan over all texts."""
+    lowered = [t.lower() for t in texts]
+    hits: list[list[tuple[int, str]]] = [[] for _ in lowered]
+    # Positions only order hits within one text, so the batch offset is irrelevant here.
+    for order, (idx, keyword) in enumerate(_CLASS_MATCHER.iter_batch_hits(lowered)):
+        hits[idx].append((order, keyword))
+    return [_classification_from_hits(h) for h in hits]
@@ -4,6 +4,7 @@ from __future__ import annotations
 
 import re
 from dataclasses import dataclass, field
+from functools import lru_cache
 from typing import Iterable
 
 from bs4 import BeautifulSoup
@@ -39,12 +40,66 @@ _SECTION_HEADERS: dict[str, str] = {
 }
 
 
+_BR_RE = re.compile(r"<br\s*/?>", flags=re.IGNORECASE)
+# Attribute-less inline tags (`<b>`, `</i>`, `<cost>`, ...): `html.parser` drops them and keeps the text around them.
+# Raw-text and whitespace-preserving elements (`script`, `pre`, ...) change how the parser reads what follows, so they are left to BeautifulSoup.
+_RAW_TEXT_TAGS = "script|style|textarea|title|xmp|iframe|noembed|noframes|noscript|plaintext|pre"
+_SIMPLE_TAG_RE = re.compile(rf"</?(?!(?:{_RAW_TEXT_TAGS})\b)[a-zA-Z][a-zA-Z0-9]*\s*/?>", flags=re.IGNORECASE)
+_SIMPLE_ENTITIES: dict[str, str] = {
+    "&amp;": "&",
+    "&lt;": "<",
+    "&gt;": ">",
+    "&quot;": '"',
+    "&apos;": "'",
+    "&nbsp;": "\u00a0",
+}
+_ENTITY_RE = re.compile(r"&[a-zA-Z]+;")
+_ASCII_SPACES = " \n\t\x0c\r"
+
+
+def _decode_simple_entities(segment: str) -> str | None:
+    parts = _ENTITY_RE.split(segment)
+    entities = _ENTITY_RE.findall(segment)
+    if any("&" in part for part in parts) or any(entity not in _SIMPLE_ENTITIES for entity in entities):
+        return None
+    return "".join(part + _SIMPLE_ENTITIES[entity] for part, entity in zip(parts, entities)) + parts[-1]
+
+
+def html_to_text_fast(html_text: str) -> str | None:
+    """
+    Streaming conversion for the markup subset used in `strings.json` (`<br>`, simple inline tags, basic entities).
+    Returns None when the text contains anything else, so the caller can fall back to BeautifulSoup.
+    """
+    text = _BR_RE.sub("\n", html_text)
+    if "<" not in text and "&" not in text and text.strip(_ASCII_SPACES):
+        return text
+    # Text between tags is decoded segment by segment, like the parser does.
+    out: list[str] = []
+    for segment in _SIMPLE_TAG_RE.split(text):
+        if "<" in segment:
+            return None
+        if "&" in segment:
+            decoded = _decode_simple_entities(segment)
+            if decoded is None:
+                return None
+            segment = decoded
+        if segment and not segment.strip(_ASCII_SPACES):
+            # BeautifulSoup collapses whitespace-only strings between tags.
+            segment = "\n" if "\n" in segment else " "
+        out.append(segment)
+    return "".join(out)
+
+
+def html_to_text_soup(html_text: str) -> str:
+    return BeautifulSoup(_BR_RE.sub("\n", html_text), "html.parser").get_text()
+
+
+@lru_cache(maxsize=8192)
 def html_to_text(html_text: str) -> str:
     if not html_text:
         return ""
-    text_with_newlines = re.sub(r"<br\s*/?>", "\n", html_text, flags=re.IGNORECASE)
-    soup = BeautifulSoup(text_with_newlines, "html.parser")
-    return soup.get_text()
+    fast = html_to_text_fast(html_text)
+    return fast if fast is not None else html_to_text_soup(html_text)
 
 
 def _iter_non_empty_lines(text: str) -> Iterable[str]:
@@ -0,0 +1,269 @@
+"""Atlas output: pack the civ cards of one render variant into a few sprite sheets plus a JSON index of rectangles."""
+
+from __future__ import annotations
+
+import hashlib
+import itertools
+import json
+import math
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+from PIL import Image
+
+from aoe2civgen.encoders import encode_image, load_encoder_settings, normalize_format
+from aoe2civgen.image_writer import write_atomic
+from aoe2civgen.render_manifest import hash_file
+from aoe2civgen.render_scale import scale_suffix
+
+
+OUTPUT_MODES = ("files", "atlas", "both")
+DEFAULT_ATLAS_PATH = "stream_images/atlas/{locale}/atlas-{page}.{format}"
+DEFAULT_INDEX_NAME = "atlas.json"
+_ATLAS_INDEX_VERSION = 1
+
+
+@dataclass(frozen=True)
+class AtlasSettings:
+    # Page template; `{page}` is the 0-based page number. The index is written next to it.
+    output_path: str = DEFAULT_ATLAS_PATH
+    index_name: str = DEFAULT_INDEX_NAME
+    # Upper bound of a page side: a column that would grow past it starts a new page.
+    max_size: int = 4096
+    # Gap between cards (and no outer margin), so bilinear sampling of one card never bleeds into its neighbour.
+    padding: int = 2
+    # 0 = as many columns as makes a page roughly square (within `max_size`).
+    columns: int = 0
+
+
+def load_atlas_settings(config: dict) -> AtlasSettings:
+    atlas_cfg = (config.get("output", {}) or {}).get("atlas", {}) or {}
+    return AtlasSettings(
+        output_path=str(atlas_cfg.get("output_path") or DEFAULT_ATLAS_PATH),
+        index_name=str(atlas_cfg.get("index_name") or DEFAULT_INDEX_NAME),
+        max_size=max(1, int(atlas_cfg.get("max_size", 4096))),
+        padding=max(0, int(atlas_cfg.get("padding", 2))),
+        columns=max(0, int(atlas_cfg.get("columns", 0) or 0)),
+    )
+
+
+def output_mode(config: dict, override: str | None = None) -> str:
+    mode = str(override or (config.get("output", {}) or {}).get("mode") or "files").strip().lower()
+    if mode not in OUTPUT_MODES:
+        raise ValueError(f"Неизвестный режим вывода '{mode}' (ожидается: {', '.join(OUTPUT_MODES)}).")
+    return mode
+
+
+@dataclass(frozen=True)
+class AtlasCard:
+    key: str  # civ file stem, unique within a variant
+    civ_id: str
+    name: str
+    width: int
+    height: int
+
+
+@dataclass(frozen=True)
+class AtlasRect:
+    key: str
+    civ_id: str
+    name: str
+    page: int
+    x: int
+    y: int
+    width: int
+    height: int
+
+
+@dataclass(frozen=True)
+class AtlasPage:
+    width: int
+    height: int
+    rects: tuple[AtlasRect, ...]
+
+
+def _column_count(cards: list[AtlasCard], column_width: int, settings: AtlasSettings) -> int:
+    fit = max(1, (settings.max_size + settings.padding) // (column_width + settings.padding))
+    if settings.columns:
+        return min(settings.columns, fit)
+    # Square page: `columns * column_width ~= total_height / columns`.
+    total_height = sum(card.height + settings.padding for card in cards)
+    return max(1, min(fit, len(cards), round(math.sqrt(total_height / (column_width + settings.padding)))))
+
+
+def pack_cards(cards: list[AtlasCard], settings: AtlasSettings) -> list[AtlasPage]:
+    """
+    Shortest-column packing: cards share a width, so tallest-first into the currently shortest column
+    keeps the columns level. Sorting by (height, id, key) and breaking column ties by index makes the result
+    a pure function of the card sizes — the same inputs always give byte-identical atlases and index.
+    Raises ValueError for a card larger than `max_size`: no page could hold it.
+    """
+    if not cards:
+        return []
+    for card in cards:
+        if card.width > settings.max_size or card.height > settings.max_size:
+            raise ValueError(
+                f"Карточка '{card.key}' ({card.width}×{card.height}px) больше `output.atlas.max_size` "
+                f"({settings.max_size}px): увеличьте его."
+            )
+    pad = settings.padding
+    column_width = max(card.width for card in cards)
+    columns = _column_count(cards, column_width, settings)
+    ordered = sorted(cards, key=lambda c: (-c.height, c.civ_id, c.key))
+
+    pages: list[AtlasPage] = []
+    heights = [0] * columns
+    rects: list[AtlasRect] = []
+
+    def close_page() -> None:
+        used = [i for i, h in enumerate(heights) if h]
+        width = (max(used) + 1) * (column_width + pad) - pad
+        pages.append(AtlasPage(width=width, height=max(heights) - pad, rects=tuple(rects)))
+
+    for card in ordered:
+        column = min(range(columns), key=lambda i: (heights[i], i))
+        if heights[column] and heights[column] + card.height > settings.max_size:
+            close_page()
+            heights = [0] * columns
+            rects = []
+            column = 0
+        rects.append(AtlasRect(
+            key=card.key, civ_id=card.civ_id, name=card.name, page=len(pages),
+            x=column * (column_width + pad), y=heights[column], width=card.width, height=card.height,
+        ))
+        heights[column] += card.height + pad
+    close_page()
+    return pages
+
+
+def compose_page(page: AtlasPage, images: dict[str, Image.Image]) -> Image.Image:
+    sheet = Image.new("RGBA", (page.width, page.height), (0, 0, 0, 0))
+    for rect in page.rects:
+        card = images[rect.key]
+        sheet.paste(card.convert("RGBA") if card.mode != "RGBA" else card, (rect.x, rect.y))
+    return sheet
+
+
+def _atlas_path(template: str, *, page: int, locale: str, theme: str, scale: float, fmt: str) -> Path:
+    path = Path(template.format(page=page, locale=locale, theme=theme, scale=scale_suffix(scale).lstrip("@"), format=fmt))
+    if scale != 1 and "{scale}" not in template:
+        # Same rule as card files: without `{scale}` in the template, HiDPI pages get an `@2x` suffix.
+        path = path.with_name(f"{path.stem}{scale_suffix(scale)}{path.suffix}")
+    return path
+
+
+def atlas_page_path(config: dict, *, basedir: Path, page: int, locale: str, theme: str, scale: float) -> Path:
+    settings = load_atlas_settings(config)
+    fmt = normalize_format((config.get("output", {}) or {}).get("format", "png"))
+    return basedir / _atlas_path(settings.output_path, page=page, locale=locale, theme=theme, scale=scale, fmt=fmt)
+
+
+def atlas_index_path(config: dict, *, basedir: Path, locale: str, theme: str, scale: float) -> Path:
+    """The index sits next to the first page."""
+    settings = load_atlas_settings(config)
+    page_dir = atlas_page_path(config, basedir=basedir, page=0, locale=locale, theme=theme, scale=scale).parent
+    return page_dir / _atlas_path(settings.index_name, page=0, locale=locale, theme=theme, scale=scale, fmt="json")
+
+
+def read_atlas_pages(index_path: Path) -> list[Path] | None:
+    """Page files listed by an existing index, or None when there is no readable index."""
+    try:
+        with open(index_path, "r", encoding="utf-8") as f:
+            pages = json.load(f).get("pages")
+        return [index_path.parent / str(page["file"]) for page in pages]
+    except (OSError, ValueError, AttributeError, KeyError, TypeError):
+        return None
+
+
+def atlas_digest(card_digests: dict[str, str], config: dict) -> str:
+    """Input digest of a whole atlas: every card's render digest, the atlas settings and this module."""
+    payload = json.dumps(
+        {
+            "version": _ATLAS_INDEX_VERSION,
+            "cards": dict(sorted(card_digests.items())),
+            "atlas": asdict(load_atlas_settings(config)),
+            "code": hash_file(Path(__file__).resolve()),
+        },
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def write_atlas(
+        images: dict[str, Image.Image], civs: dict[str, dict], config: dict, *,
+        basedir: Path, locale: str, theme: str, scale: float,
+        ) -> tuple[Path, list[Path]]:
+    """
+    Pack `images` (civ file stem -> card), write the pages with the configured encoder and the JSON index.
+    The index maps civ ids to rectangles (`civs`) and localized names to ids (`names`); page files are
+    referenced relative to the index. Pages of an earlier, longer atlas are deleted. Returns (index path, page paths).
+    """
+    settings = load_atlas_settings(config)
+    encoder = load_encoder_settings(config)
+    cards = [
+        AtlasCard(
+            key=key,
+            civ_id=str((civs.get(key) or {}).get("id") or key),
+            name=str((civs.get(key) or {}).get("name") or key),
+            width=image.width,
+            height=image.height,
+        )
+        for key, image in images.items()
+    ]
+    pages = pack_cards(cards, settings)
+    if len(pages) > 1 and "{page}" not in settings.output_path:
+        raise ValueError(
+            f"Атлас не помещается в одну страницу {settings.max_size}px: добавьте `{{page}}` в `output.atlas.output_path`."
+        )
+
+    page_paths = [
+        atlas_page_path(config, basedir=basedir, page=i, locale=locale, theme=theme, scale=scale)
+        for i in range(len(pages))
+    ]
+    index_path = atlas_index_path(config, basedir=basedir, locale=locale, theme=theme, scale=scale)
+    index_path.parent.mkdir(parents=True, exist_ok=True)
+    previous_pages = read_atlas_pages(index_path) or []
+
+    index_pages = []
+    for page, page_path in zip(pages, page_paths):
+        page_path.parent.mkdir(parents=True, exist_ok=True)
+        encoded = encode_image(compose_page(page, images), encoder)
+        write_atomic(page_path, encoded.data)
+        index_pages.append({
+            "file": page_path.relative_to(index_path.parent).as_posix()
+            if page_path.is_relative_to(index_path.parent) else page_path.as_posix(),
+            "width": page.width,
+            "height": page.height,
+            "bytes": len(encoded.data),
+        })
+
+    rects = sorted((rect for page in pages for rect in page.rects), key=lambda r: (r.civ_id, r.key))
+    index = {
+        "version": _ATLAS_INDEX_VERSION,
+        "locale": locale,
+        "theme": theme,
+        "scale": scale,
+        "pages": index_pages,
+        "civs": {
+            rect.civ_id: {
+                "name": rect.name, "file": rect.key, "page": rect.page,
+                "x": rect.x, "y": rect.y, "w": rect.width, "h": rect.height,
+            }
+            for rect in rects
+        },
+        "names": {rect.name: rect.civ_id for rect in rects},
+    }
+    write_atomic(index_path, json.dumps(index, ensure_ascii=False, indent=2).encode("utf-8"))
+
+    # Pages the new index no longer references: listed by the previous index, or numbered past the last page.
+    stale_pages = [path for path in previous_pages if path not in page_paths]
+    if "{page}" in settings.output_path:
+        for page in itertools.count(len(pages)):
+            path = atlas_page_path(config, basedir=basedir, page=page, locale=locale, theme=theme, scale=scale)
+            if not path.is_file():
+                break
+            stale_pages.append(path)
+    for path in stale_pages:
+        path.unlink(missing_ok=True)
+    return index_path, page_paths
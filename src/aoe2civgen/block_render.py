@@ -1,11 +1,15 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from functools import lru_cache
+from pathlib import Path
 import re
-from typing import Iterable
+from typing import Iterable, Union
 
 from PIL import Image, ImageColor, ImageDraw, ImageFont
 
+from aoe2civgen.icon_cache import load_icon
+
 
 @dataclass(frozen=True)
 class BlockTheme:
@@ -21,7 +25,7 @@ class BlockTheme:
 @dataclass(frozen=True)
 class TextStyle:
     font: ImageFont.FreeTypeFont
-    color: tuple[int, int, int]
+    color: tuple[int, int, int] | str
     line_height_px: int
 
 
@@ -31,7 +35,81 @@ class TextRun:
     style: TextStyle
 
 
-def _text_width(font: ImageFont.FreeTypeFont, text: str) -> float:
+@dataclass(frozen=True)
+class TextOp:
+    x: float
+    y: float
+    text: str
+    font: ImageFont.FreeTypeFont
+    color: tuple[int, ...] | str  # an RGB(A) tuple or a palette role resolved at paint time
+
+
+@dataclass(frozen=True)
+class IconOp:
+    x: int
+    y: int
+    ref: str  # icon path as referenced by the civ JSON (used in warnings)
+    path: Path
+    size: int
+    # Context for the "missing/failed icon" warnings; None = skip such icons silently.
+    warn_context: str | None = None
+
+
+@dataclass(frozen=True)
+class BlockOp:
+    x0: int
+    y0: int
+    x1: int
+    y1: int
+
+
+@dataclass
+class DisplayList:
+    """
+    Positioned draw operations of one card: recorded by a measure pass, replayed by a paint pass onto canvases
+    of the exact final size. `text()` mirrors `ImageDraw.text`, so the drawing helpers below record into it as is.
+    """
+
+    content: list[Union[TextOp, IconOp]] = field(default_factory=list)
+    blocks: list[BlockOp] = field(default_factory=list)
+
+    def text(
+            self, xy: tuple[float, float], text: str, font: ImageFont.FreeTypeFont, fill: tuple[int, ...] | str
+            ) -> None:
+        self.content.append(TextOp(x=xy[0], y=xy[1], text=text, font=font, color=fill))
+
+    def icon(self, x: int, y: int, ref: str, path: Path, size: int, *, warn_context: str | None = None) -> None:
+        self.content.append(IconOp(x=x, y=y, ref=ref, path=path, size=size, warn_context=warn_context))
+
+    def block(self, x0: int, y0: int, x1: int, y1: int) -> None:
+        self.blocks.append(BlockOp(x0=x0, y0=y0, x1=x1, y1=y1))
+
+    def paint_blocks(self, layer: Image.Image, theme: BlockTheme) -> None:
+        for op in self.blocks:
+            draw_block_background(layer, op.x0, op.y0, op.x1, op.y1, theme)
+
+    def paint_content(self, layer: Image.Image, palette: dict[str, tuple[int, ...]] | None = None) -> None:
+        draw = ImageDraw.Draw(layer)
+        for op in self.content:
+            if isinstance(op, TextOp):
+                color = palette[op.color] if isinstance(op.color, str) and palette else op.color
+                draw.text((op.x, op.y), op.text, font=op.font, fill=color)
+                continue
+            if not op.path.exists():
+                if op.warn_context is not None:
+                    print(f"WARNING: missing icon file: {op.ref} ({op.warn_context})")
+                continue
+            try:
+                icon = load_icon(op.path, op.size)
+                layer.paste(icon, (op.x, op.y), icon)
+            except Exception as e:
+                if op.warn_context is not None:
+                    print(f"WARNING: failed to render icon: {op.ref} ({e})")
+
+
+# Fonts are long-lived (loaded once per process), so keying by the font object itself is keying by font identity.
+@lru_cache(maxsize=65536)
+def text_width(font: ImageFont.FreeTypeFont, text: str) -> float:
     try:
         return float(font.getlength(text))
     except Exception:
@@ -39,26 +117,43 @@ def _text_width(font: ImageFont.FreeTypeFont, text: str) -> float:
         return float(bbox[2] - bbox[0])
 
 
-def wrap_text(text: str, font: ImageFont.FreeTypeFont, max_width_px: int) -> list[str]:
-    words = text.split()
-    if not words:
-        return []
+def wrap_words(words: list[str], font: ImageFont.FreeTypeFont, max_width_px: float) -> list[str]:
+    """
+    Greedy wrap with the same result as growing `line + " " + word` while `width(line) <= max_width_px`.
 
+    The break is estimated from cached word widths plus the space width, then confirmed on the whole line
+    (kerning can shift it by a word either way), so each line costs a couple of full-line measurements
+    instead of one per word. Empty words (from `split(" ")`) are dropped at line starts, like the original loop.
+    """
+    space_w = text_width(font, " ")
     lines: list[str] = []
-    current: list[str] = []
-    for word in words:
-        candidate = " ".join([*current, word]) if current else word
-        if _text_width(font, candidate) <= max_width_px:
-            current.append(word)
+    n = len(words)
+    i = 0
+    while i < n:
+        if not words[i]:
+            i += 1
             continue
-        if current:
-            lines.append(" ".join(current))
-        current = [word]
-    if current:
-        lines.append(" ".join(current))
+        estimate = text_width(font, words[i])
+        k = i + 1
+        while k < n:
+            extended = estimate + space_w + text_width(font, words[k])
+            if extended > max_width_px:
+                break
+            estimate = extended
+            k += 1
+        while k < n and text_width(font, " ".join(words[i:k + 1])) <= max_width_px:
+            k += 1
+        while k > i + 1 and text_width(font, " ".join(words[i:k])) > max_width_px:
+            k -= 1
+        lines.append(" ".join(words[i:k]))
+        i = k
     return lines
 
 
+def wrap_text(text: str, font: ImageFont.FreeTypeFont, max_width_px: int) -> list[str]:
+    return wrap_words(text.split(), font, max_width_px)
+
+
 def wrap_text_runs(runs: Iterable[TextRun], max_width_px: int) -> list[list[TextRun]]:
     tokens: list[TextRun] = []
     for run in runs:
@@ -75,7 +170,7 @@ def wrap_text_runs(runs: Iterable[TextRun], max_width_px: int) -> list[list[Text
         if token.text == " " and not current:
             continue
 
-        token_w = _text_width(token.style.font, token.text)
+        token_w = text_width(token.style.font, token.text)
         if current and (current_w + token_w) > max_width_px:
             # flush current line; skip leading spaces on next line
             lines.append(_merge_adjacent_runs(current))
@@ -106,20 +201,20 @@ def _merge_adjacent_runs(tokens: list[TextRun]) -> list[TextRun]:
     return merged
 
 
-def draw_text_runs(draw: ImageDraw.ImageDraw, lines: list[list[TextRun]], x: int, y: int, line_height_px: int) -> int:
+def draw_text_runs(draw: ImageDraw.ImageDraw | DisplayList, lines: list[list[TextRun]], x: int, y: int, line_height_px: int) -> int:
     current_y = y
     for line in lines:
         current_x = x
         for run in line:
             if run.text:
                 draw.text((current_x, current_y), run.text, font=run.style.font, fill=run.style.color)
-                current_x += int(round(_text_width(run.style.font, run.text)))
+                current_x += int(round(text_width(run.style.font, run.text)))
         current_y += int(line_height_px)
     return int(current_y)
 
 
 def draw_paragraph(
-    draw: ImageDraw.ImageDraw,
+    draw: ImageDraw.ImageDraw | DisplayList,
     text: str,
     x: int,
     y: int,
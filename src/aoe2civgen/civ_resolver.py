@@ -0,0 +1,189 @@
+"""Civilization lookup for chat bots: civ ids, localized names and abbreviations -> the civ's image per locale."""
+
+from __future__ import annotations
+
+import heapq
+import json
+import re
+import unicodedata
+from collections import Counter
+from dataclasses import dataclass
+from typing import Iterable
+
+from aoe2civgen.generate_images import extracted_locales, resolve_data_dir
+
+# Community short names that are not plain prefixes of a civ name (prefixes like `byz`, `brit` work on their own).
+KNOWN_ALIASES: dict[str, str] = {
+    "brits": "BRITONS",
+    "bulgs": "BULGARIANS",
+    "burgs": "BURGUNDIANS",
+    "ethios": "ETHIOPIANS",
+    "hindus": "HINDUSTANIS",
+    "indians": "HINDUSTANIS",
+    "malis": "MALIANS",
+    "mongs": "MONGOLS",
+    "teuts": "TEUTONS",
+    "viks": "VIKINGS",
+    "бриты": "BRITONS",
+    "визы": "BYZANTINES",
+    "индусы": "HINDUSTANIS",
+    "монги": "MONGOLS",
+    "тевты": "TEUTONS",
+}
+
+# Unambiguous prefixes of at least this many characters resolve exactly (`aztec` -> AZTECS).
+MIN_PREFIX_LENGTH = 3
+# Fuzzy budget: queries are cut to this length, and at most this many candidates are scored.
+MAX_QUERY_LENGTH = 32
+MAX_FUZZY_CANDIDATES = 8
+# Trigrams shared by more aliases than this (`  a`, `ans`) carry no signal and are not walked.
+MAX_TRIGRAM_POSTINGS = 48
+# Minimal Dice similarity of the trigram sets for a fuzzy match.
+MIN_SIMILARITY = 0.3
+# A fuzzy match must beat the best other civ by this much; closer runners-up make the query ambiguous.
+MIN_SCORE_MARGIN = 0.05
+
+_NON_WORD_RE = re.compile(r"[\W_]+")
+
+
+def normalize_query(text: str) -> str:
+    """Case-folded, accents and `ё` folded, spaces/punctuation removed: `Ацтёки `, `aztecs!` -> `ацтеки`, `aztecs`."""
+    folded = unicodedata.normalize("NFKD", text.casefold().replace("ё", "е"))
+    folded = "".join(ch for ch in folded if not unicodedata.combining(ch))
+    return _NON_WORD_RE.sub("", folded)
+
+
+def _trigrams(key: str) -> set[str]:
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+@dataclass(frozen=True)
+class Resolution:
+    # None when the query is ambiguous.
+    civ_id: str | None
+    # `id`, `name`, `alias`, `prefix` (all exact dict hits), `fuzzy` or `ambiguous`.
+    match: str
+    score: float = 1.0
+    # `ambiguous` only: the competing civ ids, best first.
+    candidates: tuple[str, ...] = ()
+
+    @property
+    def ambiguous(self) -> bool:
+        return self.civ_id is None
+
+
+class CivResolver:
+    """
+    Built once from each locale's `all_civilizations.json`. Exact lookups (id, any localized name, known alias,
+    prefix) are a single dict hit; the trigram fallback walks only selective trigrams (`MAX_TRIGRAM_POSTINGS`)
+    and scores at most `MAX_FUZZY_CANDIDATES` aliases.
+    A prefix shared by several civs, or a typo about as close to two civs, resolves to `ambiguous`, never to a guess.
+    """
+
+    def __init__(self, civ_names: dict[str, dict[str, str]], aliases: dict[str, str] | None = None) -> None:
+        """`civ_names`: locale -> {civ id: file stem of the civ's image in that locale}."""
+        self._stems = {locale: dict(names) for locale, names in civ_names.items()}
+        known_ids = {civ_id for names in self._stems.values() for civ_id in names}
+
+        self._exact: dict[str, Resolution] = {}
+        for civ_id in sorted(known_ids):
+            self._add(normalize_query(civ_id), Resolution(civ_id, "id"))
+        for locale in sorted(self._stems):
+            for civ_id, stem in sorted(self._stems[locale].items()):
+                self._add(normalize_query(stem), Resolution(civ_id, "name"))
+        for alias, civ_id in sorted((aliases if aliases is not None else KNOWN_ALIASES).items()):
+            if civ_id in known_ids:
+                self._add(normalize_query(alias), Resolution(civ_id, "alias"))
+
+        # A prefix shared by two civs (`bur`: Burgundians, Burmese) is ambiguous rather than left to a fuzzy guess.
+        prefix_ids: dict[str, set[str]] = {}
+        for key, resolution in self._exact.items():
+            for end in range(MIN_PREFIX_LENGTH, len(key)):
+                prefix_ids.setdefault(key[:end], set()).add(str(resolution.civ_id))
+        self._prefixes = {
+            prefix: (
+                Resolution(next(iter(ids)), "prefix")
+                if len(ids) == 1
+                else Resolution(None, "ambiguous", candidates=tuple(sorted(ids)))
+            )
+            for prefix, ids in prefix_ids.items()
+            if prefix not in self._exact
+        }
+
+        self._trigram_index: dict[str, list[str]] = {}
+        for key in sorted(self._exact):
+            for gram in _trigrams(key):
+                self._trigram_index.setdefault(gram, []).append(key)
+
+    def _add(self, key: str, resolution: Resolution) -> None:
+        # First writer wins: ids, then names, then aliases, so an alias never shadows a real name.
+        if key and key not in self._exact:
+            self._exact[key] = resolution
+
+    @classmethod
+    def load(cls, config: dict | None = None, locales: Iterable[str] | None = None) -> "CivResolver":
+        """
+        Reads `all_civilizations.json` from each locale's data directory, resolved like `generate` and `/render` do
+        (`input.data_dir` of `config`). `locales`: default every locale extracted there.
+        """
+        config = config or {}
+        civ_names: dict[str, dict[str, str]] = {}
+        for locale in (locales if locales is not None else extracted_locales(config)):
+            index_path = resolve_data_dir(config, locale=locale) / "all_civilizations.json"
+            if not index_path.is_file():
+                continue
+            try:
+                with open(index_path, "r", encoding="utf-8") as f:
+                    civs = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"WARNING: Не удалось прочитать {index_path}: {e}")
+                continue
+            if not isinstance(civs, dict):
+                continue
+            # Keys are the file stems written by `extract` (and the image names written by `generate`).
+            civ_names[locale] = {
+                str(civ.get("id") or stem): str(stem) for stem, civ in civs.items() if isinstance(civ, dict)
+            }
+        return cls(civ_names)
+
+    @property
+    def locales(self) -> list[str]:
+        return sorted(self._stems)
+
+    def resolve(self, query: str) -> Resolution | None:
+        key = normalize_query(query[: MAX_QUERY_LENGTH * 2])[:MAX_QUERY_LENGTH]
+        if not key:
+            return None
+        exact = self._exact.get(key) or self._prefixes.get(key)
+        if exact is not None:
+            return exact
+        return self._fuzzy(key)
+
+    def _fuzzy(self, key: str) -> Resolution | None:
+        grams = _trigrams(key)
+        shared: Counter[str] = Counter()
+        for gram in grams:
+            postings = self._trigram_index.get(gram, ())
+            if len(postings) <= MAX_TRIGRAM_POSTINGS:
+                shared.update(postings)
+        shortlist = heapq.nsmallest(MAX_FUZZY_CANDIDATES, shared.items(), key=lambda item: (-item[1], item[0]))
+        # Best score per civ: several aliases of one civ are not competitors.
+        civ_scores: dict[str, float] = {}
+        for candidate, _ in shortlist:
+            # Skipped trigrams still count here: the shortlist is bounded, the score is the full Dice similarity.
+            candidate_grams = _trigrams(candidate)
+            score = 2 * len(grams & candidate_grams) / (len(grams) + len(candidate_grams))
+            civ_id = str(self._exact[candidate].civ_id)
+            civ_scores[civ_id] = max(score, civ_scores.get(civ_id, 0.0))
+        ranked = sorted(civ_scores.items(), key=lambda item: (-item[1], item[0]))
+        if not ranked or ranked[0][1] < MIN_SIMILARITY:
+            return None
+        best_id, best_score = ranked[0]
+        close = [civ_id for civ_id, score in ranked if best_score - score < MIN_SCORE_MARGIN]
+        if len(close) > 1:
+            return Resolution(None, "ambiguous", round(best_score, 3), candidates=tuple(close))
+        return Resolution(best_id, "fuzzy", round(best_score, 3))
+
+    def image_stem(self, civ_id: str | None, locale: str) -> str | None:
+        return self._stems.get(locale, {}).get(civ_id)
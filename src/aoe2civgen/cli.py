@@ -21,25 +21,84 @@ def _cmd_init_config() -> int:
     return 0
 
 
+def _split_list(values: list[str]) -> list[str]:
+    return [item.strip() for value in values for item in value.split(",") if item.strip()]
+
+
 def _build_parser() -> argparse.ArgumentParser:
     p = argparse.ArgumentParser(prog="aoe2civgen")
     sub = p.add_subparsers(dest="command", required=True)
 
     sub.add_parser("init-config", help="Create config.yaml from config.example.yaml (if missing).")
     extract_p = sub.add_parser("extract", help="Extract AoE2 civ data into data/ and icons/.")
-    extract_p.add_argument("--locale", default="ru", help="Locale code (e.g. ru, en).")
+    extract_p.add_argument("--locale", default="ru", help="Locale code(s): ru, en, a comma list (ru,en) or all.")
+    extract_p.add_argument("--force", action="store_true", help="Re-extract all civs, ignoring the extract state.")
 
     gen_p = sub.add_parser("generate", help="Generate images from data/ and config.yaml.")
-    gen_p.add_argument("--locale", default="ru", help="Locale code (e.g. ru, en).")
+    gen_p.add_argument("--locale", default="ru", help="Locale code(s): ru, en, a comma list (ru,en) or all.")
     gen_p.add_argument("--config", default=None, help="Path to YAML config (default: config.yaml).")
+    gen_p.add_argument(
+        "--theme",
+        action="append",
+        default=[],
+        help="Theme overlay YAML applied on top of the config (repeatable or comma list); output_path may use {theme}.",
+    )
+    gen_p.add_argument(
+        "--scale",
+        default=None,
+        help="Scale factor(s) for HiDPI output, e.g. 2 or 1,2 (default: image.scale or 1); adds @2x to file names.",
+    )
+    gen_p.add_argument(
+        "--output-mode",
+        default=None,
+        choices=("files", "atlas", "both"),
+        help="files: one image per civ; atlas: per-locale sprite sheets + atlas.json index; both (default: output.mode).",
+    )
+    gen_p.add_argument("--jobs", default=None, type=int, help="Render worker processes (default: CPU count).")
+    gen_p.add_argument("--force", action="store_true", help="Re-render all images, ignoring the build manifest.")
+
+    icons_p = sub.add_parser("prepare-icons", help="Write pre-resized icon variants for the sizes used by the config.")
+    icons_p.add_argument("--config", default=None, help="Path to YAML config (default: config.yaml).")
+    icons_p.add_argument("--theme", action="append", default=[], help="Theme overlay YAML (repeatable or comma list).")
+    icons_p.add_argument("--scale", default=None, help="Scale factor(s) to prepare, e.g. 1,2 (default: image.scale or 1).")
+    icons_p.add_argument("--force", action="store_true", help="Rewrite all variants, even up-to-date ones.")
 
     all_p = sub.add_parser("all", help="Run init-config, extract, then generate.")
-    all_p.add_argument("--locale", default="ru", help="Locale code (e.g. ru, en).")
+    all_p.add_argument("--locale", default="ru", help="Locale code(s): ru, en, a comma list (ru,en) or all.")
     all_p.add_argument("--config", default=None, help="Path to YAML config (default: config.yaml).")
+    all_p.add_argument("--theme", action="append", default=[], help="Theme overlay YAML (repeatable or comma list).")
+    all_p.add_argument("--scale", default=None, help="Scale factor(s) for HiDPI output, e.g. 2 or 1,2.")
+    all_p.add_argument(
+        "--output-mode",
+        default=None,
+        choices=("files", "atlas", "both"),
+        help="files, atlas or both (default: output.mode); see generate --output-mode.",
+    )
+    all_p.add_argument("--jobs", default=None, type=int, help="Render worker processes (default: CPU count).")
+    all_p.add_argument("--force", action="store_true", help="Re-extract and re-render everything, ignoring caches.")
+    all_p.add_argument("--prepare-icons", action="store_true", help="Run prepare-icons between extract and generate.")
 
     serve_p = sub.add_parser("serve", help="Serve generated images from stream_images/ via HTTP.")
     serve_p.add_argument("--host", default="127.0.0.1", help="Bind host (default: 127.0.0.1).")
     serve_p.add_argument("--port", default=8000, type=int, help="Bind port (default: 8000).")
+    serve_p.add_argument(
+        "--preload",
+        action="store_true",
+        help="Load stream_images/ into memory at startup and serve /images and /image from it (restart to refresh).",
+    )
+    serve_p.add_argument("--config", default=None, help="YAML config for /render (default: config.yaml).")
+    serve_p.add_argument(
+        "--render-cache-mb", default=None, type=int, help="Byte budget of the /render response cache (default: 64)."
+    )
+    serve_p.add_argument(
+        "--render-workers", default=None, type=int, help="Render worker processes for /render (default: CPU count, max 4)."
+    )
+    serve_p.add_argument(
+        "--render-queue",
+        default=None,
+        type=int,
+        help="Distinct renders allowed to wait for a worker before /render answers 503 (default: 32).",
+    )
 
     return p
 
@@ -52,25 +111,62 @@ def run(argv: list[str] | None = None) -> int:
     if args.command == "extract":
         from aoe2civgen.extract_data import main as extract_main
 
-        extract_main(locale=args.locale)
+        extract_main(locale=args.locale, force=args.force)
         return 0
     if args.command == "generate":
         from aoe2civgen.generate_images import main as generate_main
 
-        generate_main(config_path=args.config, locale=args.locale)
+        generate_main(
+            config_path=args.config,
+            locale=args.locale,
+            jobs=args.jobs,
+            force=args.force,
+            themes=_split_list(args.theme),
+            scales=args.scale,
+            mode=args.output_mode,
+        )
+        return 0
+    if args.command == "prepare-icons":
+        from aoe2civgen.icon_variants import main as prepare_icons_main
+
+        prepare_icons_main(
+            config_path=args.config, force=args.force, themes=_split_list(args.theme), scales=args.scale
+        )
         return 0
     if args.command == "all":
         _cmd_init_config()
         from aoe2civgen.extract_data import main as extract_main
         from aoe2civgen.generate_images import main as generate_main
 
-        extract_main(locale=args.locale)
-        generate_main(config_path=args.config, locale=args.locale)
+        extract_main(locale=args.locale, force=args.force)
+        if args.prepare_icons:
+            from aoe2civgen.icon_variants import main as prepare_icons_main
+
+            prepare_icons_main(
+                config_path=args.config, force=args.force, themes=_split_list(args.theme), scales=args.scale
+            )
+        generate_main(
+            config_path=args.config,
+            locale=args.locale,
+            jobs=args.jobs,
+            force=args.force,
+            themes=_split_list(args.theme),
+            scales=args.scale,
+            mode=args.output_mode,
+        )
         return 0
     if args.command == "serve":
         from aoe2civgen.server import serve
 
-        serve(host=args.host, port=args.port)
+        serve(
+            host=args.host,
+            port=args.port,
+            config_path=args.config,
+            render_cache_mb=args.render_cache_mb,
+            render_workers=args.render_workers,
+            render_queue=args.render_queue,
+            preload=args.preload,
+        )
         return 0
 
     raise SystemExit(f"Unknown command: {args.command}")
@@ -0,0 +1,203 @@
+"""Output encoders for rendered cards: PNG (zlib level, optimize, palette), JPEG, WebP, AVIF and a size-budget search."""
+
+from __future__ import annotations
+
+import io
+import math
+import threading
+import time
+from dataclasses import dataclass
+
+from PIL import Image, ImageChops, ImageColor, ImageStat, features
+
+
+# Candidates tried by the size-budget mode, per format (smallest encoding whose PSNR clears `min_psnr` wins).
+_BUDGET_PALETTE_COLORS = (256, 128, 64, 32)
+_BUDGET_QUALITIES = (95, 90, 80, 70, 60, 50)
+
+
+@dataclass(frozen=True)
+class EncoderSettings:
+    format: str = "png"
+    # None = Pillow default (zlib level 6); 0..9 otherwise.
+    png_compress_level: int | None = None
+    png_optimize: bool = False
+    # 0 = truecolor; 2..256 = 8-bit palette with alpha (PNG only).
+    quantize_colors: int = 0
+    jpg_quality: int = 90
+    webp_lossless: bool = True
+    webp_quality: int = 90
+    webp_method: int = 4
+    avif_quality: int = 75
+    # Size-budget mode: None = off; otherwise the minimal PSNR (dB) a smaller encoding must keep.
+    min_psnr: float | None = None
+    background_color: tuple[int, int, int] = (255, 255, 255)
+
+
+def check_format_available(fmt: str) -> None:
+    """Native AVIF needs Pillow >= 11.2 built with libavif; raises ValueError instead of Pillow's bare KeyError."""
+    if fmt != "avif":
+        return
+    try:
+        available = bool(features.check_module("avif"))
+    except ValueError:  # Pillow < 11.2 does not know the module at all
+        available = False
+    if not available:
+        raise ValueError("Вывод в AVIF требует Pillow >= 11.2 с поддержкой libavif: выберите другой `output.format`.")
+
+
+def load_encoder_settings(config: dict) -> EncoderSettings:
+    output_cfg = config.get("output", {}) or {}
+    image_cfg = config.get("image", {}) or {}
+    budget_cfg = output_cfg.get("size_budget", {}) or {}
+    compress_level = output_cfg.get("png_compress_level")
+    fmt = normalize_format(output_cfg.get("format", "png"))
+    check_format_available(fmt)
+    return EncoderSettings(
+        format=fmt,
+        png_compress_level=None if compress_level is None else max(0, min(9, int(compress_level))),
+        png_optimize=bool(output_cfg.get("png_optimize", False)),
+        quantize_colors=max(0, min(256, int(output_cfg.get("quantize_colors", 0) or 0))),
+        jpg_quality=int(output_cfg.get("jpg_quality", 90)),
+        webp_lossless=bool(output_cfg.get("webp_lossless", True)),
+        webp_quality=int(output_cfg.get("webp_quality", 90)),
+        webp_method=max(0, min(6, int(output_cfg.get("webp_method", 4)))),
+        avif_quality=int(output_cfg.get("avif_quality", 75)),
+        min_psnr=float(budget_cfg.get("min_psnr", 40.0)) if budget_cfg.get("enabled", False) else None,
+        background_color=ImageColor.getrgb(image_cfg.get("background_color", "#FFFFFF"))[:3],
+    )
+
+
+def normalize_format(value: object) -> str:
+    fmt = str(value or "png").strip().lower()
+    return "jpg" if fmt == "jpeg" else fmt
+
+
+@dataclass(frozen=True)
+class EncodedImage:
+    data: bytes
+    # Human-readable encoder choice for logs, e.g. "png", "png palette 128", "webp q80".
+    label: str
+    seconds: float
+    psnr: float | None = None  # only measured in size-budget mode
+
+
+def _flatten(image: Image.Image, background: tuple[int, int, int]) -> Image.Image:
+    if image.mode != "RGBA":
+        return image.convert("RGB")
+    flat = Image.new("RGB", image.size, background)
+    flat.paste(image, mask=image.split()[3])
+    return flat
+
+
+def _quantize(image: Image.Image, colors: int) -> Image.Image:
+    # FASTOCTREE is the built-in quantizer that keeps the alpha channel in the palette.
+    return image.convert("RGBA").quantize(colors=colors, method=Image.Quantize.FASTOCTREE)
+
+
+def _encode_once(image: Image.Image, settings: EncoderSettings, **overrides: object) -> tuple[bytes, str]:
+    fmt = settings.format
+    buf = io.BytesIO()
+    if fmt == "jpg":
+        quality = int(overrides.get("quality", settings.jpg_quality))
+        _flatten(image, settings.background_color).save(buf, format="JPEG", quality=quality)
+        return buf.getvalue(), f"jpg q{quality}"
+    if fmt == "webp":
+        lossless = bool(overrides.get("lossless", settings.webp_lossless))
+        quality = int(overrides.get("quality", settings.webp_quality))
+        image.save(buf, format="WEBP", lossless=lossless, quality=quality, method=settings.webp_method)
+        return buf.getvalue(), "webp lossless" if lossless else f"webp q{quality}"
+    if fmt == "avif":
+        quality = int(overrides.get("quality", settings.avif_quality))
+        image.save(buf, format="AVIF", quality=quality)
+        return buf.getvalue(), f"avif q{quality}"
+    if fmt != "png":
+        # Any other format Pillow can write, with its defaults.
+        image.save(buf, format=fmt.upper())
+        return buf.getvalue(), fmt
+
+    colors = int(overrides.get("colors", settings.quantize_colors))
+    optimize = bool(overrides.get("optimize", settings.png_optimize))
+    params: dict[str, object] = {"optimize": True} if optimize else {}
+    if settings.png_compress_level is not None:
+        params["compress_level"] = settings.png_compress_level
+    (_quantize(image, colors) if colors else image).save(buf, format="PNG", **params)
+    return buf.getvalue(), f"png palette {colors}" if colors else "png"
+
+
+def psnr(reference: Image.Image, encoded: bytes) -> float:
+    """PSNR (dB) over premultiplied RGBA, so color changes under fully transparent pixels do not count."""
+    with Image.open(io.BytesIO(encoded)) as decoded:
+        candidate = decoded.convert("RGBA").convert("RGBa")
+    diff = ImageChops.difference(reference.convert("RGBA").convert("RGBa"), candidate)
+    sum2 = ImageStat.Stat(diff).sum2
+    mse = sum(sum2) / (len(sum2) * reference.size[0] * reference.size[1])
+    return math.inf if mse == 0 else 10 * math.log10(255 * 255 / mse)
+
+
+def _budget_candidates(settings: EncoderSettings) -> list[dict[str, object]]:
+    if settings.format == "png":
+        return [{"colors": 0, "optimize": True}, *({"colors": c, "optimize": True} for c in _BUDGET_PALETTE_COLORS)]
+    if settings.format == "webp":
+        return [{"lossless": True}, *({"lossless": False, "quality": q} for q in _BUDGET_QUALITIES)]
+    return [{"quality": q} for q in _BUDGET_QUALITIES]
+
+
+def encode_image(image: Image.Image, settings: EncoderSettings) -> EncodedImage:
+    """
+    Encode with the configured options; in size-budget mode, try the format's candidates
+    (palette sizes for PNG, qualities for lossy formats) and keep the smallest one within `min_psnr`.
+    """
+    started = time.perf_counter()
+    if settings.min_psnr is None:
+        data, label = _encode_once(image, settings)
+        return EncodedImage(data=data, label=label, seconds=time.perf_counter() - started)
+
+    reference = _flatten(image, settings.background_color) if settings.format == "jpg" else image
+    best: tuple[bytes, str, float] | None = None
+    for overrides in _budget_candidates(settings):
+        data, label = _encode_once(image, settings, **overrides)
+        if best is not None and len(data) >= len(best[0]):
+            continue
+        quality = psnr(reference, data)
+        if quality >= settings.min_psnr or best is None:
+            best = (data, label, quality)
+    assert best is not None
+    data, label, quality = best
+    return EncodedImage(data=data, label=label, seconds=time.perf_counter() - started, psnr=quality)
+
+
+@dataclass(frozen=True)
+class EncodeStats:
+    images: int = 0
+    bytes: int = 0
+    seconds: float = 0.0
+
+    def __add__(self, other: "EncodeStats") -> "EncodeStats":
+        return EncodeStats(
+            images=self.images + other.images, bytes=self.bytes + other.bytes, seconds=self.seconds + other.seconds
+        )
+
+    def __sub__(self, other: "EncodeStats") -> "EncodeStats":
+        return EncodeStats(
+            images=self.images - other.images, bytes=self.bytes - other.bytes, seconds=self.seconds - other.seconds
+        )
+
+
+class EncodeCounter:
+    """Process-wide totals of encoded images (summed over workers in the `generate` summary)."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._stats = EncodeStats()
+
+    def add(self, encoded: EncodedImage) -> None:
+        with self._lock:
+            self._stats = self._stats + EncodeStats(images=1, bytes=len(encoded.data), seconds=encoded.seconds)
+
+    def stats(self) -> EncodeStats:
+        with self._lock:
+            return self._stats
+
+
+ENCODE_STATS = EncodeCounter()
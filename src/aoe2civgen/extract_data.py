@@ -2,18 +2,22 @@
 
 from __future__ import annotations
 
-import difflib
+import hashlib
+import heapq
 import json
 import re
 import shutil
+import subprocess
 from collections import Counter, defaultdict
 from dataclasses import dataclass
+from difflib import SequenceMatcher
 from pathlib import Path
-from typing import Any
+from typing import Any, Iterable, Mapping
 
 from aoe2civgen.aoe2_bonus_icons import classify_bonus, find_icon_for_bonus
 from aoe2civgen.aoe2_helptext import CivHelptext, html_to_text, parse_civ_helptext, split_name_and_inline_description
 from aoe2civgen.paths import find_repo_root
+from aoe2civgen.string_table import load_string_table
 
 
 BASEDIR = find_repo_root()
@@ -32,16 +36,32 @@ TECH_ICONS_OUT_DIR = ICONS_OUT_DIR / "techs"
 RESOURCE_ICONS_OUT_DIR = ICONS_OUT_DIR / "resources"
 AGES_ICONS_OUT_DIR = ICONS_OUT_DIR / "ages"
 CIV_ICON_OUT_DIR_BASE = BASEDIR / "stream_images" / "icons"
+STRING_TABLE_CACHE_DIR = BASEDIR / ".cache" / "strings"
 
 _TAG_RE = re.compile(r"<[^>]+>")
 _PAREN_RE = re.compile(r"\([^)]*\)")
 _HELP_STRING_ID_OFFSET = 79000
 
+EXTRACT_STATE_FILENAME = ".extract_state.json"
+_EXTRACT_STATE_VERSION = 1
+# Extractor sources are part of the state, so a code change re-extracts everything.
+_EXTRACTOR_MODULES = ("extract_data.py", "aoe2_helptext.py", "aoe2_bonus_icons.py")
 
-def load_locale_strings(locale: str) -> dict[str, str]:
+
+def _locale_strings_path(locale: str) -> Path:
     loc = (locale or "ru").strip().lower()
-    strings_path = LOCALES_DIR / loc / "strings.json"
-    return load_json_file(strings_path)
+    return LOCALES_DIR / loc / "strings.json"
+
+
+def load_locale_strings(locale: str) -> Mapping[str, str]:
+    """
+    Locale strings as a read-only mapping, backed by the memory-mapped `.cache/strings/<locale>.bin` table
+    (rebuilt automatically when `strings.json` changes).
+    """
+    strings_path = _locale_strings_path(locale)
+    if not strings_path.exists():
+        raise FileNotFoundError(f"JSON file not found: {strings_path}")
+    return load_string_table(strings_path, STRING_TABLE_CACHE_DIR / f"{strings_path.parent.name}.bin")
 
 
 def _strip_parenthetical(text: str) -> str:
@@ -82,16 +102,50 @@ def load_json_file(file_path: Path) -> Any:
         return json.load(f)
 
 
-def save_json_file(data: Any, file_path: Path) -> None:
+def save_json_file(data: Any, file_path: Path) -> bool:
+    """
+    Write `data` as JSON. Leaves the file untouched (bytes and mtime) when the content is already identical.
+    Returns True if the file was (re)written.
+    """
+    payload = json.dumps(data, ensure_ascii=False, indent=2).encode("utf-8")
+    try:
+        if file_path.read_bytes() == payload:
+            return False
+    except OSError:
+        pass
     file_path.parent.mkdir(parents=True, exist_ok=True)
-    with open(file_path, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    with open(file_path, "wb") as f:
+        f.write(payload)
+    return True
+
+
+def sha256_file(file_path: Path) -> str:
+    h = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _sha256_json(data: Any) -> str:
+    return hashlib.sha256(json.dumps(data, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def _same_file_stat(source_path: Path, dest_path: Path) -> bool:
+    try:
+        src_st, dest_st = source_path.stat(), dest_path.stat()
+    except OSError:
+        return False
+    return src_st.st_size == dest_st.st_size and int(src_st.st_mtime) == int(dest_st.st_mtime)
 
 
 def copy_file(source_path: Path, dest_path: Path) -> bool:
     dest_path.parent.mkdir(parents=True, exist_ok=True)
     if not source_path.exists():
         return False
+    # `copy2` preserves mtime, so an up-to-date copy has the same size and mtime as its source.
+    if _same_file_stat(source_path, dest_path):
+        return True
     try:
         shutil.copy2(str(source_path), str(dest_path))
         return True
@@ -144,22 +198,125 @@ def strip_simple_html(text: str) -> str:
     return s
 
 
+class NameMatcher:
+    """
+    Prebuilt fuzzy matcher over the normalized names of one `NodeLookup` table.
+
+    Answers exactly like the token-subset + `difflib.get_close_matches` scan it replaces, but indexes the keys once:
+    - token inverted index (token -> keys) for the "all target tokens present" stage;
+    - character n-gram index (n=1, with counts) to shortlist candidates before `SequenceMatcher.ratio()`.
+      Shared character counts are difflib's `quick_ratio()` upper bound, so the shortlist never drops a match.
+    """
+
+    def __init__(self, keys: Iterable[str]) -> None:
+        self.keys: list[str] = list(dict.fromkeys(keys))
+        self._key_set = set(self.keys)
+        self._key_tokens: list[frozenset[str]] = [frozenset(k.split()) for k in self.keys]
+        self._token_index: dict[str, set[int]] = defaultdict(set)
+        self._gram_index: dict[str, list[tuple[int, int]]] = defaultdict(list)
+        for idx, key in enumerate(self.keys):
+            for token in self._key_tokens[idx]:
+                self._token_index[token].add(idx)
+            for gram, count in Counter(key).items():
+                self._gram_index[gram].append((idx, count))
+
+    def _subset_match(self, target_key: str) -> str | None:
+        token_set = set(target_key.split())
+        if not token_set:
+            return None
+        postings = [self._token_index.get(t) for t in token_set]
+        if not all(postings):
+            return None
+        constrained = set.intersection(*sorted(postings, key=len))  # type: ignore[arg-type]
+        if not constrained:
+            return None
+
+        def score(idx: int) -> tuple[int, int, str]:
+            k = self.keys[idx]
+            extra = len(self._key_tokens[idx] - token_set)
+            return (extra, abs(len(k) - len(target_key)), k)
+
+        return self.keys[min(constrained, key=score)]
+
+    def _scored_matches(self, word: str, cutoff: float) -> list[tuple[float, str]]:
+        """`(ratio, key)` for every key with `ratio >= cutoff` (same scoring as `difflib.get_close_matches`)."""
+        la = len(word)
+        if cutoff <= 0.0 or not word:
+            shortlist: Iterable[int] = range(len(self.keys))
+        else:
+            shared: dict[int, int] = defaultdict(int)
+            for gram, want in Counter(word).items():
+                for idx, have in self._gram_index.get(gram, ()):
+                    shared[idx] += min(want, have)
+            shortlist = [
+                idx
+                for idx, matches in shared.items()
+                if 2.0 * matches / (la + len(self.keys[idx])) >= cutoff
+            ]
+
+        matcher = SequenceMatcher()
+        matcher.set_seq2(word)
+        result: list[tuple[float, str]] = []
+        for idx in shortlist:
+            matcher.set_seq1(self.keys[idx])
+            if matcher.real_quick_ratio() >= cutoff and matcher.quick_ratio() >= cutoff and matcher.ratio() >= cutoff:
+                result.append((matcher.ratio(), self.keys[idx]))
+        return result
+
+    def close_matches(self, word: str, *, n: int = 3, cutoff: float = 0.6) -> list[str]:
+        """Drop-in for `difflib.get_close_matches(word, self.keys, n, cutoff)`."""
+        if n <= 0:
+            raise ValueError(f"n must be > 0: {n!r}")
+        return [key for _, key in heapq.nlargest(n, self._scored_matches(word, cutoff))]
+
+    def best_match(self, target_key: str) -> str | None:
+        if target_key in self._key_set:
+            return target_key
+        subset = self._subset_match(target_key)
+        if subset is not None:
+            return subset
+        # Former two passes (cutoff 0.9, then 0.85) in one: the overall best is the 0.9 answer whenever one exists.
+        scored = self._scored_matches(target_key, 0.85)
+        return max(scored)[1] if scored else None
+
+
 @dataclass(frozen=True)
 class NodeLookup:
     units_by_name: dict[str, dict[str, Any]]
     techs_by_name: dict[str, dict[str, Any]]
+    unit_matcher: NameMatcher
+    tech_matcher: NameMatcher
+
+
+@dataclass(frozen=True)
+class TreeNodes:
+    """Unit and tech nodes of a civ tree (locale-independent: ids, picture indexes, string ids)."""
 
+    units: list[dict[str, Any]]
+    techs: list[dict[str, Any]]
 
-def build_node_lookup(tree_data: dict[str, Any], strings: dict[str, str]) -> NodeLookup:
-    unit_candidates: list[dict[str, Any]] = []
-    tech_candidates: list[dict[str, Any]] = []
 
+def split_tree_nodes(tree_data: dict[str, Any]) -> TreeNodes:
+    units: list[dict[str, Any]] = []
+    techs: list[dict[str, Any]] = []
     for node in tree_data.get("units_techs", []):
         use_type = node.get("use_type")
         if use_type == "Unit":
-            unit_candidates.append(node)
+            units.append(node)
         elif use_type == "Tech":
-            tech_candidates.append(node)
+            techs.append(node)
+    return TreeNodes(units=units, techs=techs)
+
+
+def build_node_lookup(
+    tree_data: dict[str, Any],
+    strings: Mapping[str, str],
+    *,
+    tree_nodes: TreeNodes | None = None,
+) -> NodeLookup:
+    tree_nodes = tree_nodes or split_tree_nodes(tree_data)
+    unit_candidates = tree_nodes.units
+    tech_candidates = tree_nodes.techs
 
     def pick_best(existing: dict[str, Any] | None, candidate: dict[str, Any], prefer_type: str) -> dict[str, Any]:
         if existing is None:
@@ -190,20 +347,67 @@ def build_node_lookup(tree_data: dict[str, Any], strings: dict[str, str]) -> Nod
                 continue
             techs_by_name[key] = pick_best(techs_by_name.get(key), node, prefer_type="Research")
 
-    return NodeLookup(units_by_name=units_by_name, techs_by_name=techs_by_name)
+    return NodeLookup(
+        units_by_name=units_by_name,
+        techs_by_name=techs_by_name,
+        unit_matcher=NameMatcher(units_by_name),
+        tech_matcher=NameMatcher(techs_by_name),
+    )
 
 
-def _collect_building_picture_indexes(civ_keys: list[str]) -> dict[int, int]:
+class CivTreeCache:
+    """
+    Reads and parses each `TREES_DIR/{CIV}.json` at most once per extract run.
+    Shared by the change detection, the building icon pre-pass and the per-civ node lookups of every locale.
+    """
+
+    def __init__(self, trees_dir: Path = TREES_DIR) -> None:
+        self.trees_dir = trees_dir
+        self._raw: dict[str, bytes | None] = {}
+        self._digests: dict[str, str] = {}
+        self._parsed: dict[str, dict[str, Any]] = {}
+
+    def path(self, civ_key: str) -> Path:
+        return self.trees_dir / f"{civ_key.upper()}.json"
+
+    def _read(self, civ_key: str) -> bytes | None:
+        if civ_key not in self._raw:
+            try:
+                self._raw[civ_key] = self.path(civ_key).read_bytes()
+            except FileNotFoundError:
+                self._raw[civ_key] = None
+        return self._raw[civ_key]
+
+    def digest(self, civ_key: str) -> str | None:
+        if civ_key not in self._digests:
+            raw = self._read(civ_key)
+            if raw is None:
+                return None
+            self._digests[civ_key] = hashlib.sha256(raw).hexdigest()
+        return self._digests[civ_key]
+
+    def get(self, civ_key: str) -> dict[str, Any] | None:
+        if civ_key not in self._parsed:
+            raw = self._read(civ_key)
+            if raw is None:
+                return None
+            self.digest(civ_key)
+            self._parsed[civ_key] = json.loads(raw)
+            # Raw bytes are only needed for hashing/parsing; keep the parsed tree only.
+            self._raw.pop(civ_key, None)
+        return self._parsed[civ_key]
+
+
+def _collect_building_picture_indexes(civ_keys: list[str], trees: CivTreeCache) -> dict[int, int]:
     """
     Buildings are keyed by `building_id` (stable), so copying them once is safe.
     """
     building_map: dict[int, int] = {}
 
     for civ_key in civ_keys:
-        tree_path = TREES_DIR / f"{civ_key.upper()}.json"
-        if not tree_path.exists():
+        tree_data = trees.get(civ_key)
+        if tree_data is None:
             continue
-        tree_data: dict[str, Any] = load_json_file(tree_path)
 
         for b in tree_data.get("buildings", []):
             try:
@@ -225,10 +429,10 @@ def _copy_indexed_icons(id_to_picture_index: dict[int, int], source_dir: Path, d
     print(f"Copied {copied} icons into {dest_dir}")
 
 
-def copy_all_icons(civ_keys: list[str]) -> None:
+def copy_all_icons(civ_keys: list[str], trees: CivTreeCache | None = None) -> None:
     _ensure_output_dirs()
 
-    building_map = _collect_building_picture_indexes(civ_keys)
+    building_map = _collect_building_picture_indexes(civ_keys, trees or CivTreeCache())
     _copy_indexed_icons(building_map, ICONS_SOURCE_DIR / "Building", BUILDING_ICONS_OUT_DIR)
 
     for res_icon_name in ["food.png", "wood.png", "gold.png", "stone.png"]:
@@ -247,27 +451,6 @@ def copy_all_icons(civ_keys: list[str]) -> None:
                 break
 
 
-def _best_match_key(target_key: str, available_keys: list[str]) -> str | None:
-    if target_key in available_keys:
-        return target_key
-    tokens = [t for t in target_key.split() if t]
-    token_set = set(tokens)
-    constrained = [k for k in available_keys if token_set and token_set.issubset(set(k.split()))]
-    if constrained:
-        def score(k: str) -> tuple[int, int, str]:
-            k_tokens = set(k.split())
-            extra = len(k_tokens - token_set)
-            return (extra, abs(len(k) - len(target_key)), k)
-
-        return sorted(constrained, key=score)[0]
-
-    matches = difflib.get_close_matches(target_key, available_keys, n=1, cutoff=0.9)
-    if matches:
-        return matches[0]
-    matches = difflib.get_close_matches(target_key, available_keys, n=1, cutoff=0.85)
-    return matches[0] if matches else None
-
-
 _UNIT_NAME_ALIASES = {
     normalize_name("мехарист-гвардеец"): normalize_name("мехарист"),
     normalize_name("драконий корабль"): normalize_name("dragon ship"),
@@ -287,7 +470,13 @@ _TECH_NAME_ALIASES = {
 }
 
 
-def _match_node(name: str, lookup: dict[str, dict[str, Any]], *, aliases: dict[str, str] | None = None) -> dict[str, Any] | None:
+def _match_node(
+    name: str,
+    lookup: dict[str, dict[str, Any]],
+    matcher: NameMatcher,
+    *,
+    aliases: dict[str, str] | None = None,
+) -> dict[str, Any] | None:
     key = normalize_name(name)
     if not key:
         return None
@@ -295,7 +484,7 @@ def _match_node(name: str, lookup: dict[str, dict[str, Any]], *, aliases: dict[s
         key = aliases[key]
     if key in lookup:
         return lookup[key]
-    best = _best_match_key(key, list(lookup.keys()))
+    best = matcher.best_match(key)
     if best:
         return lookup[best]
     return None
@@ -356,14 +545,194 @@ def _resolve_data_out_dir(locale: str) -> Path:
     return DATA_OUT_DIR / loc
 
 
-def extract_civilization_data(*, locale: str = "ru") -> dict[str, Any]:
-    print("--- Loading aoe2techtree data ---")
-    full_data = load_json_file(DATA_JSON_PATH)
-    strings: dict[str, str] = load_locale_strings(locale)
+_ICON_SOURCE_SUBDIRS: dict[Path, str] = {
+    UNIT_ICONS_OUT_DIR: "Unit",
+    TECH_ICONS_OUT_DIR: "Tech",
+    CIV_ICON_OUT_DIR_BASE: "Civs",
+}
+
+
+def _refresh_civ_icons(civ_output_json: dict[str, Any]) -> None:
+    """
+    Re-sync the per-civ icons referenced by an already extracted civ JSON (cheap when nothing changed upstream).
+    """
+    refs = [civ_output_json.get("icon")]
+    for section in ("unique_units", "unique_techs"):
+        refs.extend(item.get("icon") for item in civ_output_json.get(section) or [] if isinstance(item, dict))
+    for rel in refs:
+        if not rel:
+            continue
+        dest = BASEDIR / str(rel)
+        source_subdir = _ICON_SOURCE_SUBDIRS.get(dest.parent)
+        if source_subdir:
+            copy_file(ICONS_SOURCE_DIR / source_subdir / dest.name, dest)
+
+
+def _submodule_commit() -> str | None:
+    if not (AOE2TECHTREE_DIR / ".git").exists():
+        return None
+    try:
+        result = subprocess.run(
+            ["git", "-C", str(AOE2TECHTREE_DIR), "rev-parse", "HEAD"],
+            capture_output=True,
+            text=True,
+            timeout=30,
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    commit = result.stdout.strip()
+    return commit if result.returncode == 0 and commit else None
+
+
+def _extractor_digest() -> str:
+    here = Path(__file__).resolve().parent
+    return hashlib.sha256("\n".join(sha256_file(here / name) for name in _EXTRACTOR_MODULES).encode("utf-8")).hexdigest()
 
-    civs: dict[str, dict[str, Any]] = full_data.get("civs", {})
-    if not civs:
-        raise RuntimeError(f"No civs found in {DATA_JSON_PATH}")
+
+def _civ_strings_digest(civ_info: dict[str, Any], tree_data: dict[str, Any], strings: Mapping[str, str]) -> str:
+    """
+    Digest of every locale string a civ's extraction reads: civ name/help and the name/help of each tree node.
+    """
+    string_ids = [str(civ_info.get("name_string_id")), str(civ_info.get("help_string_id"))]
+    for node in tree_data.get("units_techs", []):
+        string_ids.append(str(node.get("name_string_id")))
+        try:
+            string_ids.append(str(int(node.get("help_string_id")) - _HELP_STRING_ID_OFFSET))
+        except (TypeError, ValueError):
+            continue
+    h = hashlib.sha256()
+    for string_id in string_ids:
+        h.update(f"{string_id}\0{strings.get(string_id, '')}\0".encode("utf-8"))
+    return h.hexdigest()
+
+
+def _load_extract_state(out_dir: Path, *, locale: str, extractor: str) -> dict[str, Any]:
+    try:
+        state = load_json_file(out_dir / EXTRACT_STATE_FILENAME)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(state, dict):
+        return {}
+    if state.get("version") != _EXTRACT_STATE_VERSION or state.get("locale") != locale or state.get("extractor") != extractor:
+        return {}
+    return state
+
+
+def resolve_locales(spec: str | None) -> list[str]:
+    """
+    `ru` -> ["ru"]; `ru,en` -> ["ru", "en"]; `all` -> every locale directory with a `strings.json` under `LOCALES_DIR`.
+    """
+    raw = (spec or "ru").strip().lower()
+    if raw == "all":
+        locales = sorted(p.parent.name for p in LOCALES_DIR.glob("*/strings.json"))
+        if not locales:
+            raise FileNotFoundError(f"No locales found in {LOCALES_DIR}")
+        return locales
+    locales = [part.strip() for part in raw.split(",") if part.strip()]
+    return list(dict.fromkeys(locales)) or ["ru"]
+
+
+class ExtractContext:
+    """
+    Locale-independent inputs of one extract run, shared by every locale extracted in it:
+    `data.json`, the parsed civ trees and their unit/tech nodes, the submodule commit and the shared icon copy.
+    """
+
+    def __init__(self) -> None:
+        print("--- Loading aoe2techtree data ---")
+        full_data = load_json_file(DATA_JSON_PATH)
+        self.civs: dict[str, dict[str, Any]] = full_data.get("civs", {})
+        if not self.civs:
+            raise RuntimeError(f"No civs found in {DATA_JSON_PATH}")
+        self.extractor = _extractor_digest()
+        self.submodule_commit = _submodule_commit()
+        self.trees = CivTreeCache()
+        self._icons_copied = False
+        self._tree_nodes: dict[str, TreeNodes] = {}
+
+    def copy_shared_icons(self) -> None:
+        """Building/resource/age icons do not depend on the locale: copied at most once per run."""
+        if self._icons_copied:
+            return
+        print("--- Copying icons ---")
+        copy_all_icons(list(self.civs.keys()), self.trees)
+        self._icons_copied = True
+
+    def tree_nodes(self, civ_key: str) -> TreeNodes | None:
+        tree_data = self.trees.get(civ_key)
+        if tree_data is None:
+            return None
+        if civ_key not in self._tree_nodes:
+            self._tree_nodes[civ_key] = split_tree_nodes(tree_data)
+        return self._tree_nodes[civ_key]
+
+
+def extract_civilization_data(
+    *,
+    locale: str = "ru",
+    force: bool = False,
+    context: ExtractContext | None = None,
+    log_prefix: str = "",
+) -> dict[str, Any]:
+    loc = (locale or "ru").strip().lower()
+    strings_path = _locale_strings_path(loc)
+    if not strings_path.exists():
+        raise FileNotFoundError(f"JSON file not found: {strings_path}")
+    ctx = context or ExtractContext()
+    civs = ctx.civs
+
+    def log(text: str) -> None:
+        print("\n".join(f"{log_prefix}{line}" if line else line for line in text.split("\n")))
+
+    # `strings.json` is large; it is only parsed when some civ actually has to be (re)checked or re-extracted.
+    loaded_strings: Mapping[str, str] | None = None
+
+    def get_strings() -> Mapping[str, str]:
+        nonlocal loaded_strings
+        if loaded_strings is None:
+            loaded_strings = load_locale_strings(loc)
+        return loaded_strings
+
+    out_dir = _resolve_data_out_dir(locale)
+    extractor = ctx.extractor
+    prev_state = {} if force else _load_extract_state(out_dir, locale=loc, extractor=extractor)
+    prev_civs: dict[str, Any] = prev_state.get("civs") or {}
+    submodule_commit = ctx.submodule_commit
+    strings_hash = sha256_file(strings_path)
+    strings_changed = prev_state.get("strings") != strings_hash
+    if prev_state and prev_state.get("submodule_commit") != submodule_commit:
+        log(f"aoe2techtree: {prev_state.get('submodule_commit')} -> {submodule_commit}")
+
+    # Decide which civs need re-extraction: tree file, civ entry of data.json or their locale strings changed.
+    trees = ctx.trees
+    civ_states: dict[str, dict[str, Any]] = {}
+    changed_civs: set[str] = set()
+    for civ_key, civ_info in civs.items():
+        tree_digest = trees.digest(civ_key)
+        if tree_digest is None:
+            changed_civs.add(civ_key)
+            continue
+        civ_state: dict[str, Any] = {
+            "tree": tree_digest,
+            "info": _sha256_json(civ_info),
+        }
+        prev = prev_civs.get(civ_key) or {}
+        fresh = (
+            bool(prev)
+            and prev.get("tree") == civ_state["tree"]
+            and prev.get("info") == civ_state["info"]
+            and (out_dir / f"{prev.get('stem')}.json").is_file()
+        )
+        if fresh and not strings_changed:
+            civ_state["strings"] = prev.get("strings")
+        else:
+            civ_state["strings"] = _civ_strings_digest(civ_info, trees.get(civ_key) or {}, get_strings())
+            fresh = fresh and prev.get("strings") == civ_state["strings"]
+        if fresh:
+            civ_state["stem"] = prev.get("stem")
+        else:
+            changed_civs.add(civ_key)
+        civ_states[civ_key] = civ_state
 
     event_counts: Counter[str] = Counter()
     event_counts_by_civ: dict[str, Counter[str]] = defaultdict(Counter)
@@ -375,18 +744,29 @@ def extract_civilization_data(*, locale: str = "ru") -> dict[str, Any]:
         msg = f"{level} event={event} civ={civ}"
         if extra:
             msg = f"{msg} {extra}"
-        print(msg)
+        log(msg)
 
-    print("--- Copying icons ---")
-    copy_all_icons(list(civs.keys()))
+    if changed_civs or not prev_state or prev_state.get("submodule_commit") != submodule_commit:
+        ctx.copy_shared_icons()
 
-    out_dir = _resolve_data_out_dir(locale)
     out_dir.mkdir(parents=True, exist_ok=True)
     all_civs_output_data: dict[str, Any] = {}
-    used_stems: set[str] = set()
+    # Unchanged civs keep their stored stems: reserve them all up front, so a changed civ earlier in `civs`
+    # can never claim one of them and overwrite that civ's JSON.
+    used_stems: set[str] = {str(civ_states[civ_key]["stem"]) for civ_key in civs if civ_key not in changed_civs}
+    unchanged_count = 0
 
-    print(f"Processing {len(civs)} civilizations...")
+    log(f"Processing {len(civs)} civilizations ({len(changed_civs)} changed)...")
     for civ_key, civ_info in civs.items():
+        if civ_key not in changed_civs:
+            stem = str(civ_states[civ_key]["stem"])
+            civ_output_json = load_json_file(out_dir / f"{stem}.json")
+            _refresh_civ_icons(civ_output_json)
+            all_civs_output_data[stem] = civ_output_json
+            unchanged_count += 1
+            continue
+
+        strings = get_strings()
         # `civ_key` matches filenames in `data/trees/*.json` and `img/Civs/*.png`.
         # `internal_name` is a legacy/engine identifier (e.g. Hindustanis may have internal_name == "Indians").
         internal_name = str(civ_info.get("internal_name") or civ_key)
@@ -418,16 +798,12 @@ def extract_civilization_data(*, locale: str = "ru") -> dict[str, Any]:
                     team_bonus=parsed_help.team_bonus,
                 )
 
-        tree_path = TREES_DIR / f"{civ_key.upper()}.json"
-        if not tree_path.exists():
-            print(f"WARNING: missing tree file for civ '{civ_key}': {tree_path}")
+        tree_data = trees.get(civ_key)
+        if tree_data is None:
+            log(f"WARNING: missing tree file for civ '{civ_key}': {trees.path(civ_key)}")
             continue
 
-        tree_data: dict[str, Any] = load_json_file(tree_path)
-        nodes = build_node_lookup(tree_data, strings)
-
-        unit_keys = list(nodes.units_by_name.keys())
-        tech_keys = list(nodes.techs_by_name.keys())
+        nodes = build_node_lookup(tree_data, strings, tree_nodes=ctx.tree_nodes(civ_key))
 
         def make_bonus_item(text: str, *, section: str) -> dict[str, Any]:
             if (locale or "ru").strip().lower() != "ru":
@@ -450,13 +826,13 @@ def extract_civilization_data(*, locale: str = "ru") -> dict[str, Any]:
         for unit_entry in parsed_help.unique_units:
             for part in split_unique_unit_entries(unit_entry):
                 unit_name, unit_type = split_name_and_inline_description(part)
-                unit_node = _match_node(unit_name, nodes.units_by_name, aliases=unit_aliases)
+                unit_node = _match_node(unit_name, nodes.units_by_name, nodes.unit_matcher, aliases=unit_aliases)
                 unit_id = int(unit_node["node_id"]) if unit_node and unit_node.get("node_id") is not None else None
                 icon_rel = None
                 ability = ""
                 if not unit_node:
                     norm = normalize_name(unit_name)
-                    suggestions = difflib.get_close_matches(norm, unit_keys, n=3, cutoff=0.7)
+                    suggestions = nodes.unit_matcher.close_matches(norm, n=3, cutoff=0.7)
                     log_event(
                         "WARNING:",
                         "missing_node",
@@ -506,12 +882,12 @@ def extract_civilization_data(*, locale: str = "ru") -> dict[str, Any]:
         tech_aliases = _TECH_NAME_ALIASES if (locale or "ru").strip().lower() == "ru" else None
         for tech_entry in parsed_help.unique_techs:
             tech_name, tech_desc = split_name_and_inline_description(tech_entry)
-            tech_node = _match_node(tech_name, nodes.techs_by_name, aliases=tech_aliases)
+            tech_node = _match_node(tech_name, nodes.techs_by_name, nodes.tech_matcher, aliases=tech_aliases)
             tech_id = int(tech_node["node_id"]) if tech_node and tech_node.get("node_id") is not None else None
             icon_rel = None
             if not tech_node:
                 norm = normalize_name(tech_name)
-                suggestions = difflib.get_close_matches(norm, tech_keys, n=3, cutoff=0.7)
+                suggestions = nodes.tech_matcher.close_matches(norm, n=3, cutoff=0.7)
                 log_event(
                     "WARNING:",
                     "missing_node",
@@ -569,34 +945,76 @@ def extract_civilization_data(*, locale: str = "ru") -> dict[str, Any]:
         stem = safe_stem(civ_name)
         if stem in used_stems:
             stem = safe_stem(f"{civ_name} ({internal_name})")
+        base_stem, n = stem, 2
+        while stem in used_stems:
+            stem = f"{base_stem} {n}"
+            n += 1
         used_stems.add(stem)
 
-        save_json_file(civ_output_json, out_dir / f"{stem}.json")
+        written = save_json_file(civ_output_json, out_dir / f"{stem}.json")
         all_civs_output_data[stem] = civ_output_json
-        print(f"OK: {civ_key} -> {stem}")
+        civ_states[civ_key]["stem"] = stem
+        log(f"OK: {civ_key} -> {stem}" + ("" if written else " (unchanged)"))
 
     save_json_file(all_civs_output_data, out_dir / "all_civilizations.json")
+    save_json_file(
+        {
+            "version": _EXTRACT_STATE_VERSION,
+            "locale": loc,
+            "extractor": extractor,
+            "submodule_commit": submodule_commit,
+            "strings": strings_hash,
+            "civs": civ_states,
+        },
+        out_dir / EXTRACT_STATE_FILENAME,
+    )
+    if unchanged_count:
+        log(f"Unchanged (skipped): {unchanged_count} civilizations.")
     if event_counts:
-        print("\n--- Extract summary (issues) ---")
+        log("\n--- Extract summary (issues) ---")
         for event, count in event_counts.most_common():
-            print(f"{event}: {count}")
+            log(f"{event}: {count}")
         offenders = sorted(event_counts_by_civ.items(), key=lambda kv: sum(kv[1].values()), reverse=True)
         top = offenders[:10]
         if top:
-            print("\nTop civs by issue count:")
+            log("\nTop civs by issue count:")
             for civ, ctr in top:
                 total = sum(ctr.values())
                 breakdown = ", ".join(f"{k}={v}" for k, v in ctr.most_common())
-                print(f"- {civ}: {total} ({breakdown})")
-    print("--- Extraction complete ---")
+                log(f"- {civ}: {total} ({breakdown})")
+    log("--- Extraction complete ---")
     return all_civs_output_data
 
 
-def main(*, locale: str = "ru") -> None:
+def extract_locales(locales: list[str], *, force: bool = False) -> dict[str, dict[str, Any]]:
+    """
+    Extract several locales in one run. Trees, tree nodes and shared icons are loaded/copied once;
+    only the string application runs per locale, one locale after another (it is pure-Python, CPU-bound work
+    that threads would only serialize on the GIL). A failed locale does not stop the others.
+    """
+    context = ExtractContext()
+    if len(locales) == 1:
+        return {locales[0]: extract_civilization_data(locale=locales[0], force=force, context=context)}
+
+    results: dict[str, dict[str, Any]] = {}
+    errors: list[str] = []
+    for loc in locales:
+        try:
+            results[loc] = extract_civilization_data(locale=loc, force=force, context=context, log_prefix=f"[{loc}] ")
+        except Exception as e:
+            errors.append(f"{loc}: {e}")
+    if errors:
+        raise RuntimeError("Extraction failed for: " + "; ".join(errors))
+    return results
+
+
+def main(*, locale: str = "ru", force: bool = False) -> None:
     if not DATA_JSON_PATH.exists():
         raise SystemExit(f"ERROR: Could not find main data file at {DATA_JSON_PATH}")
-    extracted_data = extract_civilization_data(locale=locale)
-    print(f"\nSuccessfully processed {len(extracted_data)} civilizations.")
+    results = extract_locales(resolve_locales(locale), force=force)
+    for loc, extracted_data in results.items():
+        suffix = f" ({loc})" if len(results) > 1 else ""
+        print(f"\nSuccessfully processed {len(extracted_data)} civilizations{suffix}.")
 
 
 if __name__ == "__main__":
@@ -1,18 +1,29 @@
 # !/usr/bin/env python3
 
 import yaml
+import glob
 import json
+import math
+import os
 import re
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from dataclasses import dataclass
+from functools import lru_cache
 from pathlib import Path
+from typing import Sequence
 from PIL import Image, ImageDraw, ImageFont, ImageColor
 
+from aoe2civgen.atlas import atlas_digest, atlas_index_path, output_mode, read_atlas_pages, write_atlas
+from aoe2civgen.block_render import DisplayList, text_width, wrap_words
+from aoe2civgen.encoders import ENCODE_STATS, encode_image, load_encoder_settings
 from aoe2civgen.fonts import load_font_from_config
+from aoe2civgen.icon_cache import ICON_CACHE, IconCacheStats
+from aoe2civgen.image_writer import ImageWriter, write_atomic
+from aoe2civgen.layout_cache import LAYOUT_CACHE, LayoutCacheStats
 from aoe2civgen.paths import find_repo_root
-
-try:
-    from aoe2civgen.site_layout import render_civ_image as _render_civ_image_site  # type: ignore
-except Exception:  # pragma: no cover
-    _render_civ_image_site = None
+from aoe2civgen.render_manifest import RenderManifest, civ_input_digest, shared_input_digest
+from aoe2civgen.render_scale import deep_merge, parse_scales, scale_config, scale_suffix
+from aoe2civgen.site_layout import paint_civ_card as _paint_civ_card_site
 
 BASEDIR = find_repo_root()
 
@@ -53,7 +64,7 @@ def load_all_fonts_from_config(config: dict) -> tuple[
     return title_font, normal_font, bold_font, section_font
 
 
-def _resolve_data_dir(config: dict, *, locale: str) -> Path:
+def resolve_data_dir(config: dict, *, locale: str) -> Path:
     input_cfg = config.get("input", {}) or {}
     data_dir_raw = input_cfg.get("data_dir")
     if data_dir_raw:
@@ -67,13 +78,50 @@ def _resolve_data_dir(config: dict, *, locale: str) -> Path:
     return BASEDIR / "data" / loc
 
 
+def extracted_locales(config: dict) -> list[str]:
+    """
+    Локали, уже извлечённые в дерево данных (`generate --locale all`): каталоги с `all_civilizations.json`.
+    По умолчанию `data/` — это `ru`, `data/<locale>/` — остальные; с `input.data_dir` вида `.../{locale}/...`
+    перебираются подходящие под шаблон каталоги. Шаблон без `{locale}` общий для всех локалей — это одна `ru`.
+    """
+    template = str((config.get("input", {}) or {}).get("data_dir") or "")
+    if not template:
+        root = BASEDIR / "data"
+        locales = {p.parent.name for p in root.glob("*/all_civilizations.json")}
+        if (root / "all_civilizations.json").is_file():
+            locales.add("ru")
+        return sorted(locales)
+    root_str = template if Path(template).is_absolute() else str(BASEDIR / template)
+    if "{locale}" not in root_str:
+        return ["ru"] if (Path(root_str) / "all_civilizations.json").is_file() else []
+    pattern = re.compile(re.escape(root_str).replace(re.escape("{locale}"), r"([\w-]+)"))
+    locales = set()
+    for candidate in glob.glob(glob.escape(root_str).replace(glob.escape("{locale}"), "*")):
+        match = pattern.fullmatch(candidate)
+        if match and len(set(match.groups())) == 1 and (Path(candidate) / "all_civilizations.json").is_file():
+            locales.add(match.group(1))
+    return sorted(locales)
+
+
+def resolve_generate_locales(config: dict, spec: str | None) -> list[str]:
+    """Как `extract --locale`, но `all` — локали из дерева данных (`extracted_locales`), а не из submodule."""
+    from aoe2civgen.extract_data import resolve_locales
+
+    if (spec or "").strip().lower() != "all":
+        return resolve_locales(spec)
+    locales = extracted_locales(config)
+    if not locales:
+        raise FileNotFoundError("Нет извлечённых локалей (каталогов с all_civilizations.json): сначала запустите extract.")
+    return locales
+
+
 def load_all_civ_names(data_dir: Path) -> list[str]:
     civ_names = []
     if not data_dir.exists():
         print(f"WARNING: Директория с данными цивилизаций '{data_dir}' не найдена.")
         return []
     for f in data_dir.glob("*.json"):
-        if f.name == "all_civilizations.json":
+        if f.name == "all_civilizations.json" or f.name.startswith("."):
             continue
         civ_names.append(f.stem)
     return civ_names
@@ -85,6 +133,12 @@ def load_civ_data(civ_name: str, *, data_dir: Path) -> dict:
     if not civ_path.exists():
         print(f"ERROR: Файл данных для цивилизации '{civ_name}' не найден: {civ_path}")
         return {"name": civ_name, "error": "data file not found"}
+    return _read_civ_json(str(civ_path), civ_path.stat().st_mtime_ns)
+
+
+@lru_cache(maxsize=1024)
+def _read_civ_json(civ_path: str, mtime_ns: int) -> dict:
+    # Разобранный JSON общий для всех тем процесса (mtime в ключе — изменённый файл читается заново); рендереры его не меняют.
     with open(civ_path, 'r', encoding='utf-8') as f:
         return json.load(f)
 
@@ -112,7 +166,7 @@ def get_text_actual_height(text: str, font: ImageFont.FreeTypeFont) -> int:
 
 
 def draw_wrapped_text_and_get_actual_width(
-        draw: ImageDraw.Draw, text: str, x: int, y: int,
+        draw: "ImageDraw.ImageDraw | DisplayList", text: str, x: int, y: int,
         font: ImageFont.FreeTypeFont, fill: tuple[int, int, int],
         max_render_width: int, line_height: int, compactness: float = 1.0
         ) -> tuple[int, int, int]:  # Возвращает (y_after_text, total_text_block_height, max_line_actual_width)
@@ -132,36 +186,15 @@ def draw_wrapped_text_and_get_actual_width(
                 total_height_drawn += actual_line_h
             continue
 
-        lines = []
-        current_line_text = ""
-        words = para.split(' ')
-        for word_idx, word in enumerate(words):
-            test_line_text = current_line_text + (" " if current_line_text else "") + word
-            try:
-                current_line_width_px = font.getlength(test_line_text)
-            except AttributeError:
-                current_line_width_px, _ = get_text_size(test_line_text, font)
-
-            if current_line_width_px <= max_render_width:
-                current_line_text = test_line_text
-            else:
-                if current_line_text:
-                    lines.append(current_line_text)
-                current_line_text = word
-                if word_idx == 0:  # If the very first word is already too long
-                    pass  # It will be added as is below
-        if current_line_text:
-            lines.append(current_line_text)
+        # Слово, которое длиннее строки, остаётся на своей строке целиком.
+        lines = wrap_words(para.split(' '), font, max_render_width)
 
         if not lines and para:
             lines.append(para)
 
         for line_text in lines:
             draw.text((x, current_y), line_text, font=font, fill=fill)
-            try:
-                actual_w = font.getlength(line_text)
-            except AttributeError:
-                actual_w, _ = get_text_size(line_text, font)
+            actual_w = text_width(font, line_text)
             if actual_w > max_line_width_px:
                 max_line_width_px = actual_w
 
@@ -201,26 +234,37 @@ def _apply_background_image_or_heraldry(base_canvas: Image.Image, bg_source_img:
             base_canvas.paste(scaled_bg_img, (0, 0))
 
 
-def save_final_image(final_image: Image.Image, civ_name: str, config: dict, *, locale: str) -> str | None:
+def resolve_output_path(civ_name: str, config: dict, *, locale: str) -> Path:
     output_cfg = config.get("output", {}) or {}
-    image_cfg = config.get("image", {}) or {}
-
     output_format = str(output_cfg.get("format", "png")).lower()
-    output_rel_path = str(output_cfg.get("output_path", "stream_images/{locale}/{civ_name}.{format}")).format(
-        civ_name=civ_name, format=output_format, locale=locale
-    )
-    final_output_abs_path = BASEDIR / output_rel_path
+    output_template = str(output_cfg.get("output_path", "stream_images/{locale}/{civ_name}.{format}"))
+    scale = float(config.get("scale") or 1)
+    output_rel_path = Path(output_template.format(
+        civ_name=civ_name,
+        format=output_format,
+        locale=locale,
+        theme=str(config.get("theme") or DEFAULT_THEME),
+        scale=scale_suffix(scale).lstrip("@"),
+    ))
+    if scale != 1 and "{scale}" not in output_template:
+        # Без `{scale}` в шаблоне 1x сохраняет прежнее имя, остальные масштабы получают суффикс: `Aztecs@2x.png`.
+        output_rel_path = output_rel_path.with_name(f"{output_rel_path.stem}{scale_suffix(scale)}{output_rel_path.suffix}")
+    return BASEDIR / output_rel_path
+
+
+def save_final_image(final_image: Image.Image, civ_name: str, config: dict, *, locale: str) -> str | None:
+    final_output_abs_path = resolve_output_path(civ_name, config, locale=locale)
     final_output_abs_path.parent.mkdir(parents=True, exist_ok=True)
 
-    bg_color_tuple = ImageColor.getrgb(image_cfg.get("background_color", "#FFFFFF"))
     try:
-        if output_format in ("jpg", "jpeg"):
-            rgb_image = Image.new("RGB", final_image.size, bg_color_tuple[:3])
-            rgb_image.paste(final_image, mask=final_image.split()[3] if final_image.mode == "RGBA" else None)
-            rgb_image.save(str(final_output_abs_path), quality=int(output_cfg.get("jpg_quality", 90)))
-        else:
-            final_image.save(str(final_output_abs_path))
-        print(f"INFO [{civ_name}]: Изображение сохранено: {final_output_abs_path}")
+        encoded = encode_image(final_image, load_encoder_settings(config))
+        write_atomic(final_output_abs_path, encoded.data)
+        ENCODE_STATS.add(encoded)
+        psnr_note = f", PSNR {encoded.psnr:.1f} дБ" if encoded.psnr is not None and math.isfinite(encoded.psnr) else ""
+        print(
+            f"INFO [{civ_name}]: Изображение сохранено: {final_output_abs_path} "
+            f"({len(encoded.data) / 1024:.1f} КБ, {encoded.label}, кодирование {encoded.seconds * 1000:.0f} мс{psnr_note})"
+        )
         return str(final_output_abs_path)
     except Exception as e:
         print(f"ERROR [{civ_name}]: Сохранение '{final_output_abs_path}': {e}")
@@ -231,21 +275,33 @@ def draw_civilization(
         civ_name: str, config: dict, *, locale: str,
         fonts_tuple: tuple[ImageFont.FreeTypeFont, ImageFont.FreeTypeFont, ImageFont.FreeTypeFont, ImageFont.FreeTypeFont]
         ) -> str | None:
+    final_image = render_civilization(civ_name, config, locale=locale, fonts_tuple=fonts_tuple)
+    if final_image is None:
+        return None
+    return save_final_image(final_image, civ_name, config, locale=locale)
+
+
+def render_civilization(
+        civ_name: str, config: dict, *, locale: str,
+        fonts_tuple: tuple[ImageFont.FreeTypeFont, ImageFont.FreeTypeFont, ImageFont.FreeTypeFont, ImageFont.FreeTypeFont]
+        ) -> Image.Image | None:
+    """Рендер карточки без кодирования и записи (их делает `save_final_image`, в `generate` — в фоновом пуле)."""
     title_font, normal_font, bold_font, section_font = fonts_tuple
-    civ_data = load_civ_data(civ_name, data_dir=_resolve_data_dir(config, locale=locale))
+    civ_data = load_civ_data(civ_name, data_dir=resolve_data_dir(config, locale=locale))
     if civ_data.get("error"):
         return None
 
-    output_cfg, image_cfg = config.get('output', {}), config.get('image', {})
+    image_cfg = config.get('image', {})
     layout_cfg, icons_cfg = config.get('layout', {}), config.get('icons', {})
     text_styles_cfg = config.get('text', {})
 
     renderer_mode = str(layout_cfg.get("renderer", "site")).lower()
-    if renderer_mode == "site" and _render_civ_image_site is not None:
+    if renderer_mode == "site":
         config_for_render = dict(config)
         config_for_render["locale"] = locale
-        final_image = _render_civ_image_site(civ_data, config_for_render, fonts_tuple)
-        return save_final_image(final_image, civ_name, config, locale=locale)
+        # Разметка берётся из кеша, если менялись только цвета/фон: тогда карточка лишь перекрашивается.
+        card_layout = LAYOUT_CACHE.measure(civ_data, config_for_render, fonts_tuple)
+        return _paint_civ_card_site(card_layout, config_for_render)
 
     img_width = int(image_cfg.get('width', 400))
     img_height_fixed = int(image_cfg.get('height', 0) or 0)
@@ -255,9 +311,12 @@ def draw_civilization(
     text_compactness = float(layout_cfg.get('text_compactness', 0.9))
     icon_text_spacing = int(icons_cfg.get('icon_text_spacing', 8))
     section_header_bottom_margin = int(layout_cfg.get('section_header_bottom_margin', 5))
+    item_name_gap_px = int(layout_cfg.get('item_name_gap_px', 3))
+    min_content_height = int(layout_cfg.get('min_content_height', 50))
 
-    content_canvas = Image.new("RGBA", (img_width, 3000), (0, 0, 0, 0))
-    draw = ImageDraw.Draw(content_canvas)
+    # Разметка пишется в display list; холст точной высоты рисуется по нему в конце.
+    content_ops = DisplayList()
+    draw = content_ops
     current_x, current_y, max_content_y = padding, padding, padding
 
     title_style = text_styles_cfg.get('title', {})
@@ -275,23 +334,20 @@ def draw_civilization(
     civ_icon_size = icons_cfg.get('civ_icon_size', 50)
     civ_icon_pos_config = layout_cfg.get('civ_icon_position', 'top-right')
     y_after_civ_icon_block = current_y
+    # Разметка знает только размер иконки из конфига; декодирует иконку отрисовка (битая — пропускается с предупреждением).
     if civ_icon_rel_path and (civ_icon_abs_path := BASEDIR / civ_icon_rel_path).exists():
-        try:
-            civ_icon_img = Image.open(civ_icon_abs_path).convert("RGBA").resize((civ_icon_size, civ_icon_size), Image.LANCZOS)
-            if civ_icon_pos_config == 'top-left':
-                icon_paste_x, icon_paste_y = padding, max(padding, y_title_starts + (title_h - civ_icon_size) // 2)
-            elif civ_icon_pos_config == 'top-right':
-                icon_paste_x, icon_paste_y = img_width - padding - civ_icon_size, max(padding, y_title_starts + (title_h - civ_icon_size) // 2)
-            elif civ_icon_pos_config == 'top-center':
-                icon_paste_x, icon_paste_y = (img_width - civ_icon_size) // 2, current_y
-                y_after_civ_icon_block = current_y + civ_icon_size + int(section_spacing * text_compactness)
-            else:
-                icon_paste_x, icon_paste_y = 0, 0
-            if not (img_height_fixed > 0 and icon_paste_y + civ_icon_size > img_height_fixed - padding):
-                content_canvas.paste(civ_icon_img, (icon_paste_x, icon_paste_y), civ_icon_img)
-                max_content_y = max(max_content_y, icon_paste_y + civ_icon_size)
-        except Exception as e:
-            print(f"ERROR [{civ_name}]: Иконка цив '{civ_icon_abs_path}': {e}")
+        if civ_icon_pos_config == 'top-left':
+            icon_paste_x, icon_paste_y = padding, max(padding, y_title_starts + (title_h - civ_icon_size) // 2)
+        elif civ_icon_pos_config == 'top-right':
+            icon_paste_x, icon_paste_y = img_width - padding - civ_icon_size, max(padding, y_title_starts + (title_h - civ_icon_size) // 2)
+        elif civ_icon_pos_config == 'top-center':
+            icon_paste_x, icon_paste_y = (img_width - civ_icon_size) // 2, current_y
+            y_after_civ_icon_block = current_y + civ_icon_size + int(section_spacing * text_compactness)
+        else:
+            icon_paste_x, icon_paste_y = 0, 0
+        if not (img_height_fixed > 0 and icon_paste_y + civ_icon_size > img_height_fixed - padding):
+            content_ops.icon(icon_paste_x, icon_paste_y, civ_icon_rel_path, civ_icon_abs_path, civ_icon_size, warn_context=civ_name)
+            max_content_y = max(max_content_y, icon_paste_y + civ_icon_size)
     current_y = y_after_civ_icon_block
     max_content_y = max(max_content_y, current_y)
 
@@ -409,7 +465,7 @@ def draw_civilization(
                 desc_style_for_item = text_styles_cfg.get('description', {})
                 desc_font_sz_val_item = desc_style_for_item.get('font_size', 12)
                 desc_line_h_val_item = int(desc_font_sz_val_item * desc_style_for_item.get('line_height', 1.2))
-                y_for_item_desc = y_after_name + int(3 * text_compactness) if item_name_clean and name_block_h > 0 else item_start_y
+                y_for_item_desc = y_after_name + int(item_name_gap_px * text_compactness) if item_name_clean and name_block_h > 0 else item_start_y
 
                 # Описание для УТ и УЮ рисуется под именем, со сдвигом если есть иконка
                 desc_x_for_ut = text_x_coord if data_key in ("unique_techs", "unique_units") else current_x
@@ -427,32 +483,28 @@ def draw_civilization(
             # Размещение иконки
             item_actual_icon_h_on_canvas = 0
             if item_icon_path and icon_sz > 0 and (item_icon_abs := BASEDIR / item_icon_path).exists():
-                try:
-                    item_img = Image.open(item_icon_abs).convert("RGBA").resize((icon_sz, icon_sz), Image.LANCZOS)
-                    icon_y_coord = item_start_y  # По умолчанию
-
-                    if is_bonus_section:  # Иконка бонуса справа от текста
-                        # name_actual_w это ширина самого длинного ряда в блоке имени
-                        icon_x_coord = text_x_coord + name_actual_w + icon_text_spacing
-                        if icon_x_coord + icon_sz > img_width - padding:  # Если не помещается, переносим на новую строку
-                            icon_x_coord = text_x_coord  # или current_x
-                            y_after_name = y_after_name + int(item_spacing * text_compactness)  # небольшой отступ вниз
-                            icon_y_coord = y_after_name  # y_after_name уже содержит высоту блока имени
-                            total_text_block_actual_height = (y_after_name + icon_sz) - item_start_y  # Обновляем общую высоту
-                        else:  # Выравниваем по вертикали с первой строкой имени
-                            _, single_line_name_h = get_text_size("Test", item_font_to_use)
-                            icon_y_coord = item_start_y + (name_block_h if name_block_h < single_line_name_h * 1.5 else single_line_name_h - icon_sz) // 2  # Примерное выравнивание
-
-                    else:  # Иконка слева (УЮ, УТ)
-                        icon_x_coord = current_x
-                        icon_y_coord = item_start_y + (total_text_block_actual_height - icon_sz) // 2
-                        icon_y_coord = max(item_start_y, icon_y_coord)
-
-                    if not (img_height_fixed > 0 and icon_y_coord + icon_sz > img_height_fixed - padding):
-                        content_canvas.paste(item_img, (icon_x_coord, icon_y_coord), item_img)
-                        item_actual_icon_h_on_canvas = icon_sz
-                except Exception as e:
-                    print(f"ERROR [{civ_name}]: Иконка элем. '{item_icon_abs}': {e}")
+                icon_y_coord = item_start_y  # По умолчанию
+
+                if is_bonus_section:  # Иконка бонуса справа от текста
+                    # name_actual_w это ширина самого длинного ряда в блоке имени
+                    icon_x_coord = text_x_coord + name_actual_w + icon_text_spacing
+                    if icon_x_coord + icon_sz > img_width - padding:  # Если не помещается, переносим на новую строку
+                        icon_x_coord = text_x_coord  # или current_x
+                        y_after_name = y_after_name + int(item_spacing * text_compactness)  # небольшой отступ вниз
+                        icon_y_coord = y_after_name  # y_after_name уже содержит высоту блока имени
+                        total_text_block_actual_height = (y_after_name + icon_sz) - item_start_y  # Обновляем общую высоту
+                    else:  # Выравниваем по вертикали с первой строкой имени
+                        _, single_line_name_h = get_text_size("Test", item_font_to_use)
+                        icon_y_coord = item_start_y + (name_block_h if name_block_h < single_line_name_h * 1.5 else single_line_name_h - icon_sz) // 2  # Примерное выравнивание
+
+                else:  # Иконка слева (УЮ, УТ)
+                    icon_x_coord = current_x
+                    icon_y_coord = item_start_y + (total_text_block_actual_height - icon_sz) // 2
+                    icon_y_coord = max(item_start_y, icon_y_coord)
+
+                if not (img_height_fixed > 0 and icon_y_coord + icon_sz > img_height_fixed - padding):
+                    content_ops.icon(icon_x_coord, icon_y_coord, item_icon_path, item_icon_abs, icon_sz, warn_context=civ_name)
+                    item_actual_icon_h_on_canvas = icon_sz
 
             current_y = item_start_y + max(item_actual_icon_h_on_canvas, total_text_block_actual_height) + int(item_spacing * text_compactness)
             max_content_y = max(max_content_y, current_y)
@@ -474,12 +526,12 @@ def draw_civilization(
     final_content_height = max_content_y
     if img_height_fixed > 0:
         final_img_height = int(img_height_fixed)
-        content_canvas_cropped = content_canvas.crop((0, 0, img_width, final_img_height))
     else:
         final_img_height = final_content_height - (item_spacing * text_compactness if final_content_height > padding else 0) + padding
-        final_img_height = max(final_img_height, padding * 2 + 50)
+        final_img_height = max(final_img_height, padding * 2 + min_content_height)
         final_img_height = int(round(final_img_height))
-        content_canvas_cropped = content_canvas.crop((0, 0, img_width, final_img_height))
+    content_canvas = Image.new("RGBA", (img_width, final_img_height), (0, 0, 0, 0))
+    content_ops.paint_content(content_canvas)
 
     bg_color_tuple = ImageColor.getrgb(image_cfg.get('background_color', "#FFFFFF"))
     bg_alpha = int(255 * image_cfg.get('background_opacity', 1.0))
@@ -500,7 +552,7 @@ def draw_civilization(
     if bg_source_img_obj:
         _apply_background_image_or_heraldry(final_image, bg_source_img_obj, config, is_heraldry_bg)
 
-    final_image.alpha_composite(content_canvas_cropped, (0, 0))
+    final_image.alpha_composite(content_canvas, (0, 0))
 
     if (border_cfg := image_cfg.get('border', {})).get('enabled', False):
         border_w, border_r = border_cfg.get('width', 2), border_cfg.get('radius', 0)
@@ -511,65 +563,379 @@ def draw_civilization(
         else:
             border_draw.rectangle([(0, 0), (img_width-1, final_img_height-1)], outline=border_col, width=border_w)
 
-    output_format = output_cfg.get('format', 'png').lower()
-    output_rel_path = str(output_cfg.get("output_path", "stream_images/{locale}/{civ_name}.{format}")).format(
-        civ_name=civ_name, format=output_format, locale=locale
-    )
-    final_output_abs_path = BASEDIR / output_rel_path
-    final_output_abs_path.parent.mkdir(parents=True, exist_ok=True)
-    try:
-        if output_format in ('jpg', 'jpeg'):
-            rgb_image = Image.new("RGB", final_image.size, bg_color_tuple[:3])
-            rgb_image.paste(final_image, mask=final_image.split()[3] if final_image.mode == "RGBA" else None)
-            rgb_image.save(str(final_output_abs_path), quality=output_cfg.get('jpg_quality', 90))
-        else:
-            final_image.save(str(final_output_abs_path))
-        print(f"INFO [{civ_name}]: Изображение сохранено: {final_output_abs_path}")
-        return str(final_output_abs_path)
-    except Exception as e:
-        print(f"ERROR [{civ_name}]: Сохранение '{final_output_abs_path}': {e}")
-        return None
-
+    return final_image
 
-def generate_all_images(*, config_path: str | Path | None = None, locale: str = "ru") -> None:
+
+Fonts = tuple[ImageFont.FreeTypeFont, ImageFont.FreeTypeFont, ImageFont.FreeTypeFont, ImageFont.FreeTypeFont]
+
+DEFAULT_THEME = "default"
+
+# Шрифты процесса по набору (файлы + размеры): загружаются один раз и общие для всех тем/локалей с тем же набором.
+_FONTS_BY_SPEC: dict[str, Fonts] = {}
+
+
+def _font_spec(config: dict) -> str:
+    text_cfg = config.get("text", {}) or {}
+    sizes = {role: (text_cfg.get(role, {}) or {}).get("font_size") for role in ("title", "section_title", "description")}
+    return json.dumps([config.get("font_paths", {}) or {}, sizes], sort_keys=True, ensure_ascii=False, default=str)
+
+
+def fonts_for_config(config: dict) -> Fonts:
+    spec = _font_spec(config)
+    fonts = _FONTS_BY_SPEC.get(spec)
+    if fonts is None:
+        fonts = _FONTS_BY_SPEC[spec] = load_all_fonts_from_config(config)
+    return fonts
+
+
+@dataclass(frozen=True, eq=False)
+class RenderVariant:
+    """Ячейка матрицы рендера: локаль × тема × масштаб с итоговым конфигом (базовый конфиг + оверлей темы, масштабированный)."""
+
+    locale: str
+    theme: str
+    config: dict
+    scale: float = 1.0
+
+    @property
+    def label(self) -> str:
+        return f"{self.locale}/{self.theme}" + (scale_suffix(self.scale) if self.scale != 1 else "")
+
+
+def load_theme_overlays(theme_paths: Sequence[str | Path] = ()) -> list[tuple[str, dict]]:
+    """
+    Оверлеи тем: YAML с любыми ключами конфига, которые перекрывают базовый конфиг (обычно цвета/фон).
+    Имя темы — ключ `theme` в оверлее или имя файла без расширения. Без оверлеев — одна тема `default`.
+    """
+    if not theme_paths:
+        return [(DEFAULT_THEME, {})]
+    themes: list[tuple[str, dict]] = []
+    for raw_path in theme_paths:
+        overlay = dict(load_config_file(raw_path) or {})
+        name = str(overlay.pop("theme", "") or Path(raw_path).stem).strip()
+        if any(name == existing for existing, _ in themes):
+            raise ValueError(f"Тема '{name}' указана несколько раз.")
+        themes.append((name, overlay))
+    return themes
+
+
+def build_render_matrix(
+        config: dict, locales: Sequence[str], themes: Sequence[tuple[str, dict]], scales: Sequence[float] = (1.0,)
+        ) -> list[RenderVariant]:
+    variants: list[RenderVariant] = []
+    for locale in locales:
+        for theme, overlay in themes:
+            for scale in scales:
+                # Один layout-описание (1x) на все масштабы: пиксельные метрики, шрифты и иконки умножаются на `scale`.
+                variant_config = scale_config(deep_merge(config, overlay), scale)
+                variant_config["locale"] = locale
+                variant_config["theme"] = theme
+                variant_config["scale"] = scale
+                variants.append(RenderVariant(locale=locale, theme=theme, config=variant_config, scale=scale))
+    return variants
+
+
+def _init_render_worker(configs: list[dict]) -> None:
+    for config in configs:
+        fonts_for_config(config)
+
+
+def _render_civilization_in_worker(
+        civ_name: str, config: dict, locale: str
+        ) -> tuple[Image.Image | None, int, IconCacheStats, LayoutCacheStats]:
+    # Воркер только рендерит: кодирование и запись идут в фоновом пуле родителя, параллельно со следующими рендерами.
+    final_image = render_civilization(civ_name, config, locale=locale, fonts_tuple=fonts_for_config(config))
+    # Счётчики кешей накопительные по процессу: родитель хранит последний снимок каждого воркера.
+    return final_image, os.getpid(), ICON_CACHE.stats(), LAYOUT_CACHE.stats()
+
+
+def resolve_jobs(jobs: int | None) -> int:
+    if jobs is None or jobs <= 0:
+        return os.cpu_count() or 1
+    return int(jobs)
+
+
+def generate_all_images(
+        *, config_path: str | Path | None = None, locale: str = "ru", jobs: int | None = None, force: bool = False,
+        themes: Sequence[str | Path] = (), scales: str | Sequence[float] | None = None, mode: str | None = None,
+        ) -> None:
+    """
+    Рендер матрицы локали × темы × масштабы × цивилизации за один запуск.
+    `locale` — код, список через запятую или `all`; `themes` — пути к YAML-оверлеям тем;
+    `scales` — масштабы (`"1,2"`), по умолчанию `image.scale` из конфига или 1.
+    `mode` — `files` (карточка на файл), `atlas` (атласы с JSON-индексом на каждую ячейку матрицы) или `both`;
+    по умолчанию `output.mode` из конфига.
+    Шрифты, декодированные иконки, разобранные JSON цивилизаций и разметка карточек загружаются один раз на процесс
+    и переиспользуются всеми заданиями.
+    """
     print("--- Начало генерации всех изображений ---")
     config = load_config_file(config_path)
-    config["locale"] = (locale or "ru").strip().lower()
     try:
-        fonts_tuple = load_all_fonts_from_config(config)
+        scale_spec = scales if scales is not None else (config.get("image", {}) or {}).get("scale")
+        variants = build_render_matrix(
+            config, resolve_generate_locales(config, locale), load_theme_overlays(themes), parse_scales(scale_spec)
+        )
+        mode = output_mode(config, mode)
+        for variant in variants:
+            load_encoder_settings(variant.config)
+    except (OSError, ValueError) as e:
+        print(f"CRITICAL ERROR: {e} Генерация прервана.")
+        return
+    try:
+        for variant in variants:
+            fonts_for_config(variant.config)
     except Exception as e:
         print(f"CRITICAL ERROR: Не удалось загрузить шрифты: {e}. Генерация прервана.")
         return
 
-    generated_count, failed_count = 0, 0
-    data_dir = _resolve_data_dir(config, locale=locale)
-    civ_names_list = sorted(load_all_civ_names(data_dir))
-    if not civ_names_list:
+    generated_count, failed_count, skipped_count = 0, 0, 0
+    render_jobs: list[tuple[RenderVariant, str]] = []
+    for variant in variants:
+        data_dir = resolve_data_dir(variant.config, locale=variant.locale)
+        civ_names_list = sorted(load_all_civ_names(data_dir))
+        if not civ_names_list:
+            print(f"WARNING: Список цивилизаций пуст ({variant.label}).")
+        render_jobs.extend((variant, civ_name_key) for civ_name_key in civ_names_list)
+    if not render_jobs:
         print("WARNING: Список цивилизаций пуст.")
         return
-    print(f"INFO: Найдено {len(civ_names_list)} цивилизаций для обработки.")
+    if len(variants) > 1:
+        locales_count = len({v.locale for v in variants})
+        themes_count = len({v.theme for v in variants})
+        scales_count = len({v.scale for v in variants})
+        print(
+            f"INFO: Матрица рендера: локалей {locales_count} × тем {themes_count} × масштабов {scales_count}, "
+            f"всего {len(render_jobs)} изображений."
+        )
+    else:
+        print(f"INFO: Найдено {len(render_jobs)} цивилизаций для обработки.")
+
+    write_files, write_atlases = mode != "atlas", mode != "files"
+    output_paths = {job: resolve_output_path(job[1], job[0].config, locale=job[0].locale) for job in render_jobs}
+    if write_files and len(set(output_paths.values())) < len(output_paths):
+        print(
+            "CRITICAL ERROR: Разные задания пишут в один файл: добавьте `{theme}` и `{locale}` "
+            "в `output.output_path`. Генерация прервана."
+        )
+        return
+    atlas_paths = {
+        variant: atlas_index_path(
+            variant.config, basedir=BASEDIR, locale=variant.locale, theme=variant.theme, scale=variant.scale
+        )
+        for variant in variants
+    } if write_atlases else {}
+    if len(set(atlas_paths.values())) < len(atlas_paths):
+        print(
+            "CRITICAL ERROR: Разные атласы пишут в один файл: добавьте `{theme}` и `{locale}` "
+            "в `output.atlas.output_path`. Генерация прервана."
+        )
+        return
+
+    # Инкрементальный режим: пропускаем задания, входы которых не менялись с прошлого рендера.
+    manifest = RenderManifest.load()
+    shared_digests = {variant.label: shared_input_digest(variant.config) for variant in variants}
+    digests: dict[tuple[RenderVariant, str], str] = {}
+    for job in render_jobs:
+        variant, civ_name_key = job
+        data_dir = resolve_data_dir(variant.config, locale=variant.locale)
+        digests[job] = civ_input_digest(data_dir / f"{civ_name_key}.json", shared_digest=shared_digests[variant.label])
+    # Атлас собирается из всех карточек ячейки: если изменилась хоть одна, перерисовываются все карточки атласа.
+    atlas_digests = {
+        variant: atlas_digest({civ: digests[(v, civ)] for v, civ in render_jobs if v is variant}, variant.config)
+        for variant in atlas_paths
+    }
+    # Атлас свежий, только если в манифесте с этим хешем и индекс, и каждая его страница (удалённая страница пересоберётся).
+    atlas_pages = {variant: read_atlas_pages(index_path) for variant, index_path in atlas_paths.items()}
+    stale_atlases = {
+        variant for variant, digest in atlas_digests.items()
+        if force
+        or not manifest.is_fresh(atlas_paths[variant], digest)
+        or atlas_pages[variant] is None
+        or not all(manifest.is_fresh(page_path, digest) for page_path in atlas_pages[variant])
+    }
+    pending: list[tuple[RenderVariant, str]] = []
+    for job in render_jobs:
+        card_stale = write_files and (force or not manifest.is_fresh(output_paths[job], digests[job]))
+        if not card_stale and job[0] not in stale_atlases:
+            skipped_count += 1
+            continue
+        pending.append(job)
+    if skipped_count:
+        print(f"INFO: Без изменений (пропущено): {skipped_count}; к рендеру: {len(pending)}.")
+
+    def job_label(job: tuple[RenderVariant, str]) -> str:
+        return f"{job[1]} [{job[0].label}]" if len(variants) > 1 else job[1]
+
+    # Карточки атласов держатся в памяти до конца рендера: атлас упаковывается, когда известны размеры всех карточек.
+    atlas_images: dict[RenderVariant, dict[str, Image.Image]] = {variant: {} for variant in stale_atlases}
+    failed_atlases: set[RenderVariant] = set()
+
+    def on_done(job: tuple[RenderVariant, str], output_path: str | None) -> None:
+        nonlocal generated_count, failed_count
+        if output_path:
+            generated_count += 1
+            manifest.record(Path(output_path), digests[job])
+        else:
+            failed_count += 1
+            failed_atlases.add(job[0])
+            manifest.forget(output_paths[job])
+
+    def on_error(job: tuple[RenderVariant, str], e: Exception) -> None:
+        nonlocal failed_count
+        failed_count += 1
+        failed_atlases.add(job[0])
+        manifest.forget(output_paths[job])
+        print(f"CRITICAL ERROR для '{job_label(job)}': {e}")
+        import traceback
+        traceback.print_exc()
+
+    icon_stats_before = ICON_CACHE.stats()
+    layout_stats_before = LAYOUT_CACHE.stats()
+    worker_icon_stats: dict[int, IconCacheStats] = {}
+    worker_layout_stats: dict[int, LayoutCacheStats] = {}
+    encode_stats_before = ENCODE_STATS.stats()
+
+    # Кодирование и запись — в ограниченном фоновом пуле: рендер следующей карточки идёт, пока сжимается предыдущая.
+    write_futures: dict[Future, tuple[RenderVariant, str]] = {}
+
+    def submit_write(writer: ImageWriter, job: tuple[RenderVariant, str], final_image: Image.Image | None) -> None:
+        nonlocal generated_count
+        if final_image is None:
+            on_done(job, None)
+            return
+        variant, civ_name_key = job
+        if variant in atlas_images:
+            atlas_images[variant][civ_name_key] = final_image
+        if not write_files:
+            generated_count += 1
+            return
+        future = writer.submit(save_final_image, final_image, civ_name_key, variant.config, locale=variant.locale)
+        write_futures[future] = job
+
+    workers = min(resolve_jobs(jobs), len(pending))
+    with ImageWriter() as writer:
+        if workers <= 1:
+            for job in pending:
+                variant, civ_name_key = job
+                print(f"\n--- Обработка цивилизации: {job_label(job)} ---")
+                try:
+                    submit_write(writer, job, render_civilization(
+                        civ_name_key, variant.config, locale=variant.locale, fonts_tuple=fonts_for_config(variant.config)
+                    ))
+                except Exception as e:
+                    on_error(job, e)
+        else:
+            print(f"INFO: Параллельная генерация: {workers} процессов.")
+            initargs = ([variant.config for variant in variants],)
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_render_worker, initargs=initargs) as pool:
+                # Заданий в работе — не больше 2×workers: пока пул записи занят, новые рендеры не запускаются.
+                queued = iter(pending)
+                in_flight: dict[Future, tuple[RenderVariant, str]] = {}
+                while True:
+                    while len(in_flight) < 2 * workers and (job := next(queued, None)) is not None:
+                        in_flight[pool.submit(_render_civilization_in_worker, job[1], job[0].config, job[0].locale)] = job
+                    if not in_flight:
+                        break
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        job = in_flight.pop(future)
+                        try:
+                            final_image, worker_pid, worker_stats, worker_layout = future.result()
+                            worker_icon_stats[worker_pid] = worker_stats
+                            worker_layout_stats[worker_pid] = worker_layout
+                            submit_write(writer, job, final_image)
+                        except Exception as e:
+                            on_error(job, e)
+
+    for future, job in write_futures.items():
+        try:
+            on_done(job, future.result())
+        except Exception as e:
+            on_error(job, e)
+    writer_stats = writer.stats()
 
-    for civ_name_key in civ_names_list:
-        print(f"\n--- Обработка цивилизации: {civ_name_key} ---")
+    atlas_count = 0
+    for variant, images in atlas_images.items():
+        atlas_label = f"атлас [{variant.label}]"
+        if not images:
+            continue
         try:
-            if draw_civilization(civ_name_key, config, locale=locale, fonts_tuple=fonts_tuple):
-                generated_count += 1
-            else:
-                failed_count += 1
+            data_dir = resolve_data_dir(variant.config, locale=variant.locale)
+            civs = {}
+            for civ_name_key in images:
+                civ_path = data_dir / f"{civ_name_key}.json"
+                civs[civ_name_key] = _read_civ_json(str(civ_path), civ_path.stat().st_mtime_ns)
+            index_path, page_paths = write_atlas(
+                images, civs, variant.config,
+                basedir=BASEDIR, locale=variant.locale, theme=variant.theme, scale=variant.scale,
+            )
         except Exception as e:
-            failed_count += 1
-            print(f"CRITICAL ERROR для '{civ_name_key}': {e}")
-            import traceback
-            traceback.print_exc()
+            print(f"ERROR: Не удалось собрать {atlas_label}: {e}")
+            for path in [atlas_paths[variant], *(atlas_pages[variant] or [])]:
+                manifest.forget(path)
+            continue
+        atlas_count += 1
+        print(f"INFO: Атлас сохранён: {index_path} ({len(images)} карточек, страниц: {len(page_paths)})")
+        for path in atlas_pages[variant] or []:
+            manifest.forget(path)
+        for path in [index_path, *page_paths]:
+            if variant in failed_atlases:
+                # Неполный атлас: в манифест не пишем, следующий запуск соберёт его заново.
+                manifest.forget(path)
+            else:
+                manifest.record(path, atlas_digests[variant])
+
+    manifest.save()
 
     print("\n--- Генерация всех изображений завершена ---")
     print(f"Успешно сгенерировано: {generated_count} изображений.")
+    if skipped_count > 0:
+        print(f"Пропущено (без изменений): {skipped_count} изображений.")
     if failed_count > 0:
         print(f"Не удалось сгенерировать: {failed_count} изображений.")
-
-
-def main(*, config_path: str | Path | None = None, locale: str = "ru") -> None:
-    generate_all_images(config_path=config_path, locale=locale)
+    if atlas_count:
+        print(f"Собрано атласов: {atlas_count}.")
+    encode_stats = ENCODE_STATS.stats() - encode_stats_before
+    if encode_stats.images:
+        print(
+            f"Кодирование: {encode_stats.images} изображений, {encode_stats.bytes / 1024:.1f} КБ, "
+            f"{encode_stats.seconds:.2f} с (в среднем {encode_stats.seconds / encode_stats.images * 1000:.0f} мс)."
+        )
+    if writer_stats.jobs:
+        print(
+            f"Очередь записи (до {writer.max_pending} изображений): рендер ждал освобождения места "
+            f"{writer_stats.stalls} раз, всего {writer_stats.stall_seconds:.2f} с."
+        )
+    local_stats = ICON_CACHE.stats()
+    icon_stats = sum(
+        worker_icon_stats.values(),
+        IconCacheStats(
+            hits=local_stats.hits - icon_stats_before.hits,
+            misses=local_stats.misses - icon_stats_before.misses,
+            evictions=local_stats.evictions - icon_stats_before.evictions,
+            variants=local_stats.variants - icon_stats_before.variants,
+        ),
+    )
+    if icon_stats.hits or icon_stats.misses:
+        print(
+            f"Кеш иконок: попаданий {icon_stats.hits}, промахов {icon_stats.misses} "
+            f"({icon_stats.hit_rate:.0%}; из готовых вариантов {icon_stats.variants}), вытеснено {icon_stats.evictions}."
+        )
+    layout_stats = sum(worker_layout_stats.values(), LAYOUT_CACHE.stats() - layout_stats_before)
+    if layout_stats.memory_hits or layout_stats.disk_hits or layout_stats.misses:
+        print(
+            f"Кеш разметки: из памяти {layout_stats.memory_hits}, с диска {layout_stats.disk_hits}, "
+            f"рассчитано заново {layout_stats.misses}."
+        )
+
+
+def main(
+        *, config_path: str | Path | None = None, locale: str = "ru", jobs: int | None = None, force: bool = False,
+        themes: Sequence[str | Path] = (), scales: str | Sequence[float] | None = None, mode: str | None = None,
+        ) -> None:
+    generate_all_images(
+        config_path=config_path, locale=locale, jobs=jobs, force=force, themes=themes, scales=scales, mode=mode
+    )
 
 
 if __name__ == "__main__":
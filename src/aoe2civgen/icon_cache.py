@@ -0,0 +1,139 @@
+"""Process-wide LRU cache of decoded, resized RGBA icons shared by both renderers."""
+
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+
+from PIL import Image
+
+from aoe2civgen.icon_variants import is_variant_fresh, variant_path
+
+
+DEFAULT_MAX_ENTRIES = 512
+# Decoded full-size sources kept for resizing to further sizes (e.g. the @2x pass after the @1x one).
+DEFAULT_MAX_SOURCES = 128
+
+
+@dataclass(frozen=True)
+class IconCacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    entries: int = 0
+    # Misses served from a pre-resized variant (`prepare-icons`) instead of resampling the source.
+    variants: int = 0
+
+    def __add__(self, other: "IconCacheStats") -> "IconCacheStats":
+        return IconCacheStats(
+            hits=self.hits + other.hits,
+            misses=self.misses + other.misses,
+            evictions=self.evictions + other.evictions,
+            entries=self.entries + other.entries,
+            variants=self.variants + other.variants,
+        )
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class IconCache:
+    """
+    Bounded LRU of icons keyed by (path, mtime_ns, size, resample filter): a changed file is a new key,
+    so stale entries are never served and simply age out.
+    Cached images are shared between callers and must be treated as read-only (paste them, never draw on them).
+    On a miss, a fresh pre-resized variant (`.cache/icons/@<size>/<source path>`) is loaded instead of resampling;
+    otherwise the decoded RGBA source is kept in a second, smaller LRU so other sizes of the same icon skip decoding.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, max_sources: int = DEFAULT_MAX_SOURCES) -> None:
+        self.max_entries = max(1, int(max_entries))
+        self.max_sources = max(1, int(max_sources))
+        self._entries: OrderedDict[tuple[str, int, tuple[int, int], int], Image.Image] = OrderedDict()
+        self._sources: OrderedDict[tuple[str, int], Image.Image] = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._variants = 0
+
+    def get(self, path: Path, size: int | tuple[int, int], resample: int = Image.LANCZOS) -> Image.Image:
+        """Same result as `Image.open(path).convert("RGBA").resize(size, resample)`; raises like it on bad files."""
+        dims = (size, size) if isinstance(size, int) else (int(size[0]), int(size[1]))
+        key = (str(path), path.stat().st_mtime_ns, dims, int(resample))
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None:
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return cached
+            self._misses += 1
+
+        icon = self._load_variant(path, dims) if resample == Image.LANCZOS and dims[0] == dims[1] else None
+        if icon is None:
+            icon = self._source(path, key[1]).resize(dims, resample)
+
+        with self._lock:
+            self._entries[key] = icon
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+        return icon
+
+    def _source(self, path: Path, mtime_ns: int) -> Image.Image:
+        source_key = (str(path), mtime_ns)
+        with self._lock:
+            source = self._sources.get(source_key)
+            if source is not None:
+                self._sources.move_to_end(source_key)
+                return source
+        with Image.open(path) as src:
+            source = src.convert("RGBA")
+        with self._lock:
+            self._sources[source_key] = source
+            while len(self._sources) > self.max_sources:
+                self._sources.popitem(last=False)
+        return source
+
+    def _load_variant(self, path: Path, dims: tuple[int, int]) -> Image.Image | None:
+        variant = variant_path(path, dims[0])
+        if not is_variant_fresh(path, variant):
+            return None
+        try:
+            with Image.open(variant) as src:
+                icon = src.convert("RGBA")
+        except Exception:
+            return None
+        if icon.size != dims:
+            return None
+        with self._lock:
+            self._variants += 1
+        return icon
+
+    def stats(self) -> IconCacheStats:
+        with self._lock:
+            return IconCacheStats(
+                hits=self._hits,
+                misses=self._misses,
+                evictions=self._evictions,
+                entries=len(self._entries),
+                variants=self._variants,
+            )
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._sources.clear()
+            self._hits = self._misses = self._evictions = self._variants = 0
+
+
+ICON_CACHE = IconCache()
+
+
+def load_icon(path: Path, size: int | tuple[int, int], resample: int = Image.LANCZOS) -> Image.Image:
+    return ICON_CACHE.get(path, size, resample)
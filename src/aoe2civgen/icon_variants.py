@@ -0,0 +1,160 @@
+"""Pre-resized icon variants (`.cache/icons/@34/icons/units/123.png`) for the icon sizes the active config renders."""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import re
+import shutil
+from pathlib import Path
+from typing import Sequence
+
+from PIL import Image
+
+from aoe2civgen.paths import find_repo_root
+from aoe2civgen.render_scale import deep_merge, parse_scales, scale_config
+
+
+BASEDIR = find_repo_root()
+# Variants are build artifacts: kept out of the icon directories (`stream_images/` is published as is).
+ICON_VARIANTS_DIR = BASEDIR / ".cache" / "icons"
+# Directories the extractor fills with icons referenced from `data/*.json`.
+ICON_SOURCE_DIRS: tuple[Path, ...] = (
+    BASEDIR / "icons" / "units",
+    BASEDIR / "icons" / "techs",
+    BASEDIR / "icons" / "buildings",
+    BASEDIR / "icons" / "resources",
+    BASEDIR / "icons" / "ages",
+    BASEDIR / "stream_images" / "icons",
+)
+# Variant directories earlier versions wrote next to the sources.
+_LEGACY_VARIANT_DIR_RE = re.compile(r"@\d+")
+
+
+def variant_path(source_path: Path, size: int) -> Path:
+    """`icons/units/123.png` -> `.cache/icons/@<size>/icons/units/123.png`; sources outside the repo by directory hash."""
+    try:
+        rel = source_path.resolve().relative_to(BASEDIR.resolve())
+    except ValueError:
+        parent_key = hashlib.sha256(str(source_path.resolve().parent).encode("utf-8")).hexdigest()[:16]
+        rel = Path("_external") / parent_key / source_path.name
+    return ICON_VARIANTS_DIR / f"@{int(size)}" / rel
+
+
+def is_variant_fresh(source_path: Path, variant: Path) -> bool:
+    """A variant carries its source's mtime; any other mtime means the source changed since it was written."""
+    try:
+        return variant.stat().st_mtime_ns == source_path.stat().st_mtime_ns
+    except OSError:
+        return False
+
+
+def configured_icon_sizes(
+        config: dict, *, scales: Sequence[float] | None = None, themes: Sequence[tuple[str, dict]] = (),
+        ) -> list[int]:
+    """
+    Icon sizes (px, square) the configured renderer actually draws, with the same defaults the renderers use,
+    for every theme overlay (`(name, overlay)`; none = the bare config) at every scale (default: `image.scale`).
+    """
+    factors = scales if scales is not None else parse_scales((config.get("image", {}) or {}).get("scale"))
+    sizes: set[int] = set()
+    for themed in [deep_merge(config, overlay) for _, overlay in themes] or [config]:
+        for scale in factors:
+            sizes.update(_renderer_icon_sizes(scale_config(themed, scale)))
+    return sorted(sizes)
+
+
+def _renderer_icon_sizes(config: dict) -> list[int]:
+    icons_cfg = config.get("icons", {}) or {}
+    renderer_mode = str((config.get("layout", {}) or {}).get("renderer", "site")).lower()
+    if renderer_mode == "site":
+        sizes = [
+            icons_cfg.get("civ_icon_size", 64),
+            icons_cfg.get("unique_unit_icon_size", 26),
+            icons_cfg.get("unique_tech_icon_size", icons_cfg.get("tech_icon_size", 26)),
+        ]
+    else:
+        sizes = [
+            icons_cfg.get("civ_icon_size", 50),
+            icons_cfg.get("unit_icon_size", 28),
+            icons_cfg.get("tech_icon_size", 28),
+        ]
+        if icons_cfg.get("show_bonus_icons", True):
+            sizes.append(icons_cfg.get("bonus_icon_size", 20))
+        if icons_cfg.get("show_team_bonus_icons", True):
+            sizes.append(icons_cfg.get("team_bonus_icon_size", 20))
+    return sorted({int(s) for s in sizes if int(s) > 0})
+
+
+def _iter_source_icons(source_dirs: tuple[Path, ...]) -> list[Path]:
+    icons: list[Path] = []
+    for folder in source_dirs:
+        if folder.is_dir():
+            icons.extend(sorted(p for p in folder.glob("*.png") if p.is_file()))
+    return icons
+
+
+def write_icon_variant(source_path: Path, size: int) -> Path:
+    """Resize exactly like the renderers do (RGBA + LANCZOS) and store the result losslessly."""
+    dest = variant_path(source_path, size)
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    with Image.open(source_path) as src:
+        icon = src.convert("RGBA").resize((size, size), Image.LANCZOS)
+    tmp_path = dest.with_name(f".{dest.name}.{os.getpid()}.tmp")
+    icon.save(tmp_path, format="PNG")
+    st = source_path.stat()
+    os.utime(tmp_path, ns=(st.st_atime_ns, st.st_mtime_ns))
+    os.replace(tmp_path, dest)
+    return dest
+
+
+def remove_legacy_variants(source_dirs: tuple[Path, ...] = ICON_SOURCE_DIRS) -> int:
+    """Delete `@<size>/` directories earlier versions wrote next to the sources. Returns the number removed."""
+    removed = 0
+    for folder in source_dirs:
+        if not folder.is_dir():
+            continue
+        for legacy in sorted(folder.iterdir()):
+            if legacy.is_dir() and _LEGACY_VARIANT_DIR_RE.fullmatch(legacy.name):
+                shutil.rmtree(legacy, ignore_errors=True)
+                removed += 1
+    return removed
+
+
+def prepare_icon_variants(
+        config: dict, *, force: bool = False, scales: Sequence[float] | None = None,
+        themes: Sequence[tuple[str, dict]] = (), source_dirs: tuple[Path, ...] = ICON_SOURCE_DIRS,
+        ) -> tuple[int, int]:
+    """Write missing/stale variants for every configured size. Returns (written, up_to_date)."""
+    sizes = configured_icon_sizes(config, scales=scales, themes=themes)
+    written, up_to_date = 0, 0
+    for source_path in _iter_source_icons(source_dirs):
+        for size in sizes:
+            if not force and is_variant_fresh(source_path, variant_path(source_path, size)):
+                up_to_date += 1
+                continue
+            try:
+                write_icon_variant(source_path, size)
+                written += 1
+            except Exception as e:
+                print(f"WARNING: Не удалось подготовить иконку {source_path} ({size}px): {e}")
+    return written, up_to_date
+
+
+def main(
+        *, config_path: str | Path | None = None, force: bool = False,
+        themes: Sequence[str | Path] = (), scales: str | Sequence[float] | None = None,
+        ) -> None:
+    """`themes` and `scales` as in `generate`: the variants cover every size that run would draw."""
+    from aoe2civgen.generate_images import load_config_file, load_theme_overlays
+
+    config = load_config_file(config_path)
+    overlays = load_theme_overlays(themes) if themes else []
+    factors = parse_scales(scales) if scales is not None else None
+    sizes = configured_icon_sizes(config, scales=factors, themes=overlays)
+    print(f"INFO: Размеры иконок из конфига: {', '.join(map(str, sizes)) or '—'}")
+    removed = remove_legacy_variants()
+    if removed:
+        print(f"INFO: Удалено старых каталогов вариантов рядом с исходниками: {removed}.")
+    written, up_to_date = prepare_icon_variants(config, force=force, scales=factors, themes=overlays)
+    print(f"INFO: Подготовлено вариантов иконок: {written}, актуальных: {up_to_date} (в {ICON_VARIANTS_DIR}).")
@@ -0,0 +1,123 @@
+"""
+Served images of the HTTP server: content hashes for ETags and immutable URLs, and the immutable in-memory copy
+of `stream_images/<locale>/**/*.png` (`serve --preload`).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path, PurePosixPath
+from types import MappingProxyType
+from typing import Iterable, Iterator, Mapping
+
+
+# Content-hash prefix embedded in immutable URLs: `Aztecs.png` -> `Aztecs.<16 hex>.png`.
+URL_HASH_LENGTH = 16
+_HASHED_NAME_RE = re.compile(rf"(?P<stem>.+)\.(?P<hash>[0-9a-f]{{{URL_HASH_LENGTH}}})(?P<suffix>\.[^./]+)")
+
+
+def strong_etag(digest: str) -> str:
+    return f'"{digest[:32]}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """`If-None-Match` uses the weak comparison: `W/"x"` matches `"x"`; `*` matches anything."""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in (tag.removeprefix("W/") for tag in candidates)
+
+
+def hashed_filename(filename: str, digest: str) -> str:
+    path = PurePosixPath(filename)
+    return path.with_name(f"{path.stem}.{digest[:URL_HASH_LENGTH]}{path.suffix}").as_posix()
+
+
+def split_hashed_filename(filename: str) -> tuple[str, str] | None:
+    """`en/Aztecs.0123456789abcdef.png` -> (`en/Aztecs.png`, `0123456789abcdef`); None for a plain name."""
+    path = PurePosixPath(filename)
+    match = _HASHED_NAME_RE.fullmatch(path.name)
+    if match is None:
+        return None
+    return path.with_name(match["stem"] + match["suffix"]).as_posix(), match["hash"]
+
+
+@lru_cache(maxsize=4096)
+def _file_digest(path: str, mtime_ns: int, size: int) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def file_digest(path: Path) -> str:
+    """sha256 of a file, re-hashed only when its mtime or size changes (the non-preloaded server mode)."""
+    st = path.stat()
+    return _file_digest(str(path), st.st_mtime_ns, st.st_size)
+
+
+def iter_image_files(locale_root: Path) -> Iterator[tuple[str, Path]]:
+    """(posix name relative to `locale_root`, path) of the served PNGs, sorted."""
+    if not locale_root.is_dir():
+        return
+    for path in sorted(locale_root.rglob("*.png")):
+        rel = path.relative_to(locale_root)
+        # Hidden files are manifests and in-flight temp files of `generate`.
+        if any(part.startswith(".") for part in rel.parts) or not path.is_file():
+            continue
+        yield rel.as_posix(), path
+
+
+@dataclass(frozen=True)
+class StoredImage:
+    data: bytes
+    media_type: str
+    # sha256 of `data`, computed once at load.
+    digest: str
+
+    @property
+    def length(self) -> int:
+        return len(self.data)
+
+    @property
+    def etag(self) -> str:
+        return strong_etag(self.digest)
+
+
+class ImageStore:
+    """
+    (locale, filename relative to the locale directory, posix) -> image bytes, loaded once at startup.
+    A request is validated by the dict lookup alone: names that could escape the locale directory
+    (`..`, absolute paths, backslashes) are never keys, so no filesystem call is needed per request.
+    The store never changes after loading: restart the server to pick up newly generated images.
+    """
+
+    def __init__(self, images: Mapping[tuple[str, str], StoredImage]) -> None:
+        self._images = MappingProxyType(dict(images))
+        self.total_bytes = sum(image.length for image in self._images.values())
+
+    @classmethod
+    def load(cls, images_root: Path, locales: Iterable[str]) -> "ImageStore":
+        images: dict[tuple[str, str], StoredImage] = {}
+        for locale in locales:
+            for filename, path in iter_image_files(images_root / locale):
+                data = path.read_bytes()
+                images[(locale, filename)] = StoredImage(
+                    data=data, media_type="image/png", digest=hashlib.sha256(data).hexdigest()
+                )
+        return cls(images)
+
+    def get(self, locale: str, filename: str) -> StoredImage | None:
+        return self._images.get((locale, filename))
+
+    def items(self, locale: str) -> Iterator[tuple[str, StoredImage]]:
+        for (image_locale, filename), image in self._images.items():
+            if image_locale == locale:
+                yield filename, image
+
+    def __len__(self) -> int:
+        return len(self._images)
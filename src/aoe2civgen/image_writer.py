@@ -0,0 +1,82 @@
+"""Bounded background pool for the encode-and-write stage, plus atomic file writes."""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable
+
+
+DEFAULT_WRITER_THREADS = min(4, os.cpu_count() or 1)
+
+
+def write_atomic(path: Path, data: bytes) -> None:
+    """Write via a temp file + rename, so a reader (e.g. an OBS browser source) never sees a half-written image."""
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+
+@dataclass(frozen=True)
+class WriterStats:
+    jobs: int = 0
+    # `submit` calls that had to wait for a free slot, and the total time spent waiting.
+    stalls: int = 0
+    stall_seconds: float = 0.0
+
+
+class ImageWriter:
+    """
+    Runs encode+write jobs on background threads while the caller renders the next image.
+    At most `max_pending` jobs are queued or running: `submit` blocks beyond that (a stall), which caps
+    the memory held by rendered-but-not-yet-written images. Pillow releases the GIL while encoding.
+    """
+
+    def __init__(self, *, workers: int = DEFAULT_WRITER_THREADS, max_pending: int | None = None) -> None:
+        workers = max(1, int(workers))
+        self.max_pending = max(1, int(max_pending if max_pending is not None else 2 * workers))
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="image-writer")
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._lock = threading.Lock()
+        self._jobs = 0
+        self._stalls = 0
+        self._stall_seconds = 0.0
+
+    def submit(self, fn: Callable[..., Any], /, *args: Any, **kwargs: Any) -> Future:
+        if not self._slots.acquire(blocking=False):
+            started = time.perf_counter()
+            self._slots.acquire()
+            with self._lock:
+                self._stalls += 1
+                self._stall_seconds += time.perf_counter() - started
+        with self._lock:
+            self._jobs += 1
+        try:
+            future = self._executor.submit(fn, *args, **kwargs)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=True)
+
+    def __enter__(self) -> "ImageWriter":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.shutdown()
+
+    def stats(self) -> WriterStats:
+        with self._lock:
+            return WriterStats(jobs=self._jobs, stalls=self._stalls, stall_seconds=self._stall_seconds)
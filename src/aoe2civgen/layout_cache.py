@@ -0,0 +1,275 @@
+"""Cache of measured site-renderer card layouts, keyed only on the inputs that affect geometry."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from PIL import ImageFont
+
+from aoe2civgen.block_render import DisplayList, TextOp
+from aoe2civgen.paths import find_repo_root
+from aoe2civgen.render_manifest import fonts_digest, hash_file
+from aoe2civgen.site_layout import CardLayout, measure_civ_card
+
+
+BASEDIR = find_repo_root()
+LAYOUT_CACHE_DIR = BASEDIR / ".cache" / "layouts"
+DEFAULT_MAX_ENTRIES = 256
+# `.cache/layouts/*.json` beyond this many are pruned, least recently used (by mtime) first.
+DEFAULT_MAX_DISK_ENTRIES = 4096
+# Stores between two scans of the cache directory.
+_PRUNE_EVERY = 64
+
+_LAYOUT_CACHE_VERSION = 2
+# Sources of the measure pass: a change there invalidates every cached layout.
+_LAYOUT_MODULES = ("site_layout.py", "block_render.py", "layout_cache.py")
+# Config keys that only change how an already laid out card is painted.
+_PAINT_ONLY_SUFFIXES = ("color", "opacity")
+_PAINT_ONLY_KEYS = frozenset(
+    {"theme", "output", "background_image", "use_heraldry_background", "border", "border_width", "radius"}
+)
+
+Fonts = tuple[ImageFont.FreeTypeFont, ImageFont.FreeTypeFont, ImageFont.FreeTypeFont, ImageFont.FreeTypeFont]
+
+
+def geometry_config(value: Any) -> Any:
+    """`config` without paint-only keys (colors, opacities, background, border, output)."""
+    if isinstance(value, dict):
+        return {
+            k: geometry_config(v)
+            for k, v in value.items()
+            if not (str(k) in _PAINT_ONLY_KEYS or str(k).endswith(_PAINT_ONLY_SUFFIXES))
+        }
+    if isinstance(value, list):
+        return [geometry_config(v) for v in value]
+    return value
+
+
+def _layout_code_digest() -> str:
+    here = Path(__file__).resolve().parent
+    return hashlib.sha256("\n".join(hash_file(here / name) for name in _LAYOUT_MODULES).encode("utf-8")).hexdigest()
+
+
+def layout_key(civ_data: dict, config: dict, *, code_digest: str | None = None) -> str:
+    """Geometry inputs: civ texts/icon refs, font files and sizes, width, paddings, spacings, labels, layout code."""
+    payload = json.dumps(
+        {
+            "version": _LAYOUT_CACHE_VERSION,
+            "code": code_digest or _layout_code_digest(),
+            "fonts": fonts_digest(config),
+            "config": geometry_config(config),
+            "civ": civ_data,
+        },
+        sort_keys=True,
+        ensure_ascii=False,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _icon_path_to_json(path: Path) -> str:
+    try:
+        return path.relative_to(BASEDIR).as_posix()
+    except ValueError:
+        return str(path)
+
+
+def _icon_path_from_json(raw: str) -> Path:
+    path = Path(raw)
+    return path if path.is_absolute() else BASEDIR / path
+
+
+def layout_to_json(layout: CardLayout, fonts: Fonts) -> dict:
+    """
+    Fonts are stored as indices into the renderer's `fonts` tuple and rebound on load;
+    icon paths inside the repo are stored relative to it, so the cache survives moving the checkout.
+    """
+    font_index = {id(font): i for i, font in reversed(list(enumerate(fonts)))}
+    content: list[list[Any]] = []
+    for op in layout.display.content:
+        if isinstance(op, TextOp):
+            color = op.color if isinstance(op.color, str) else list(op.color)
+            content.append(["text", op.x, op.y, op.text, font_index[id(op.font)], color])
+        else:
+            content.append(["icon", op.x, op.y, op.ref, _icon_path_to_json(op.path), op.size, op.warn_context])
+    return {
+        "version": _LAYOUT_CACHE_VERSION,
+        "width": layout.width,
+        "height": layout.height,
+        "blocks": [[b.x0, b.y0, b.x1, b.y1] for b in layout.display.blocks],
+        "content": content,
+    }
+
+
+def layout_from_json(payload: dict, fonts: Fonts) -> CardLayout:
+    if payload.get("version") != _LAYOUT_CACHE_VERSION:
+        raise ValueError("layout cache version mismatch")
+    display = DisplayList()
+    for x0, y0, x1, y1 in payload["blocks"]:
+        display.block(x0, y0, x1, y1)
+    for entry in payload["content"]:
+        if entry[0] == "text":
+            _, x, y, text, font_idx, color = entry
+            display.text((x, y), text, font=fonts[font_idx], fill=color if isinstance(color, str) else tuple(color))
+        else:
+            _, x, y, ref, path, size, warn_context = entry
+            display.icon(x, y, ref, _icon_path_from_json(path), size, warn_context=warn_context)
+    return CardLayout(width=int(payload["width"]), height=int(payload["height"]), display=display)
+
+
+@dataclass(frozen=True)
+class LayoutCacheStats:
+    memory_hits: int = 0
+    disk_hits: int = 0
+    misses: int = 0
+
+    def __add__(self, other: "LayoutCacheStats") -> "LayoutCacheStats":
+        return LayoutCacheStats(
+            memory_hits=self.memory_hits + other.memory_hits,
+            disk_hits=self.disk_hits + other.disk_hits,
+            misses=self.misses + other.misses,
+        )
+
+    def __sub__(self, other: "LayoutCacheStats") -> "LayoutCacheStats":
+        return LayoutCacheStats(
+            memory_hits=self.memory_hits - other.memory_hits,
+            disk_hits=self.disk_hits - other.disk_hits,
+            misses=self.misses - other.misses,
+        )
+
+
+class LayoutCache:
+    """
+    Two-level cache of `measure_civ_card` results: a bounded in-memory LRU in front of `.cache/layouts/<key>.json`,
+    which is itself capped at `max_disk_entries` files (disk hits refresh a file's mtime, the oldest are pruned).
+    Paint-only config changes (re-theming) keep the key, so such renders skip text measurement and wrapping.
+    Cached layouts are shared between callers and must be treated as read-only.
+    """
+
+    def __init__(
+            self, cache_dir: Path | None = LAYOUT_CACHE_DIR, max_entries: int = DEFAULT_MAX_ENTRIES,
+            max_disk_entries: int = DEFAULT_MAX_DISK_ENTRIES,
+            ) -> None:
+        self.cache_dir = cache_dir
+        self.max_entries = max(1, int(max_entries))
+        self.max_disk_entries = max(1, int(max_disk_entries))
+        self._stores = 0
+        self._entries: OrderedDict[tuple[str, tuple[int, ...]], CardLayout] = OrderedDict()
+        self._lock = threading.Lock()
+        self._code_digest: str | None = None
+        self._memory_hits = 0
+        self._disk_hits = 0
+        self._misses = 0
+
+    def measure(self, civ_data: dict, config: dict, fonts: Fonts) -> CardLayout:
+        if self._code_digest is None:
+            self._code_digest = _layout_code_digest()
+        key = layout_key(civ_data, config, code_digest=self._code_digest)
+        # In memory, layouts hold live font objects: only reuse them with the very same fonts.
+        memory_key = (key, tuple(id(font) for font in fonts))
+        with self._lock:
+            cached = self._entries.get(memory_key)
+            if cached is not None:
+                self._entries.move_to_end(memory_key)
+                self._memory_hits += 1
+                return cached
+
+        layout = self._load(key, fonts)
+        if layout is None:
+            layout = measure_civ_card(civ_data, config, fonts)
+            self._store(key, layout, fonts)
+            with self._lock:
+                self._misses += 1
+        else:
+            with self._lock:
+                self._disk_hits += 1
+
+        with self._lock:
+            self._entries[memory_key] = layout
+            self._entries.move_to_end(memory_key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return layout
+
+    def _path(self, key: str) -> Path | None:
+        return self.cache_dir / f"{key}.json" if self.cache_dir is not None else None
+
+    def _load(self, key: str, fonts: Fonts) -> CardLayout | None:
+        path = self._path(key)
+        if path is None:
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                layout = layout_from_json(json.load(f), fonts)
+        except (OSError, ValueError, KeyError, IndexError, TypeError):
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return layout
+
+    def _store(self, key: str, layout: CardLayout, fonts: Fonts) -> None:
+        path = self._path(key)
+        if path is None:
+            return
+        try:
+            payload = layout_to_json(layout, fonts)
+        except KeyError:  # a font outside `fonts` (should not happen): keep the layout in memory only
+            return
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(payload, f, ensure_ascii=False, separators=(",", ":"))
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"WARNING: Не удалось сохранить кеш разметки {path}: {e}")
+            return
+        with self._lock:
+            self._stores += 1
+            due = self._stores % _PRUNE_EVERY == 1
+        if due:
+            self.prune()
+
+    def prune(self) -> int:
+        """Delete the least recently used layout files beyond `max_disk_entries`. Returns the number deleted."""
+        if self.cache_dir is None:
+            return 0
+        entries: list[tuple[int, Path]] = []
+        try:
+            with os.scandir(self.cache_dir) as it:
+                for entry in it:
+                    if entry.name.endswith(".json") and not entry.name.startswith("."):
+                        try:
+                            entries.append((entry.stat().st_mtime_ns, Path(entry.path)))
+                        except OSError:
+                            continue
+        except OSError:
+            return 0
+        excess = len(entries) - self.max_disk_entries
+        if excess <= 0:
+            return 0
+        entries.sort()
+        for _, path in entries[:excess]:
+            path.unlink(missing_ok=True)
+        return excess
+
+    def stats(self) -> LayoutCacheStats:
+        with self._lock:
+            return LayoutCacheStats(memory_hits=self._memory_hits, disk_hits=self._disk_hits, misses=self._misses)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._memory_hits = self._disk_hits = self._misses = 0
+
+
+LAYOUT_CACHE = LayoutCache()
@@ -0,0 +1,173 @@
+"""Build manifest for incremental rendering: content hashes of each civ's render inputs."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Any
+
+from aoe2civgen.paths import find_repo_root
+
+
+BASEDIR = find_repo_root()
+MANIFEST_PATH = BASEDIR / "stream_images" / ".manifest.json"
+
+_MANIFEST_VERSION = 1
+# Renderer sources are part of the digest, so a code change re-renders everything.
+_RENDERER_MODULES = (
+    "generate_images.py",
+    "site_layout.py",
+    "block_render.py",
+    "fonts.py",
+    "encoders.py",
+    "icon_cache.py",
+    "layout_cache.py",
+    "render_scale.py",
+    "image_writer.py",
+    "aoe2_helptext.py",
+)
+_FONT_ROLES = ("title", "section_title", "normal", "bold")
+_ICON_SECTIONS = ("bonuses", "unique_units", "unique_techs", "team_bonus")
+
+
+def _sha256_bytes(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def hash_file(path: Path) -> str:
+    if not path.is_file():
+        return "missing"
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _resolve_repo_path(path_str: str) -> Path:
+    p = Path(path_str)
+    return p if p.is_absolute() else (BASEDIR / p)
+
+
+def config_digest(config: dict) -> str:
+    payload = json.dumps(config, sort_keys=True, ensure_ascii=False, default=str)
+    return _sha256_bytes(payload.encode("utf-8"))
+
+
+def fonts_digest(config: dict) -> str:
+    """
+    Digest of the font files referenced by `font_paths`.
+    Roles without a path (or with a missing file) fall back to a system default font; those are keyed by role only.
+    """
+    font_cfg = config.get("font_paths", {}) or {}
+    parts: list[str] = []
+    for role in _FONT_ROLES:
+        raw = font_cfg.get(role)
+        if raw:
+            parts.append(f"{role}={hash_file(_resolve_repo_path(str(raw)))}")
+        else:
+            parts.append(f"{role}=default")
+    return _sha256_bytes("\n".join(parts).encode("utf-8"))
+
+
+def assets_digest(config: dict) -> str:
+    """Digest of the files the config points at besides fonts: the card background (`image.background_image`)."""
+    background = str((config.get("image", {}) or {}).get("background_image") or "").strip()
+    return _sha256_bytes(f"background={hash_file(_resolve_repo_path(background)) if background else 'none'}".encode("utf-8"))
+
+
+def renderer_digest() -> str:
+    here = Path(__file__).resolve().parent
+    return _sha256_bytes("\n".join(hash_file(here / name) for name in _RENDERER_MODULES).encode("utf-8"))
+
+
+def _iter_icon_refs(civ_data: Any) -> list[str]:
+    if not isinstance(civ_data, dict):
+        return []
+    refs: list[str] = []
+    if civ_data.get("icon"):
+        refs.append(str(civ_data["icon"]))
+    for section in _ICON_SECTIONS:
+        items = civ_data.get(section) or []
+        if not isinstance(items, list):
+            continue
+        for item in items:
+            if isinstance(item, dict) and item.get("icon"):
+                refs.append(str(item["icon"]))
+    return sorted(set(refs))
+
+
+def civ_input_digest(civ_path: Path, *, shared_digest: str) -> str:
+    """
+    Hash of everything a single civ render depends on:
+    the civ JSON, the icon files it references, plus `shared_digest` (config + fonts + background + renderer).
+    """
+    h = hashlib.sha256()
+    h.update(shared_digest.encode("utf-8"))
+    try:
+        raw = civ_path.read_bytes()
+    except OSError:
+        return "missing"
+    h.update(b"\0data\0" + hashlib.sha256(raw).digest())
+    try:
+        civ_data = json.loads(raw)
+    except ValueError:
+        civ_data = None
+    for ref in _iter_icon_refs(civ_data):
+        h.update(f"\0icon\0{ref}\0{hash_file(_resolve_repo_path(ref))}".encode("utf-8"))
+    return h.hexdigest()
+
+
+def shared_input_digest(config: dict) -> str:
+    payload = "\n".join(
+        [f"v{_MANIFEST_VERSION}", config_digest(config), fonts_digest(config), assets_digest(config), renderer_digest()]
+    )
+    return _sha256_bytes(payload.encode("utf-8"))
+
+
+class RenderManifest:
+    """Output path (relative to the repo root) -> input digest of the last successful render."""
+
+    def __init__(self, path: Path = MANIFEST_PATH, entries: dict[str, str] | None = None) -> None:
+        self.path = path
+        self.entries: dict[str, str] = dict(entries or {})
+
+    @classmethod
+    def load(cls, path: Path = MANIFEST_PATH) -> "RenderManifest":
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                payload = json.load(f)
+        except (OSError, ValueError):
+            return cls(path)
+        if not isinstance(payload, dict) or payload.get("version") != _MANIFEST_VERSION:
+            return cls(path)
+        entries = payload.get("outputs") or {}
+        if not isinstance(entries, dict):
+            return cls(path)
+        return cls(path, {str(k): str(v) for k, v in entries.items()})
+
+    @staticmethod
+    def key_for(output_path: Path) -> str:
+        try:
+            return output_path.resolve().relative_to(BASEDIR.resolve()).as_posix()
+        except ValueError:
+            return output_path.resolve().as_posix()
+
+    def is_fresh(self, output_path: Path, digest: str) -> bool:
+        return self.entries.get(self.key_for(output_path)) == digest and output_path.is_file()
+
+    def record(self, output_path: Path, digest: str) -> None:
+        self.entries[self.key_for(output_path)] = digest
+
+    def forget(self, output_path: Path) -> None:
+        self.entries.pop(self.key_for(output_path), None)
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        payload = {"version": _MANIFEST_VERSION, "outputs": dict(sorted(self.entries.items()))}
+        tmp_path = self.path.with_name(f"{self.path.name}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(payload, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,157 @@
+"""HiDPI rendering: derive an `@2x` (or any factor) config from the single 1x layout description."""
+
+from __future__ import annotations
+
+import copy
+from typing import Iterable
+
+
+# Pixel-valued config keys, per section. Ratios (line_height, text_compactness, opacities) stay as they are.
+_SCALED_KEYS: dict[str, tuple[str, ...]] = {
+    "image": ("width", "height"),
+    "layout": (
+        "padding",
+        "section_spacing",
+        "item_spacing",
+        "section_header_bottom_margin",
+        "title_offset_y",
+        "civ_icon_padding",
+        "bullet_extra_spacing_px",
+        "uu_description_gap_px",
+        "section_title_leading_px",
+        "section_title_gap_px",
+        "subtitle_gap_px",
+        "item_name_gap_px",
+        "min_content_height",
+    ),
+    "blocks": ("padding_x", "padding_y", "radius", "border_width"),
+}
+_SCALED_ICON_SUFFIXES = ("_size", "_gap", "_spacing")
+
+# Renderer defaults of the scaled keys: a key missing from the config must be scaled too, not fall back to its 1x default.
+# Keys whose default is another key (`civ_icon_padding` -> `padding`, `unique_tech_icon_size` -> `tech_icon_size`)
+# are left out: they follow the scaled key they fall back to.
+_DEFAULTS: dict[str, dict[str, int]] = {
+    "image": {"width": 400},
+    "layout": {
+        "padding": 15,
+        "section_spacing": 10,
+        "item_spacing": 5,
+        "section_header_bottom_margin": 5,
+        "title_offset_y": -6,
+        "bullet_extra_spacing_px": 4,
+        "uu_description_gap_px": 2,
+        "section_title_leading_px": 2,
+        "section_title_gap_px": 2,
+        "subtitle_gap_px": 2,
+        "item_name_gap_px": 3,
+        "min_content_height": 50,
+    },
+    "blocks": {"padding_x": 12, "padding_y": 10, "radius": 8, "border_width": 1},
+    "icons": {
+        "unique_unit_icon_size": 26,
+        "unique_unit_icon_gap": 8,
+        "icon_text_spacing": 8,
+        "unit_icon_size": 28,
+        "bonus_icon_size": 20,
+        "team_bonus_icon_size": 20,
+    },
+    "text": {"title": 32, "section_title": 18, "description": 16, "bonus": 12, "team_bonus": 12},
+}
+# Defaults that differ between the renderers: (site, legacy).
+_RENDERER_ICON_DEFAULTS = {"civ_icon_size": (64, 50), "tech_icon_size": (26, 28)}
+
+
+def scale_suffix(factor: float) -> str:
+    return f"@{factor:g}x"
+
+
+def parse_scales(spec: object) -> list[float]:
+    """`2`, `"1,2"`, `[1, 2]` -> [1.0, 2.0] (deduplicated, in the given order); empty -> [1.0]."""
+    if spec is None or spec == "":
+        return [1.0]
+    parts: Iterable[object] = spec if isinstance(spec, (list, tuple)) else str(spec).split(",")
+    scales: list[float] = []
+    for part in parts:
+        text = str(part).strip().lower().removeprefix("@").removesuffix("x")
+        if not text:
+            continue
+        factor = float(text)
+        if factor <= 0:
+            raise ValueError(f"Масштаб должен быть положительным: {part!r}")
+        if factor not in scales:
+            scales.append(factor)
+    return scales or [1.0]
+
+
+def deep_merge(base: dict, overlay: dict) -> dict:
+    """`overlay` (a theme file, `/render` overrides) on top of `base`; nested sections are merged key by key."""
+    merged = dict(base)
+    for key, value in (overlay or {}).items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = deep_merge(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+
+def _scale_px(value: object, factor: float) -> object:
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return value
+    return int(round(value * factor))
+
+
+def _fill_defaults(config: dict) -> None:
+    for section, defaults in _DEFAULTS.items():
+        section_cfg = config.get(section)
+        if section_cfg is None:
+            section_cfg = config[section] = {}
+        if not isinstance(section_cfg, dict):
+            continue
+        for key, default in defaults.items():
+            if section == "text":
+                style = section_cfg.get(key)
+                if style is None:
+                    style = section_cfg[key] = {}
+                if isinstance(style, dict):
+                    style.setdefault("font_size", default)
+            else:
+                section_cfg.setdefault(key, default)
+    is_site = str((config.get("layout") or {}).get("renderer", "site")).lower() == "site"
+    icons_cfg = config["icons"]
+    if isinstance(icons_cfg, dict):
+        for key, (site_default, legacy_default) in _RENDERER_ICON_DEFAULTS.items():
+            icons_cfg.setdefault(key, site_default if is_site else legacy_default)
+
+
+def scale_config(config: dict, factor: float) -> dict:
+    """Copy of `config` with every pixel metric, font size and icon size multiplied by `factor`."""
+    scaled = copy.deepcopy(config)
+    if factor == 1:
+        return scaled
+    _fill_defaults(scaled)
+    for section, keys in _SCALED_KEYS.items():
+        section_cfg = scaled.get(section)
+        if isinstance(section_cfg, dict):
+            for key in keys:
+                if key in section_cfg:
+                    section_cfg[key] = _scale_px(section_cfg[key], factor)
+
+    border_cfg = (scaled.get("image") or {}).get("border")
+    if isinstance(border_cfg, dict):
+        border_cfg.setdefault("width", 2)
+        border_cfg.setdefault("radius", 0)
+        for key in ("width", "radius"):
+            if key in border_cfg:
+                border_cfg[key] = _scale_px(border_cfg[key], factor)
+
+    for style in (scaled.get("text") or {}).values():
+        if isinstance(style, dict) and "font_size" in style:
+            style["font_size"] = _scale_px(style["font_size"], factor)
+
+    icons_cfg = scaled.get("icons")
+    if isinstance(icons_cfg, dict):
+        for key, value in icons_cfg.items():
+            if key.endswith(_SCALED_ICON_SUFFIXES):
+                icons_cfg[key] = _scale_px(value, factor)
+    return scaled
@@ -0,0 +1,129 @@
+"""Render scheduling for the HTTP server: single-flight coalescing, a process pool and a bounded queue."""
+
+from __future__ import annotations
+
+import asyncio
+import math
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from functools import partial
+from typing import Any, Callable, Sequence
+
+
+DEFAULT_RENDER_WORKERS = max(1, min(4, os.cpu_count() or 1))
+# Distinct renders allowed to wait for a worker on top of the ones running.
+DEFAULT_MAX_QUEUED = 32
+
+
+class RenderQueueFull(Exception):
+    """Too many distinct renders pending: the client should retry after `retry_after` seconds."""
+
+    def __init__(self, retry_after: int) -> None:
+        super().__init__(f"render queue is full, retry after {retry_after} s")
+        self.retry_after = retry_after
+
+
+@dataclass(frozen=True)
+class SchedulerStats:
+    started: int = 0
+    # Requests that joined an identical render already in flight instead of starting their own.
+    coalesced: int = 0
+    rejected: int = 0
+    in_flight: int = 0
+
+
+class RenderScheduler:
+    """
+    Runs CPU-bound renders in a `ProcessPoolExecutor`, off the event loop, so the other routes stay responsive.
+    Concurrent requests with the same key share one job (single flight). At most `workers + max_queued`
+    distinct jobs are pending; beyond that `run` raises `RenderQueueFull` right away instead of queueing.
+    Must be used from a single event loop.
+    """
+
+    def __init__(
+            self, *, workers: int = DEFAULT_RENDER_WORKERS, max_queued: int = DEFAULT_MAX_QUEUED,
+            initializer: Callable[..., None] | None = None, initargs: Sequence[Any] = (),
+            ) -> None:
+        self.workers = max(1, int(workers))
+        self.capacity = self.workers + max(0, int(max_queued))
+        self._initializer = initializer
+        self._initargs = tuple(initargs)
+        self._executor: ProcessPoolExecutor | None = None
+        self._executor_lock = threading.Lock()
+        self._in_flight: dict[str, asyncio.Future] = {}
+        # Moving average of a render's wall time, for the `Retry-After` estimate.
+        self._avg_seconds = 0.5
+        self._started = 0
+        self._coalesced = 0
+        self._rejected = 0
+
+    def _pool(self) -> ProcessPoolExecutor:
+        """Created on the first job, so a server that never renders never spawns workers."""
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, initializer=self._initializer, initargs=self._initargs
+                )
+            return self._executor
+
+    def retry_after(self) -> int:
+        backlog = len(self._in_flight) / self.workers
+        return max(1, math.ceil(self._avg_seconds * backlog))
+
+    async def run(
+            self, key: str, fn: Callable[..., Any], *args: Any, on_result: Callable[[Any], None] | None = None,
+            ) -> tuple[Any, bool]:
+        """
+        `fn(*args)` in a worker process, or the result of the identical job (`key`) already running.
+        `on_result` runs once, on the event loop, before waiting requests resume (e.g. to fill a cache).
+        Returns (result, joined an in-flight job).
+        """
+        job = self._in_flight.get(key)
+        if job is not None:
+            self._coalesced += 1
+            # `shield`: a client that disconnects must not cancel the job other requests are waiting for.
+            return await asyncio.shield(job), True
+        if len(self._in_flight) >= self.capacity:
+            self._rejected += 1
+            raise RenderQueueFull(self.retry_after())
+        self._started += 1
+        job = asyncio.ensure_future(self._execute(key, partial(fn, *args), on_result))
+        self._in_flight[key] = job
+        return await asyncio.shield(job), False
+
+    async def _execute(self, key: str, call: Callable[[], Any], on_result: Callable[[Any], None] | None) -> Any:
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        try:
+            try:
+                result = await loop.run_in_executor(self._pool(), call)
+            except BrokenProcessPool:
+                # A worker died (e.g. killed by the OOM killer): the next job gets a fresh pool.
+                self._reset_pool()
+                raise
+            self._avg_seconds = 0.8 * self._avg_seconds + 0.2 * (loop.time() - started)
+            if on_result is not None:
+                on_result(result)
+            return result
+        finally:
+            self._in_flight.pop(key, None)
+
+    def _reset_pool(self) -> None:
+        with self._executor_lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> SchedulerStats:
+        return SchedulerStats(
+            started=self._started, coalesced=self._coalesced, rejected=self._rejected, in_flight=len(self._in_flight)
+        )
+
+    def shutdown(self) -> None:
+        with self._executor_lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
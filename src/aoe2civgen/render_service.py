@@ -0,0 +1,293 @@
+"""On-demand card rendering for the HTTP server: whitelisted render parameters and an encoded-bytes LRU cache."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from functools import partial
+from pathlib import Path
+
+from aoe2civgen.encoders import check_format_available, encode_image, load_encoder_settings, normalize_format
+from aoe2civgen.generate_images import (
+    DEFAULT_THEME,
+    fonts_for_config,
+    load_config_file,
+    load_theme_overlays,
+    render_civilization,
+    resolve_data_dir,
+)
+from aoe2civgen.layout_cache import LAYOUT_CACHE
+from aoe2civgen.paths import find_repo_root
+from aoe2civgen.render_manifest import shared_input_digest
+from aoe2civgen.render_scale import deep_merge, scale_config
+from aoe2civgen.render_scheduler import RenderScheduler
+
+
+BASEDIR = find_repo_root()
+THEMES_DIR = BASEDIR / "themes"
+DEFAULT_CACHE_BYTES = 64 * 1024 * 1024
+
+# The only render overrides a request may set; everything else comes from the server's config.
+RENDER_FORMATS = {"png": "image/png", "webp": "image/webp", "jpg": "image/jpeg", "avif": "image/avif"}
+MIN_WIDTH, MAX_WIDTH = 200, 1600
+# A fixed set, so the per-process font cache (one font set per size) stays bounded.
+RENDER_SCALES = (1.0, 1.5, 2.0, 3.0)
+_LOCALE_RE = re.compile(r"[a-z]{2,3}(?:[-_][a-z0-9]{2,8})?")
+
+
+class RenderError(Exception):
+    """Invalid render request: a parameter outside the whitelist."""
+
+
+class RenderNotFound(RenderError):
+    """Unknown locale, civilization or theme."""
+
+
+class RenderUnavailable(Exception):
+    """The server's config, themes or fonts could not be loaded: `/render` is down, the static routes are not."""
+
+
+class RenderFailed(Exception):
+    """The renderer gave no image for a valid request."""
+
+
+@dataclass(frozen=True)
+class RenderParams:
+    width: int | None = None
+    scale: float = 1.0
+    format: str = "png"
+    theme: str | None = None
+
+
+def parse_render_params(
+        *, width: int | None = None, scale: float | None = None, format: str | None = None, theme: str | None = None
+        ) -> RenderParams:
+    if width is not None and not MIN_WIDTH <= int(width) <= MAX_WIDTH:
+        raise RenderError(f"width must be within {MIN_WIDTH}..{MAX_WIDTH}")
+    factor = 1.0 if scale is None else float(scale)
+    if factor not in RENDER_SCALES:
+        raise RenderError(f"scale must be one of: {', '.join(f'{s:g}' for s in RENDER_SCALES)}")
+    fmt = normalize_format(format or "png")
+    if fmt not in RENDER_FORMATS:
+        raise RenderError(f"format must be one of: {', '.join(RENDER_FORMATS)}")
+    try:
+        check_format_available(fmt)
+    except ValueError as e:
+        raise RenderError(f"format '{fmt}' is not supported by this server") from e
+    return RenderParams(
+        width=None if width is None else int(width), scale=factor, format=fmt, theme=(theme or None),
+    )
+
+
+@dataclass(frozen=True)
+class RenderedImage:
+    data: bytes
+    media_type: str
+    # sha256 of `data`, usable as a strong validator.
+    digest: str
+
+
+@dataclass(frozen=True)
+class RenderCacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    entries: int = 0
+    bytes: int = 0
+
+
+class ByteLRUCache:
+    """LRU of encoded images bounded by the total size of the cached bytes (not the entry count)."""
+
+    def __init__(self, max_bytes: int = DEFAULT_CACHE_BYTES) -> None:
+        self.max_bytes = max(0, int(max_bytes))
+        self._entries: OrderedDict[str, RenderedImage] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def get(self, key: str) -> RenderedImage | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry
+
+    def put(self, key: str, entry: RenderedImage) -> None:
+        size = len(entry.data)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old.data)
+            if size > self.max_bytes:  # larger than the whole budget: serve it, do not cache it
+                return
+            self._entries[key] = entry
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted.data)
+                self._evictions += 1
+
+    def stats(self) -> RenderCacheStats:
+        with self._lock:
+            return RenderCacheStats(
+                hits=self._hits, misses=self._misses, evictions=self._evictions,
+                entries=len(self._entries), bytes=self._bytes,
+            )
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+
+class RenderService:
+    """
+    Renders cards on request through the `generate` pipeline (fonts, icon cache, layout cache of the render workers).
+    The config and theme overlays are loaded once (on `warm` or the first request); encoded results are
+    cached by (locale, civ, civ JSON mtime, digest of config + themes + fonts + renderer, params).
+    """
+
+    def __init__(
+            self, *, config_path: str | Path | None = None, themes_dir: Path = THEMES_DIR,
+            cache_bytes: int = DEFAULT_CACHE_BYTES,
+            ) -> None:
+        self.config_path = config_path
+        self.themes_dir = themes_dir
+        self.cache = ByteLRUCache(cache_bytes)
+        self._config: dict | None = None
+        self._themes: dict[str, dict] = {}
+        self._inputs_digest = ""
+        self._setup_lock = threading.Lock()
+
+    def warm(self) -> None:
+        """Load the config and theme overlays (and hash the render inputs) ahead of the first request."""
+        self._base_config()
+
+    def _base_config(self) -> dict:
+        """Raises `RenderUnavailable` while the config cannot be loaded; the next call tries again."""
+        with self._setup_lock:
+            if self._config is None:
+                try:
+                    theme_paths = sorted(self.themes_dir.glob("*.yaml")) if self.themes_dir.is_dir() else []
+                    themes = dict(load_theme_overlays(theme_paths)) if theme_paths else {}
+                    config = load_config_file(self.config_path)
+                    if not isinstance(config, dict):
+                        raise ValueError("the config is not a mapping")
+                    # Every variant config is derived from these two, so their digest stands for any of them.
+                    themes_json = json.dumps(themes, sort_keys=True, ensure_ascii=False, default=str)
+                    inputs_digest = hashlib.sha256(
+                        f"{shared_input_digest(config)}\n{themes_json}".encode("utf-8")
+                    ).hexdigest()
+                except Exception as e:
+                    raise RenderUnavailable(f"render config could not be loaded: {e}") from e
+                self._themes, self._inputs_digest, self._config = themes, inputs_digest, config
+            return self._config
+
+    @property
+    def base_config(self) -> dict:
+        """The server's config without theme or request overrides; raises `RenderUnavailable`."""
+        return self._base_config()
+
+    @property
+    def themes(self) -> list[str]:
+        self._base_config()
+        return sorted(self._themes)
+
+    def variant_config(self, locale: str, params: RenderParams) -> dict:
+        config = self._base_config()
+        if params.theme is not None:
+            if params.theme not in self._themes:
+                raise RenderNotFound(f"unknown theme '{params.theme}'")
+            config = deep_merge(config, self._themes[params.theme])
+        overrides: dict = {"output": {"format": params.format}}
+        if params.width is not None:
+            overrides["image"] = {"width": params.width}
+        variant = scale_config(deep_merge(config, overrides), params.scale)
+        variant["locale"] = locale
+        variant["theme"] = params.theme or DEFAULT_THEME
+        variant["scale"] = params.scale
+        return variant
+
+    def civ_path(self, locale: str, civ: str) -> Path:
+        if not _LOCALE_RE.fullmatch(locale):
+            raise RenderNotFound("unknown locale")
+        data_dir = resolve_data_dir(self._base_config(), locale=locale)
+        # Only plain file stems of existing civ JSONs: no separators, no index file.
+        if not civ or civ.startswith(".") or "/" in civ or "\\" in civ or "\x00" in civ or civ == "all_civilizations":
+            raise RenderNotFound("unknown civilization")
+        path = data_dir / f"{civ}.json"
+        if not path.is_file():
+            raise RenderNotFound("unknown civilization")
+        return path
+
+    def cache_key(self, locale: str, civ: str, params: RenderParams) -> str:
+        """Validates the request (locale, civ, theme) and returns its cache key."""
+        path = self.civ_path(locale, civ)
+        if params.theme is not None and params.theme not in self._themes:
+            raise RenderNotFound(f"unknown theme '{params.theme}'")
+        payload = json.dumps(
+            {
+                "locale": locale,
+                "civ": civ,
+                "mtime": path.stat().st_mtime_ns,
+                "inputs": self._inputs_digest,
+                "params": asdict(params),
+            },
+            sort_keys=True,
+            ensure_ascii=False,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    async def render(
+            self, locale: str, civ: str, params: RenderParams, scheduler: RenderScheduler,
+            ) -> tuple[RenderedImage, str]:
+        """
+        Returns (image, `hit` | `miss` | `coalesced`). A miss renders in the scheduler's worker processes;
+        identical concurrent misses share that render, and its result is cached before they resume.
+        """
+        key = self.cache_key(locale, civ, params)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached, "hit"
+        config = self.variant_config(locale, params)
+        rendered, joined = await scheduler.run(
+            key, partial(render_encoded, locale=locale), civ, config, on_result=partial(self.cache.put, key)
+        )
+        return rendered, "coalesced" if joined else "miss"
+
+
+def init_render_worker(config_path: str | Path | None = None) -> None:
+    """
+    Worker process initializer: load the config and its fonts before the first job arrives.
+    Never raises: a failing initializer breaks the whole pool, while a job loads whatever it still needs itself.
+    """
+    # Request parameters (width, scale, theme) reach the layout key, so persisting layouts would let clients
+    # grow `.cache/layouts` without bound: the workers keep them in the bounded in-memory LRU only.
+    LAYOUT_CACHE.cache_dir = None
+    try:
+        fonts_for_config(load_config_file(config_path))
+    except Exception as e:
+        print(f"WARNING: /render: воркер не прогрел конфиг и шрифты: {e}")
+
+
+def render_encoded(civ: str, config: dict, *, locale: str) -> RenderedImage:
+    image = render_civilization(civ, config, locale=locale, fonts_tuple=fonts_for_config(config))
+    if image is None:
+        raise RenderFailed(f"failed to render '{civ}'")
+    settings = load_encoder_settings(config)
+    encoded = encode_image(image, settings)
+    return RenderedImage(
+        data=encoded.data,
+        media_type=RENDER_FORMATS[settings.format],
+        digest=hashlib.sha256(encoded.data).hexdigest(),
+    )
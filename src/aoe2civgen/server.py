@@ -1,11 +1,46 @@
 from __future__ import annotations
 
+import hashlib
+import json
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import asynccontextmanager
 from pathlib import Path, PurePosixPath
+from typing import AsyncIterator
+from urllib.parse import quote
 
-from fastapi import FastAPI, HTTPException, Query
-from fastapi.responses import FileResponse, PlainTextResponse
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, Response
 
+from aoe2civgen.civ_resolver import CivResolver
+from aoe2civgen.image_store import (
+    ImageStore,
+    etag_matches,
+    file_digest,
+    hashed_filename,
+    iter_image_files,
+    split_hashed_filename,
+    strong_etag,
+)
 from aoe2civgen.paths import find_repo_root
+from aoe2civgen.render_scheduler import DEFAULT_MAX_QUEUED, DEFAULT_RENDER_WORKERS, RenderQueueFull, RenderScheduler
+from aoe2civgen.render_service import (
+    DEFAULT_CACHE_BYTES,
+    RENDER_FORMATS,
+    RenderError,
+    RenderFailed,
+    RenderNotFound,
+    RenderService,
+    RenderUnavailable,
+    init_render_worker,
+    parse_render_params,
+)
+
+
+IMAGE_LOCALES = ("ru", "en")
+# Stable names may change content on the next `generate`: clients revalidate (cheap 304 via ETag).
+REVALIDATE_CACHE_CONTROL = "no-cache"
+# Content-hashed names never change content.
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
 
 
 def _normalize_png_filename(name: str) -> str:
@@ -20,7 +55,7 @@ def _normalize_png_filename(name: str) -> str:
 
 
 def _safe_png_path(*, images_root: Path, locale: str, filename: str) -> Path:
-    if locale not in {"ru", "en"}:
+    if locale not in IMAGE_LOCALES:
         raise HTTPException(status_code=404, detail="Unknown locale.")
 
     if "\x00" in filename or "\\" in filename:
@@ -46,31 +81,228 @@ def _safe_png_path(*, images_root: Path, locale: str, filename: str) -> Path:
     return candidate
 
 
-def create_app(*, images_root: Path | None = None) -> FastAPI:
+def _not_modified(request: Request, headers: dict[str, str]) -> Response | None:
+    if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    return None
+
+
+def _split_render_suffix(civ: str) -> tuple[str, str | None]:
+    """`Aztecs.webp` -> (`Aztecs`, `webp`); a name without a known image suffix is returned as is."""
+    stem, dot, ext = civ.rpartition(".")
+    if dot and stem and ext.lower() in {*RENDER_FORMATS, "jpeg"}:
+        return stem, ext.lower()
+    return civ, None
+
+
+def _resolver_config(renderer: RenderService) -> dict:
+    """The render config, so civ names come from the same data directories; defaults while it does not load."""
+    try:
+        return renderer.base_config
+    except RenderUnavailable:
+        return {}
+
+
+def create_app(
+        *, images_root: Path | None = None, render_service: RenderService | None = None,
+        render_scheduler: RenderScheduler | None = None, image_store: ImageStore | None = None,
+        civ_resolver: CivResolver | None = None,
+        ) -> FastAPI:
+    """
+    `image_store` (`serve --preload`): serve `/images` and `/image` from memory instead of the filesystem.
+    `civ_resolver`: civ name index for `/resolve` and the `/image` fallback (default: built from the data
+    directories of the render config, `input.data_dir`, or from `data/` while that config does not load).
+    """
     repo_root = find_repo_root()
     resolved_images_root = (images_root or (repo_root / "stream_images")).resolve(strict=False)
+    renderer = render_service or RenderService()
+    resolver = civ_resolver or CivResolver.load(_resolver_config(renderer), IMAGE_LOCALES)
+    scheduler = render_scheduler or RenderScheduler(
+        initializer=init_render_worker, initargs=(renderer.config_path,)
+    )
 
-    app = FastAPI()
+    @asynccontextmanager
+    async def lifespan(_: FastAPI) -> AsyncIterator[None]:
+        # The render pool starts on the first `/render`; here it is only torn down.
+        try:
+            yield
+        finally:
+            scheduler.shutdown()
+
+    app = FastAPI(lifespan=lifespan)
 
     @app.api_route("/healthz", methods=["GET", "HEAD"], response_class=PlainTextResponse)
     def healthz() -> str:
         return "ok"
 
+    def image_response(request: Request, *, locale: str, filename: str) -> Response:
+        """
+        Serves `filename` or its content-hashed name (`Aztecs.<hash>.png`, see `/manifest/{locale}`) with a strong
+        ETag; `If-None-Match` gets a 304. A hashed name whose hash is no longer current is a 404.
+        """
+        hashed = split_hashed_filename(filename)
+        plain_name = hashed[0] if hashed is not None else filename
+        if image_store is not None:
+            image, path = image_store.get(locale, plain_name), None
+            if image is None:
+                raise HTTPException(status_code=404, detail="Not found.")
+            digest = image.digest
+        else:
+            image, path = None, _safe_png_path(images_root=resolved_images_root, locale=locale, filename=plain_name)
+            digest = file_digest(path)
+        if hashed is not None and not digest.startswith(hashed[1]):
+            raise HTTPException(status_code=404, detail="Not found.")
+
+        headers = {
+            "ETag": strong_etag(digest),
+            "Cache-Control": IMMUTABLE_CACHE_CONTROL if hashed is not None else REVALIDATE_CACHE_CONTROL,
+        }
+        not_modified = _not_modified(request, headers)
+        if not_modified is not None:
+            return not_modified
+        if image is not None:
+            return Response(content=image.data, media_type=image.media_type, headers=headers)
+        return FileResponse(path, media_type="image/png", headers=headers)
+
     @app.api_route("/images/{locale}/{filename:path}", methods=["GET", "HEAD"])
-    def get_image(locale: str, filename: str) -> FileResponse:
-        path = _safe_png_path(images_root=resolved_images_root, locale=locale, filename=filename)
-        return FileResponse(path, media_type="image/png")
+    def get_image(request: Request, locale: str, filename: str) -> Response:
+        return image_response(request, locale=locale, filename=filename)
 
     @app.api_route("/image/{locale}", methods=["GET", "HEAD"])
-    def get_image_by_name(locale: str, name: str = Query(..., min_length=1)) -> FileResponse:
-        filename = _normalize_png_filename(name)
-        path = _safe_png_path(images_root=resolved_images_root, locale=locale, filename=filename)
-        return FileResponse(path, media_type="image/png")
+    def get_image_by_name(request: Request, locale: str, name: str = Query(..., min_length=1)) -> Response:
+        """Exact file name first; otherwise `name` is resolved like `/resolve` (`aztec`, `ацтеки`, `AZTECS`)."""
+        try:
+            return image_response(request, locale=locale, filename=_normalize_png_filename(name))
+        except HTTPException as e:
+            if e.status_code != 404 or locale not in IMAGE_LOCALES:
+                raise
+            resolution = resolver.resolve(name)
+            stem = resolver.image_stem(resolution.civ_id, locale) if resolution is not None else None
+            if stem is None:
+                raise
+        return image_response(request, locale=locale, filename=f"{stem}.png")
+
+    @app.get("/resolve", response_model=None)
+    def resolve_civ(q: str = Query(..., min_length=1), locale: str | None = Query(None)) -> Response | dict:
+        """
+        Chat-bot lookup: civ id, localized name, abbreviation, prefix or a typo -> civ id and image URLs.
+        An ambiguous query (`bur`) is a 300 listing the competing civ ids, so the bot can ask instead of guessing.
+        """
+        resolution = resolver.resolve(q)
+        if resolution is None:
+            raise HTTPException(status_code=404, detail="Unknown civilization.")
+        if resolution.ambiguous:
+            return JSONResponse(
+                status_code=300,
+                content={
+                    "query": q,
+                    "civ_id": None,
+                    "match": resolution.match,
+                    "score": resolution.score,
+                    "candidates": list(resolution.candidates),
+                },
+            )
+        locales = [locale] if locale is not None else [loc for loc in resolver.locales if loc in IMAGE_LOCALES]
+        images = {
+            loc: f"/images/{loc}/{quote(stem)}.png"
+            for loc in locales
+            if (stem := resolver.image_stem(resolution.civ_id, loc)) is not None
+        }
+        if locale is not None and not images:
+            raise HTTPException(status_code=404, detail="Unknown locale.")
+        return {
+            "query": q,
+            "civ_id": resolution.civ_id,
+            "match": resolution.match,
+            "score": resolution.score,
+            "images": images,
+        }
+
+    @app.api_route("/manifest/{locale}", methods=["GET", "HEAD"])
+    def get_manifest(request: Request, locale: str) -> Response:
+        """Stable image name -> current content-hashed URL (cacheable forever), for overlays and CDNs."""
+        if locale not in IMAGE_LOCALES:
+            raise HTTPException(status_code=404, detail="Unknown locale.")
+        if image_store is not None:
+            digests = {filename: image.digest for filename, image in image_store.items(locale)}
+        else:
+            digests = {
+                filename: file_digest(path) for filename, path in iter_image_files(resolved_images_root / locale)
+            }
+        images = {
+            filename: f"/images/{locale}/{quote(hashed_filename(filename, digest))}"
+            for filename, digest in sorted(digests.items())
+        }
+        body = json.dumps({"locale": locale, "images": images}, ensure_ascii=False, indent=2).encode("utf-8")
+        headers = {"ETag": strong_etag(hashlib.sha256(body).hexdigest()), "Cache-Control": REVALIDATE_CACHE_CONTROL}
+        not_modified = _not_modified(request, headers)
+        if not_modified is not None:
+            return not_modified
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    # `async`: the route only awaits the render pool, so it never takes a threadpool slot from the static routes.
+    @app.api_route("/render/{locale}/{civ}", methods=["GET", "HEAD"])
+    async def render_image(
+        request: Request,
+        locale: str,
+        civ: str,
+        width: int | None = Query(None),
+        scale: float | None = Query(None),
+        format: str | None = Query(None),
+        theme: str | None = Query(None),
+    ) -> Response:
+        civ_name, suffix_format = _split_render_suffix(civ)
+        try:
+            params = parse_render_params(width=width, scale=scale, format=format or suffix_format, theme=theme)
+            rendered, cache_status = await renderer.render(locale, civ_name, params, scheduler)
+        except RenderNotFound as e:
+            raise HTTPException(status_code=404, detail=str(e)) from e
+        except RenderError as e:
+            raise HTTPException(status_code=400, detail=str(e)) from e
+        except RenderQueueFull as e:
+            raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)}) from e
+        except RenderUnavailable as e:
+            raise HTTPException(status_code=503, detail=str(e)) from e
+        except BrokenProcessPool as e:
+            raise HTTPException(status_code=503, detail="render worker died, retry the request") from e
+        except RenderFailed as e:
+            raise HTTPException(status_code=500, detail=str(e)) from e
+        headers = {
+            "ETag": strong_etag(rendered.digest),
+            "Cache-Control": REVALIDATE_CACHE_CONTROL,
+            "X-Render-Cache": cache_status,
+        }
+        not_modified = _not_modified(request, headers)
+        if not_modified is not None:
+            return not_modified
+        return Response(content=rendered.data, media_type=rendered.media_type, headers=headers)
 
     return app
 
 
-def serve(*, host: str, port: int) -> None:
+def serve(
+        *, host: str, port: int, config_path: str | None = None, render_cache_mb: int | None = None,
+        render_workers: int | None = None, render_queue: int | None = None, preload: bool = False,
+        ) -> None:
     import uvicorn
 
-    uvicorn.run(create_app(), host=host, port=port)
+    image_store = None
+    if preload:
+        images_root = find_repo_root() / "stream_images"
+        image_store = ImageStore.load(images_root, IMAGE_LOCALES)
+        print(f"INFO: В памяти {len(image_store)} изображений ({image_store.total_bytes / 1024 / 1024:.1f} МБ) из {images_root}")
+
+    cache_bytes = render_cache_mb * 1024 * 1024 if render_cache_mb is not None else DEFAULT_CACHE_BYTES
+    render_service = RenderService(config_path=config_path, cache_bytes=cache_bytes)
+    try:
+        render_service.warm()
+    except RenderUnavailable as e:  # the static routes work without a config; /render answers 503 until it loads
+        print(f"WARNING: /render: не удалось загрузить конфиг: {e}")
+    render_scheduler = RenderScheduler(
+        workers=render_workers or DEFAULT_RENDER_WORKERS,
+        max_queued=render_queue if render_queue is not None else DEFAULT_MAX_QUEUED,
+        initializer=init_render_worker,
+        initargs=(config_path,),
+    )
+    app = create_app(render_service=render_service, render_scheduler=render_scheduler, image_store=image_store)
+    uvicorn.run(app, host=host, port=port)
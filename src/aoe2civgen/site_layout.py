@@ -3,13 +3,12 @@ from __future__ import annotations
 from dataclasses import dataclass
 from pathlib import Path
 
-from PIL import Image, ImageColor, ImageDraw, ImageFont
+from PIL import Image, ImageColor, ImageFont
 
 from aoe2civgen.block_render import (
-    BlockTheme,
+    DisplayList,
     TextRun,
     TextStyle,
-    draw_block_background,
     draw_paragraph,
     draw_text_runs,
     iter_bullets,
@@ -58,6 +57,9 @@ class LayoutMetrics:
     item_gap: int
     bullet_extra_spacing_px: int
     uu_description_gap_px: int
+    section_title_leading_px: int
+    section_title_gap_px: int
+    subtitle_gap_px: int
 
 
 def load_metrics(config: dict) -> LayoutMetrics:
@@ -74,6 +76,9 @@ def load_metrics(config: dict) -> LayoutMetrics:
     item_gap = int(layout_cfg.get("item_spacing", 5))
     bullet_extra_spacing_px = int(layout_cfg.get("bullet_extra_spacing_px", 4))
     uu_description_gap_px = int(layout_cfg.get("uu_description_gap_px", 2))
+    section_title_leading_px = int(layout_cfg.get("section_title_leading_px", 2))
+    section_title_gap_px = int(layout_cfg.get("section_title_gap_px", 2))
+    subtitle_gap_px = int(layout_cfg.get("subtitle_gap_px", 2))
     return LayoutMetrics(
         width=width,
         padding=padding,
@@ -84,6 +89,9 @@ def load_metrics(config: dict) -> LayoutMetrics:
         item_gap=item_gap,
         bullet_extra_spacing_px=bullet_extra_spacing_px,
         uu_description_gap_px=uu_description_gap_px,
+        section_title_leading_px=section_title_leading_px,
+        section_title_gap_px=section_title_gap_px,
+        subtitle_gap_px=subtitle_gap_px,
     )
 
 
@@ -110,33 +118,49 @@ def _clamp01(value: float) -> float:
     return max(0.0, min(1.0, float(value)))
 
 
-def render_civ_image(
+TEXT_COLOR_ROLES = ("title", "description", "section_title")
+
+
+def text_palette(config: dict) -> dict[str, tuple[int, ...]]:
+    text_cfg = config.get("text", {}) or {}
+    return {role: ImageColor.getrgb((text_cfg.get(role, {}) or {}).get("color", "#000000")) for role in TEXT_COLOR_ROLES}
+
+
+@dataclass(frozen=True)
+class CardLayout:
+    width: int
+    height: int
+    display: DisplayList
+
+
+def measure_civ_card(
     civ_data: dict,
     config: dict,
     fonts: tuple[ImageFont.FreeTypeFont, ImageFont.FreeTypeFont, ImageFont.FreeTypeFont, ImageFont.FreeTypeFont],
-) -> Image.Image:
+) -> CardLayout:
+    """
+    Measure pass: lay out the card and record positioned text runs, icons and block rectangles.
+    Nothing is rasterized and icons are not opened, so this alone is enough to get card heights.
+    """
     title_font, normal_font, bold_font, section_font = fonts
 
     metrics = load_metrics(config)
     theme = load_block_theme(config)
     labels = _labels(config)
 
-    # Base layers
-    content = Image.new("RGBA", (metrics.width, 3000), (0, 0, 0, 0))
-    blocks = Image.new("RGBA", (metrics.width, 3000), (0, 0, 0, 0))
-    draw = ImageDraw.Draw(content)
+    display = DisplayList()
+    draw = display
 
     repo_root = find_repo_root()
 
     text_cfg = config.get("text", {}) or {}
-    title_color = ImageColor.getrgb((text_cfg.get("title", {}) or {}).get("color", "#000000"))
-    body_color = ImageColor.getrgb((text_cfg.get("description", {}) or {}).get("color", "#000000"))
-    section_color = ImageColor.getrgb((text_cfg.get("section_title", {}) or {}).get("color", "#000000"))
+    # Colors are recorded as palette roles and resolved by `paint_civ_card`, so the layout does not depend on them.
+    title_color, body_color, section_color = TEXT_COLOR_ROLES
 
     body_line_h = int((text_cfg.get("description", {}) or {}).get("font_size", 12) * (text_cfg.get("description", {}) or {}).get("line_height", 1.2))
     body_style = TextStyle(font=normal_font, color=body_color, line_height_px=body_line_h)
     body_bold_style = TextStyle(font=bold_font, color=body_color, line_height_px=body_line_h)
-    section_style = TextStyle(font=section_font, color=section_color, line_height_px=_text_height(section_font, "A") + 2)
+    section_style = TextStyle(font=section_font, color=section_color, line_height_px=_text_height(section_font, "A") + metrics.section_title_leading_px)
 
     y = metrics.padding + metrics.title_offset_y
 
@@ -150,15 +174,9 @@ def render_civ_image(
     # Flag top-right
     flag_rel = civ_data.get("icon")
     if flag_rel:
-        flag_abs = repo_root / flag_rel
-        if flag_abs.exists():
-            try:
-                flag = Image.open(flag_abs).convert("RGBA").resize((metrics.flag_size, metrics.flag_size), Image.LANCZOS)
-                flag_y = max(metrics.padding, y + (title_h - metrics.flag_size) // 2)
-                flag_x = metrics.width - metrics.flag_padding - metrics.flag_size
-                content.paste(flag, (flag_x, flag_y), flag)
-            except Exception:
-                pass
+        flag_y = max(metrics.padding, y + (title_h - metrics.flag_size) // 2)
+        flag_x = metrics.width - metrics.flag_padding - metrics.flag_size
+        display.icon(flag_x, flag_y, flag_rel, repo_root / flag_rel, metrics.flag_size)
 
     y = max(y + title_h, metrics.padding + metrics.flag_size) + metrics.section_gap
 
@@ -183,14 +201,14 @@ def render_civ_image(
 
         if title_text:
             inner_y = draw_paragraph(draw, title_text, inner_x, inner_y, inner_w, section_style, bullet_extra_spacing_px=0)
-            inner_y += 2
+            inner_y += metrics.section_title_gap_px
 
         return BlockFrame(x0=x0, x1=x1, top=top, inner_x=inner_x, inner_w=inner_w, body_y=int(inner_y))
 
     def finish_block(frame: BlockFrame, body_bottom_y: int) -> None:
         nonlocal y
         bottom = int(body_bottom_y + theme.padding_y)
-        draw_block_background(blocks, frame.x0, frame.top, frame.x1, bottom, theme)
+        display.block(frame.x0, frame.top, frame.x1, bottom)
         y = bottom + metrics.section_gap
 
     def block(title_text: str, lines: list[str]) -> None:
@@ -228,7 +246,7 @@ def render_civ_image(
 
         if rest:
             if subtitle:
-                current_y += 2
+                current_y += metrics.subtitle_gap_px
             current_y = draw_paragraph(
                 draw,
                 rest,
@@ -284,15 +302,9 @@ def render_civ_image(
             row_top = int(current_y)
             icon_y = row_top
             if icon_size > 0 and icon_rel:
-                icon_abs = repo_root / icon_rel
-                if not icon_abs.exists():
-                    print(f"WARNING: missing icon file: {icon_rel} (unique_unit={name!r})")
-                else:
-                    try:
-                        icon = Image.open(icon_abs).convert("RGBA").resize((icon_size, icon_size), Image.LANCZOS)
-                        content.paste(icon, (frame.inner_x, icon_y), icon)
-                    except Exception as e:
-                        print(f"WARNING: failed to render icon: {icon_rel} ({e})")
+                display.icon(
+                    frame.inner_x, icon_y, icon_rel, repo_root / icon_rel, icon_size, warn_context=f"unique_unit={name!r}"
+                )
 
             line_y = row_top
             draw.text((text_x, line_y), bullet_prefix, font=body_style.font, fill=body_style.color)
@@ -363,15 +375,14 @@ def render_civ_image(
             text_y = row_top + (row_h - text_block_h) // 2 if text_block_h > 0 else row_top
 
             if icon_size_px > 0 and icon_rel:
-                icon_abs = repo_root / icon_rel
-                if not icon_abs.exists():
-                    print(f"WARNING: missing icon file: {icon_rel} (title={title!r}, text={line_text!r})")
-                else:
-                    try:
-                        icon = Image.open(icon_abs).convert("RGBA").resize((icon_size_px, icon_size_px), Image.LANCZOS)
-                        content.paste(icon, (frame.inner_x, int(icon_y)), icon)
-                    except Exception as e:
-                        print(f"WARNING: failed to render icon: {icon_rel} ({e})")
+                display.icon(
+                    frame.inner_x,
+                    int(icon_y),
+                    icon_rel,
+                    repo_root / icon_rel,
+                    icon_size_px,
+                    warn_context=f"title={title!r}, text={line_text!r}",
+                )
 
             line_y = int(text_y)
             for rline in render_lines:
@@ -433,17 +444,33 @@ def render_civ_image(
     tb_lines = [b.get("text", "") for b in tb_items if isinstance(b, dict) and b.get("text")]
     block(labels["team_bonus"], iter_bullets(tb_lines) if tb_lines else [])
 
-    # Crop to actual height
+    # Actual height
     final_h = max(2 * metrics.padding + metrics.flag_size, int(y))
     final_h = int(round(final_h))
-    content = content.crop((0, 0, metrics.width, final_h))
-    blocks = blocks.crop((0, 0, metrics.width, final_h))
+    return CardLayout(width=metrics.width, height=final_h, display=display)
+
+
+def paint_civ_card(layout: CardLayout, config: dict) -> Image.Image:
+    """Paint pass: replay the display list onto layers of exactly the measured size."""
+    size = (layout.width, layout.height)
+    content = Image.new("RGBA", size, (0, 0, 0, 0))
+    blocks = Image.new("RGBA", size, (0, 0, 0, 0))
+    layout.display.paint_blocks(blocks, load_block_theme(config))
+    layout.display.paint_content(content, text_palette(config))
 
     # Compose: configurable alpha background + blocks + content
     image_cfg = config.get("image", {}) or {}
     bg_rgb = ImageColor.getrgb(image_cfg.get("background_color", "#F5DEB3"))
     bg_alpha = int(255 * _clamp01(float(image_cfg.get("background_opacity", 0.5))))
-    out = Image.new("RGBA", (metrics.width, final_h), (*bg_rgb, bg_alpha))
+    out = Image.new("RGBA", size, (*bg_rgb, bg_alpha))
     out.alpha_composite(blocks, (0, 0))
     out.alpha_composite(content, (0, 0))
     return out
+
+
+def render_civ_image(
+    civ_data: dict,
+    config: dict,
+    fonts: tuple[ImageFont.FreeTypeFont, ImageFont.FreeTypeFont, ImageFont.FreeTypeFont, ImageFont.FreeTypeFont],
+) -> Image.Image:
+    return paint_civ_card(measure_civ_card(civ_data, config, fonts), config)
@@ -0,0 +1,185 @@
+"""Compact, memory-mapped cache of a locale `strings.json`: sorted ids + offsets into one UTF-8 blob."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import mmap
+import os
+import struct
+from bisect import bisect_left
+from collections.abc import Iterator, Mapping
+from pathlib import Path
+from typing import Any
+
+
+_MAGIC = b"AOE2STR1"
+_FORMAT_VERSION = 1
+# magic, version, source size, source mtime_ns, source sha256, entry count, extras length; padded to 128 bytes.
+_HEADER = struct.Struct("<8sIQq32sQQ")
+_HEADER_SIZE = 128
+_STAT_OFFSET = 12  # source size + mtime_ns, rewritten in place when only the stat changed
+
+
+def _sha256_file(path: Path) -> bytes:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.digest()
+
+
+def _int_id(key: str) -> int | None:
+    """Canonical decimal ids (`"10271"`) go to the sorted id array; anything else is kept in the extras section."""
+    if not (key.isascii() and key.isdigit()) or (len(key) > 1 and key[0] == "0"):
+        return None
+    value = int(key)
+    return value if value < 1 << 63 else None
+
+
+def build_string_table(source_path: Path, cache_path: Path) -> None:
+    """Convert `strings.json` into the on-disk table (written atomically next to `cache_path`)."""
+    raw = source_path.read_bytes()
+    st = source_path.stat()
+    data: dict[str, Any] = json.loads(raw)
+
+    entries: list[tuple[int, bytes]] = []
+    extras: dict[str, Any] = {}
+    for key, value in data.items():
+        string_id = _int_id(key)
+        if string_id is None or not isinstance(value, str):
+            extras[key] = value
+        else:
+            entries.append((string_id, value.encode("utf-8")))
+    entries.sort()
+
+    offsets = [0]
+    for _, encoded in entries:
+        offsets.append(offsets[-1] + len(encoded))
+    extras_blob = json.dumps(extras, ensure_ascii=False).encode("utf-8") if extras else b""
+    header = _HEADER.pack(
+        _MAGIC,
+        _FORMAT_VERSION,
+        st.st_size,
+        st.st_mtime_ns,
+        hashlib.sha256(raw).digest(),
+        len(entries),
+        len(extras_blob),
+    ).ljust(_HEADER_SIZE, b"\0")
+
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = cache_path.with_name(f".{cache_path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(header)
+        f.write(struct.pack(f"<{len(entries)}q", *(string_id for string_id, _ in entries)))
+        f.write(struct.pack(f"<{len(offsets)}Q", *offsets))
+        f.write(extras_blob)
+        for _, encoded in entries:
+            f.write(encoded)
+    os.replace(tmp_path, cache_path)
+
+
+class StringTable(Mapping[str, str]):
+    """
+    Read-only `Mapping[str, str]` over a memory-mapped string table.
+
+    Nothing is decoded up front: a lookup is a binary search over the id array plus one UTF-8 slice decode,
+    so opening a locale is near-instant and only the pages actually read are loaded.
+    """
+
+    def __init__(self, buffer: mmap.mmap) -> None:
+        magic, version, _, _, _, count, extras_len = _HEADER.unpack_from(buffer, 0)
+        if magic != _MAGIC or version != _FORMAT_VERSION:
+            raise ValueError("not a string table")
+        ids_end = _HEADER_SIZE + 8 * count
+        offsets_end = ids_end + 8 * (count + 1)
+        self._mmap = buffer
+        self._view = memoryview(buffer)
+        self._ids = self._view[_HEADER_SIZE:ids_end].cast("q")
+        self._offsets = self._view[ids_end:offsets_end].cast("Q")
+        self._blob_start = offsets_end + extras_len
+        self._extras: dict[str, Any] = json.loads(bytes(self._view[offsets_end:self._blob_start])) if extras_len else {}
+        if self._blob_start + self._offsets[count] != len(buffer):
+            self.close()
+            raise ValueError("truncated string table")
+
+    @classmethod
+    def open(cls, source_path: Path, cache_path: Path) -> "StringTable":
+        """
+        Open the cached table for `source_path`, (re)building it when the source changed.
+        A matching size + mtime is trusted as is; otherwise the cache stays valid only if the sha256 still matches.
+        """
+        table = cls._open_cached(source_path, cache_path)
+        if table is None:
+            build_string_table(source_path, cache_path)
+            table = cls._open_cached(source_path, cache_path)
+        if table is None:
+            raise ValueError(f"Could not build string table for {source_path}")
+        return table
+
+    @classmethod
+    def _open_cached(cls, source_path: Path, cache_path: Path) -> "StringTable | None":
+        try:
+            with open(cache_path, "r+b") as f:
+                header = f.read(_HEADER.size)
+                if len(header) < _HEADER.size:
+                    return None
+                magic, version, size, mtime_ns, digest, _, _ = _HEADER.unpack(header)
+                if magic != _MAGIC or version != _FORMAT_VERSION:
+                    return None
+                st = source_path.stat()
+                if (size, mtime_ns) != (st.st_size, st.st_mtime_ns):
+                    if digest != _sha256_file(source_path):
+                        return None
+                    # Same content, new stat (checkout, copy): refresh the stat so the next open skips hashing.
+                    f.seek(_STAT_OFFSET)
+                    f.write(struct.pack("<Qq", st.st_size, st.st_mtime_ns))
+                    f.flush()
+                buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError, struct.error):
+            return None
+        try:
+            return cls(buffer)
+        except (ValueError, TypeError, struct.error):
+            buffer.close()
+            return None
+
+    def _index(self, key: str) -> int:
+        string_id = _int_id(key) if isinstance(key, str) else None
+        if string_id is None:
+            return -1
+        i = bisect_left(self._ids, string_id)
+        return i if i < len(self._ids) and self._ids[i] == string_id else -1
+
+    def __getitem__(self, key: str) -> str:
+        i = self._index(key)
+        if i < 0:
+            return self._extras[key]
+        start = self._blob_start + self._offsets[i]
+        end = self._blob_start + self._offsets[i + 1]
+        return str(self._view[start:end], "utf-8")
+
+    def __contains__(self, key: object) -> bool:
+        return (isinstance(key, str) and self._index(key) >= 0) or key in self._extras
+
+    def __len__(self) -> int:
+        return len(self._ids) + len(self._extras)
+
+    def __iter__(self) -> Iterator[str]:
+        for string_id in self._ids:
+            yield str(string_id)
+        yield from self._extras
+
+    def close(self) -> None:
+        for view in (self._ids, self._offsets, self._view):
+            view.release()
+        self._mmap.close()
+
+
+def load_string_table(source_path: Path, cache_path: Path) -> Mapping[str, str]:
+    """`StringTable` for `source_path`; falls back to a plain dict when the cache cannot be written or read."""
+    try:
+        return StringTable.open(source_path, cache_path)
+    except (OSError, ValueError):
+        with open(source_path, "r", encoding="utf-8") as f:
+            return json.load(f)